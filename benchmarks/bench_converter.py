@@ -0,0 +1,114 @@
+"""
+Throughput-benchmark for the XML-engines of the OAI-PMH converter.
+
+Converts GetRecord-responses of different sizes (with and without
+namespace-declarations) with every engine in xml_engine.ENGINES, both
+entirely and projected to the SOURCE_PATHS of a mapper, and reports
+records/s relative to the full conversion with the "xmltodict"-engine.
+
+Run with `python -m benchmarks.bench_converter`.
+"""
+
+import argparse
+import timeit
+
+from lzvnrw_converter.oaipmh_converter import OAIPMHMetadataConverter
+from lzvnrw_converter.xml_engine import ENGINES, LXML_AVAILABLE
+from lzvnrw_mapper.miami import MiamiMetadataMapper
+
+
+NAMESPACES = (
+    ' xmlns="http://www.openarchives.org/OAI/2.0/"',
+    ' xmlns:oai_dc="http://www.openarchives.org/OAI/2.0/oai_dc/"'
+    ' xmlns:dc="http://purl.org/dc/elements/1.1/"',
+)
+
+
+def get_record(fields: int, namespaces: bool) -> bytes:
+    """
+    Returns a GetRecord-response with `fields` additional subject- and
+    contributor-elements.
+    """
+    root_ns, dc_ns = NAMESPACES if namespaces else ("", "")
+    extra = "".join(
+        f"""
+                    <dc:subject>Subject {i}</dc:subject>
+                    <dc:contributor role="editor">Mustermann, {i}.</dc:contributor>"""
+        for i in range(fields)
+    )
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<OAI-PMH{root_ns}>
+    <responseDate>2023-09-12T06:45:12Z</responseDate>
+    <request verb="GetRecord">https://repositorium.uni-muenster.de/oai/miami</request>
+    <GetRecord>
+        <record>
+            <header>
+                <identifier>oai:wwu.de:xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx</identifier>
+                <datestamp>2023-09-12T06:45:12Z</datestamp>
+            </header>
+            <metadata>
+                <oai_dc:dc{dc_ns}>
+                    <dc:title xml:lang="de">This is a test</dc:title>
+                    <dc:creator>Mustermann, M.</dc:creator>
+                    <dc:creator>Mustermann, E.</dc:creator>
+                    <dc:rights>info:eu-repo/semantics/openAccess</dc:rights>
+                    <dc:identifier>urn:nbn:de:hbz:x-xxxxxxxxxxx</dc:identifier>
+                    <dc:identifier>https://repositorium.uni-muenster.de/transfer/miami/x.pdf</dc:identifier>{extra}
+                </oai_dc:dc>
+            </metadata>
+        </record>
+    </GetRecord>
+</OAI-PMH>
+""".encode("utf-8")
+
+
+def main() -> None:
+    """Run benchmark and print results."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "-n", "--number", type=int, default=2000,
+        help="number of records per measurement (default 2000)"
+    )
+    args = parser.parse_args()
+
+    if not LXML_AVAILABLE:
+        print("lxml is not installed, engine 'lxml' uses 'xmltodict'")
+
+    mapper = MiamiMetadataMapper()
+    paths = mapper.SOURCE_PATHS
+    converters = {
+        engine: OAIPMHMetadataConverter(engine=engine) for engine in ENGINES
+    }
+    for fields in (0, 10, 100):
+        for namespaces in (False, True):
+            record = get_record(fields, namespaces)
+            expected = mapper.get_all_metadata(
+                converters["xmltodict"].get_dict(record)
+            )
+            results = {}
+            for engine, converter in converters.items():
+                for projected in (None, paths):
+                    assert mapper.get_all_metadata(
+                        converter.get_dict(record, paths=projected)
+                    ) == expected
+                    results[
+                        engine + ("/projected" if projected else "")
+                    ] = min(timeit.repeat(
+                        lambda c=converter, p=projected:
+                            c.get_dict(record, paths=p),
+                        number=args.number, repeat=5
+                    ))
+            reference = results["xmltodict"]
+            print(
+                f"{len(record):>7} bytes, "
+                f"namespaces: {'yes' if namespaces else 'no'}"
+            )
+            for name, seconds in results.items():
+                print(
+                    f"    {name:<22}{args.number / seconds:>8.0f} records/s "
+                    f"({reference / seconds:.2f}x)"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark for the encoders of mapped metadata (see
+dcm_metadata_pipeline.encoders) on records of the miami- and
+OPUS-mappers.
+
+Maps synthetic records (see benchmarks.synthetic) once and compares
+the encoders with one write-call per record (baseline
+`json.dumps` + write) and with batched writes into a reused buffer
+(RecordWriter); reports records/s and MiB/s of encoded output.
+
+Run with `python -m benchmarks.bench_encoders`.
+"""
+
+from typing import Any, Callable
+import argparse
+import json
+import os
+import time
+
+from benchmarks.synthetic import RecordShape, get_list_response
+from lzvnrw_converter.oaipmh_converter import OAIPMHMetadataConverter
+from lzvnrw_mapper import registry
+from dcm_metadata_pipeline.encoders import \
+    ENCODERS, RecordWriter, get_encoder
+
+
+# aliases of the benchmarked mappers
+MAPPERS = ("miami", "hbz-opus", "whge-opus", "hfm-opus")
+
+
+def best_of(function: Callable[[], Any], repeat: int) -> float:
+    """Returns the shortest duration of `repeat` calls in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    """Run benchmark and print results."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "-n", "--number", type=int, default=10000,
+        help="number of records per mapper (default 10000)"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5,
+        help="number of repetitions (default 5)"
+    )
+    args = parser.parse_args()
+
+    converter = OAIPMHMetadataConverter()
+    records = [
+        record
+        for start in range(0, args.number, 100)
+        for record in converter.iter_dicts(
+            get_list_response(start, min(100, args.number - start),
+                              RecordShape())
+        )
+    ]
+
+    with open(os.devnull, "wb") as output:
+        for alias in MAPPERS:
+            mapper = registry.get(alias)()
+            mapped = [mapper.get_all_metadata(record) for record in records]
+
+            def encode_json(metadata):
+                return json.dumps(metadata).encode("utf-8") + b"\n"
+
+            def unbatched():
+                for metadata in mapped:
+                    output.write(encode_json(metadata))
+
+            candidates = {
+                "json.dumps (unbatched)": (unbatched, encode_json)
+            }
+            for name in ENCODERS:
+                try:
+                    encoder = get_encoder(name)
+                except ImportError:
+                    continue
+
+                def batched(name=name):
+                    with RecordWriter(output, name) as writer:
+                        writer.write_all(mapped)
+                candidates[f"{name} (batched)"] = (batched, encoder.encode)
+
+            print(f"{alias} ({len(mapped)} records)")
+            for label, (function, encode) in candidates.items():
+                size = sum(len(encode(metadata)) for metadata in mapped)
+                seconds = best_of(function, args.repeat)
+                print(
+                    f"  {label:<24}{len(mapped) / seconds:>10.0f} records/s"
+                    f"{size / seconds / 2**20:>8.1f} MiB/s"
+                )
+
+
+if __name__ == "__main__":
+    main()
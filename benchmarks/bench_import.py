@@ -0,0 +1,66 @@
+"""
+Benchmark for the import time of the lzvnrw-mappers, comparing the
+eager import of all mapper-modules with the lazy lookup via the
+registry (`python -X importtime`).
+
+Run with `python -m benchmarks.bench_import`.
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+
+SCENARIOS = {
+    "eager (import all mapper-modules)":
+        "import lzvnrw_mapper.miami, lzvnrw_mapper.hbz_opus, "
+        + "lzvnrw_mapper.whge_opus, lzvnrw_mapper.hfm_opus",
+    "lazy (registry only)":
+        "from lzvnrw_mapper import registry",
+    "lazy (registry and one mapper)":
+        "from lzvnrw_mapper import registry; registry.get('miami')",
+}
+
+
+def importtime(statement: str) -> int:
+    """
+    Returns the cumulative import time in microseconds of all
+    top-level imports that are caused by `statement`.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True, text=True, check=True
+    )
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, package = line[len("import time:"):].split("|")
+        # only count top-level entries (no indentation)
+        if not package.startswith("  "):
+            total += int(cumulative)
+    return total
+
+
+def main() -> None:
+    """Run benchmark and print results."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "-n", "--number", type=int, default=10,
+        help="number of measurements per scenario (default 10)"
+    )
+    args = parser.parse_args()
+
+    baseline = statistics.median(
+        importtime("pass") for _ in range(args.number)
+    )
+    for name, statement in SCENARIOS.items():
+        median = statistics.median(
+            importtime(statement) for _ in range(args.number)
+        )
+        print(f"{name:<36}{(median - baseline) / 1000:>8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
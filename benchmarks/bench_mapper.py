@@ -0,0 +1,130 @@
+"""
+Micro-benchmark for the metadata mappers of the lzvnrw_mapper-package.
+
+Compares the compiled accessors of the factory-generated classes
+(individual get_metadata-calls and batch-evaluation via
+get_all_metadata) with a reference of the previous (interpreted)
+lookup of the linear map.
+
+Run with `python -m benchmarks.bench_mapper`.
+"""
+
+from typing import Any, Optional
+import argparse
+import timeit
+
+from dcm_common.util import NestedDict, value_from_dict_path
+
+from dcm_metadata_mapper.mapper_interface import MapperInterface
+from lzvnrw_converter.oaipmh_converter import OAIPMHMetadataConverter
+from lzvnrw_mapper.miami import MiamiMetadataMapper
+from lzvnrw_mapper.hbz_opus import HbzOpusMetadataMapper
+from lzvnrw_mapper.whge_opus import WhgeOpusMetadataMapper
+
+
+KEYS = [
+    "Origin-System-Identifier",
+    "External-Identifier",
+    "DC-Creator",
+    "DC-Title",
+    "DC-Rights",
+    "DC-Terms-Identifier",
+    "Source-Organization",
+    "transfer-urls",
+]
+
+RECORD = """<OAI-PMH>
+    <GetRecord>
+        <record>
+            <header>
+                <identifier>oai:wwu.de:xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx</identifier>
+            </header>
+            <metadata>
+                <oai_dc:dc>
+                    <dc:title xml:lang="de">This is a test</dc:title>
+                    <dc:creator>Mustermann, M.</dc:creator>
+                    <dc:creator>Mustermann, E.</dc:creator>
+                    <dc:rights>info:eu-repo/semantics/openAccess</dc:rights>
+                    <dc:identifier>https://nbn-resolving.org/urn:nbn:de:hbz:x-xxxxxxxxxxx</dc:identifier>
+                    <dc:identifier>urn:nbn:de:hbz:x-xxxxxxxxxxx</dc:identifier>
+                    <dc:identifier>10.11111/xxxxxxxxxxx</dc:identifier>
+                    <dc:identifier>https://repositorium.uni-muenster.de/transfer/miami/x.pdf</dc:identifier>
+                    <dc:identifier>https://hbz.opus.hbz-nrw.de/files/xx/x.pdf</dc:identifier>
+                    <dc:identifier>https://whge.opus.hbz-nrw.de/files/xx/x.pdf</dc:identifier>
+                </oai_dc:dc>
+            </metadata>
+        </record>
+    </GetRecord>
+</OAI-PMH>
+"""
+
+
+def reference_get_metadata(
+    mapper: MapperInterface, key: str, source_metadata: NestedDict
+) -> Optional[Any]:
+    """
+    Reference implementation of the previous (non-compiled) lookup in
+    MetadataMapper.get_metadata.
+    """
+    if key.lower() in mapper.linear_map:
+        entry = mapper.linear_map[key.lower()]
+        if "value" in entry:
+            return entry["value"]
+        value = value_from_dict_path(
+            nesteddict=source_metadata, path=entry["path"]
+        )
+        if "post-process" in entry:
+            value = entry["post-process"](value)
+        return value
+    if key.lower() in mapper._nonlinear_map:
+        return mapper._nonlinear_map[key.lower()](source_metadata)
+    return None
+
+
+def main() -> None:
+    """Run benchmark and print results."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "-n", "--number", type=int, default=20000,
+        help="number of records per measurement (default 20000)"
+    )
+    args = parser.parse_args()
+
+    source_metadata = OAIPMHMetadataConverter().get_dict(RECORD)
+    for mapper_class in (
+        MiamiMetadataMapper, HbzOpusMetadataMapper, WhgeOpusMetadataMapper
+    ):
+        mapper = mapper_class()
+        for key in KEYS:
+            assert mapper.get_metadata(key, source_metadata) \
+                == reference_get_metadata(mapper, key, source_metadata)
+
+        reference = min(timeit.repeat(
+            lambda: [
+                reference_get_metadata(mapper, key, source_metadata)
+                for key in KEYS
+            ],
+            number=args.number, repeat=5
+        ))
+        compiled = min(timeit.repeat(
+            lambda: [
+                mapper.get_metadata(key, source_metadata) for key in KEYS
+            ],
+            number=args.number, repeat=5
+        ))
+        batch = min(timeit.repeat(
+            lambda: mapper.get_all_metadata(source_metadata),
+            number=args.number, repeat=5
+        ))
+        print(
+            f"{mapper.MAPPER_TAG:<28}"
+            f"reference: {args.number / reference:>10.0f} records/s  "
+            f"compiled: {args.number / compiled:>10.0f} records/s "
+            f"({reference / compiled:.2f}x)  "
+            f"batch: {args.number / batch:>10.0f} records/s "
+            f"({reference / batch:.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
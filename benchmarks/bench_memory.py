@@ -0,0 +1,99 @@
+"""
+Memory-benchmark for the representation of converted records, comparing
+the dictionaries of the converter with the compact representation
+(see lzvnrw_converter.compact).
+
+Converts a number of synthetic records (see benchmarks.synthetic) with
+and without `compact=True` and reports the memory that is allocated by
+the retained records (measured with tracemalloc) and the conversion
+throughput (slowed down by tracemalloc; use bench_throughput for
+absolute numbers).
+
+Run with `python -m benchmarks.bench_memory`.
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+from benchmarks.synthetic import RecordShape, get_list_response
+from lzvnrw_converter.compact import thaw
+from lzvnrw_converter.oaipmh_converter import OAIPMHMetadataConverter
+from lzvnrw_mapper import registry
+
+
+def convert(
+    pages: list[bytes], compact: bool
+) -> tuple[list, int, float]:
+    """
+    Returns a tuple of the converted records of `pages`, the allocated
+    memory of these records in bytes, and the conversion time in
+    seconds.
+    """
+    converter = OAIPMHMetadataConverter(compact=compact)
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    records = [
+        record for page in pages for record in converter.iter_dicts(page)
+    ]
+    seconds = time.perf_counter() - start
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return records, size, seconds
+
+
+def main() -> None:
+    """Run benchmark and print results."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "-n", "--number", type=int, default=10000,
+        help="number of records (default 10000)"
+    )
+    parser.add_argument(
+        "--creators", type=int, default=2,
+        help="number of creators per record (default 2)"
+    )
+    parser.add_argument(
+        "--identifiers", type=int, default=8,
+        help="number of identifiers per record (default 8)"
+    )
+    args = parser.parse_args()
+
+    shape = RecordShape(creators=args.creators, identifiers=args.identifiers)
+    pages = [
+        get_list_response(start, min(100, args.number - start), shape)
+        for start in range(0, args.number, 100)
+    ]
+    # warm-up (e.g. shared indices of the compact representation)
+    convert(pages[:1], True)
+
+    records, size, seconds = convert(pages, False)
+    compact_records, compact_size, compact_seconds = convert(pages, True)
+
+    mapper = registry.get("miami")()
+    for record, compact_record in zip(records[:100], compact_records):
+        assert thaw(compact_record) == record
+        assert thaw(mapper.get_all_metadata(compact_record)) \
+            == mapper.get_all_metadata(record)
+
+    for name, size_, seconds_ in (
+        ("dict", size, seconds),
+        ("compact", compact_size, compact_seconds),
+    ):
+        print(
+            f"{name:<10}{size_ / 2**20:>8.1f} MiB per {args.number} records"
+            f"{size_ / args.number:>8.0f} bytes/record"
+            f"{args.number / seconds_:>10.0f} records/s"
+        )
+    print(
+        f"compact representation saves {1 - compact_size / size:.0%} "
+        f"({(size - compact_size) / 2**20:.1f} MiB per {args.number} "
+        "records)"
+    )
+
+
+if __name__ == "__main__":
+    main()
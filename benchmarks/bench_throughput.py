@@ -0,0 +1,257 @@
+"""
+Throughput-benchmark for converter, mappers, and end-to-end conversion
+and mapping based on synthetic records (see benchmarks.synthetic).
+
+Every scenario runs in a separate process and reports records/s and
+the peak resident set size (RSS) of that process. The results can be
+written to a JSON-file and compared to a previous run (baseline); the
+benchmark exits with status 1 if the throughput of a scenario dropped
+by more than the given tolerance.
+
+Run with `python -m benchmarks.bench_throughput`, e.g.
+python -m benchmarks.bench_throughput --output baseline.json
+python -m benchmarks.bench_throughput --baseline baseline.json
+"""
+
+from typing import Any, Callable
+import argparse
+import gzip
+import json
+import resource
+import subprocess
+import sys
+import time
+
+from benchmarks.synthetic import \
+    RecordShape, get_list_response, get_record_response
+from lzvnrw_converter.compression import zstandard
+from lzvnrw_converter.oaipmh_converter import OAIPMHMetadataConverter
+from lzvnrw_mapper import registry
+
+
+# aliases of the benchmarked mappers
+MAPPERS = ("miami", "hbz-opus", "whge-opus", "hfm-opus")
+# compressions of the input
+COMPRESS = {
+    None: lambda data: data,
+    "gzip": gzip.compress,
+    "zstd": lambda data: zstandard.ZstdCompressor().compress(data),
+}
+# arguments that determine the synthetic records
+PARAMETERS = ("creators", "identifiers", "size", "namespaces", "page_size")
+
+
+def get_scenarios(args: argparse.Namespace) -> dict[str, Callable]:
+    """
+    Returns a mapping of scenario names and setup-functions. A
+    setup-function returns a tuple of the number of records processed
+    per call and the benchmarked function.
+    """
+    shape = RecordShape(
+        creators=args.creators,
+        identifiers=args.identifiers,
+        size=args.size,
+        namespaces=args.namespaces,
+    )
+
+    def get_dict(engine, compression=None):
+        def setup():
+            converter = OAIPMHMetadataConverter(engine=engine)
+            records = [
+                COMPRESS[compression](get_record_response(i, shape))
+                for i in range(100)
+            ]
+            return len(records), lambda: [
+                converter.get_dict(record) for record in records
+            ]
+        return setup
+
+    def iter_dicts(compression=None):
+        def setup():
+            converter = OAIPMHMetadataConverter()
+            page = COMPRESS[compression](
+                get_list_response(0, args.page_size, shape, "token")
+            )
+            # read in chunks like from a file
+            chunks = [
+                page[i:i + 65536] for i in range(0, len(page), 65536)
+            ]
+            return args.page_size, lambda: list(
+                converter.iter_dicts(chunks)
+            )
+        return setup
+
+    def get_all_metadata(alias):
+        def setup():
+            mapper = registry.get(alias)()
+            converter = OAIPMHMetadataConverter()
+            records = [
+                converter.get_dict(get_record_response(i, shape))
+                for i in range(100)
+            ]
+            return len(records), lambda: [
+                mapper.get_all_metadata(record) for record in records
+            ]
+        return setup
+
+    def end_to_end(alias, projected):
+        def setup():
+            mapper = registry.get(alias)()
+            converter = OAIPMHMetadataConverter()
+            paths = mapper.SOURCE_PATHS if projected else None
+            page = get_list_response(0, args.page_size, shape, "token")
+            return args.page_size, lambda: [
+                mapper.get_all_metadata(record)
+                for record in converter.iter_dicts(page, paths=paths)
+            ]
+        return setup
+
+    scenarios = {
+        "converter/get_dict": get_dict("xmltodict"),
+        "converter/get_dict (lxml)": get_dict("lxml"),
+        "converter/get_dict (gzip)": get_dict("xmltodict", "gzip"),
+        "converter/get_dict (zstd)": get_dict("xmltodict", "zstd"),
+        "converter/iter_dicts": iter_dicts(),
+        "converter/iter_dicts (gzip)": iter_dicts("gzip"),
+        "converter/iter_dicts (zstd)": iter_dicts("zstd"),
+    }
+    for alias in MAPPERS:
+        scenarios[f"mapper/{alias}"] = get_all_metadata(alias)
+    for alias in MAPPERS:
+        scenarios[f"end-to-end/{alias}"] = end_to_end(alias, False)
+        scenarios[f"end-to-end/{alias} (projected)"] = \
+            end_to_end(alias, True)
+    return scenarios
+
+
+def peak_rss() -> int:
+    """Returns the peak RSS of the current process in bytes."""
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def run_scenario(args: argparse.Namespace) -> dict[str, Any]:
+    """
+    Runs the scenario `args.scenario` in the current process and
+    returns its result.
+    """
+    records, function = get_scenarios(args)[args.scenario]()
+    function()  # warm-up
+    best = float("inf")
+    count = 0
+    deadline = time.perf_counter() + args.duration
+    while count < 3 or time.perf_counter() < deadline:
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+        count += 1
+    return {
+        "records_per_second": records / best,
+        "peak_rss": peak_rss(),
+    }
+
+
+def main() -> None:
+    """Run benchmark and print results."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--creators", type=int, default=2,
+        help="number of creators per record (default 2)"
+    )
+    parser.add_argument(
+        "--identifiers", type=int, default=8,
+        help="number of identifiers per record (default 8)"
+    )
+    parser.add_argument(
+        "--size", type=int, default=0,
+        help="minimum record size in bytes (default 0)"
+    )
+    parser.add_argument(
+        "--namespaces", action="store_true",
+        help="declare XML-namespaces in the records"
+    )
+    parser.add_argument(
+        "--page-size", type=int, default=100,
+        help="number of records per ListRecords-page (default 100)"
+    )
+    parser.add_argument(
+        "--duration", type=float, default=1.0,
+        help="minimum duration per scenario in seconds (default 1.0)"
+    )
+    parser.add_argument(
+        "-k", "--filter", default="",
+        help="only run scenarios containing this string"
+    )
+    parser.add_argument(
+        "--output", help="write results to this JSON-file"
+    )
+    parser.add_argument(
+        "--baseline", help="compare results to this JSON-file"
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2,
+        help="tolerated relative throughput decrease compared to the "
+        + "baseline (default 0.2)"
+    )
+    parser.add_argument("--scenario", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario is not None:
+        print(json.dumps(run_scenario(args)))
+        return
+
+    parameters = {
+        key: value for key, value in vars(args).items()
+        if key in PARAMETERS
+    }
+    baseline = {}
+    if args.baseline is not None:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+        if baseline["parameters"] != parameters:
+            print(
+                "Warning: parameters differ from baseline "
+                + f"({baseline['parameters']})"
+            )
+        baseline = baseline["results"]
+
+    results = {}
+    regressions = []
+    for name in get_scenarios(args):
+        if args.filter not in name:
+            continue
+        result = json.loads(
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_throughput"]
+                + sys.argv[1:] + ["--scenario", name],
+                check=True, capture_output=True, text=True
+            ).stdout
+        )
+        results[name] = result
+        line = (
+            f"{name:<36}{result['records_per_second']:>10.0f} records/s"
+            f"{result['peak_rss'] / 2**20:>8.1f} MiB peak RSS"
+        )
+        if name in baseline:
+            ratio = result["records_per_second"] \
+                / baseline[name]["records_per_second"]
+            line += f"  ({ratio:.2f}x baseline)"
+            if ratio < 1 - args.tolerance:
+                regressions.append(name)
+        print(line, flush=True)
+
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(
+                {"parameters": parameters, "results": results},
+                file,
+                indent=2,
+            )
+    if regressions:
+        print(f"Throughput regression: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Generator for synthetic OAI-PMH responses (GetRecord and ListRecords)
+with a configurable number of creators and identifiers and a
+configurable record size.
+"""
+
+from typing import Optional
+from dataclasses import dataclass
+
+
+# transfer-URLs recognized by the lzvnrw-mappers
+TRANSFER_URLS = (
+    "https://repositorium.uni-muenster.de/transfer/miami/{}.pdf",
+    "https://hbz.opus.hbz-nrw.de/files/{}/x.pdf",
+    "https://whge.opus.hbz-nrw.de/files/{}/x.pdf",
+    "https://opus.hfm-detmold.de/files/{}/x.pdf",
+)
+NAMESPACES = (
+    ' xmlns="http://www.openarchives.org/OAI/2.0/"',
+    ' xmlns:oai_dc="http://www.openarchives.org/OAI/2.0/oai_dc/"'
+    ' xmlns:dc="http://purl.org/dc/elements/1.1/"',
+)
+
+
+@dataclass(frozen=True)
+class RecordShape:
+    """
+    Shape of synthetic records.
+
+    Keyword arguments:
+    creators -- number of dc:creator-elements (default 2)
+    identifiers -- number of dc:identifier-elements; cycles through
+                   URN, DOI, handle, and the transfer-URLs of all
+                   lzvnrw-repositories (default 8)
+    size -- minimum size of the record-element in bytes (padded with
+            dc:description-elements) (default 0)
+    namespaces -- whether to declare the XML-namespaces (default False)
+    deleted -- every `deleted`-th record is deleted; 0 disables
+               deleted records (default 0)
+    """
+    creators: int = 2
+    identifiers: int = 8
+    size: int = 0
+    namespaces: bool = False
+    deleted: int = 0
+
+
+def get_identifiers(index: int, count: int) -> list[str]:
+    """Returns `count` identifiers of different classes."""
+    candidates = (
+        f"urn:nbn:de:hbz:6-{index:011d}",
+        f"10.17879/{index:011d}",
+        f"https://hdl.handle.net/10.1000/{index}",
+        f"https://nbn-resolving.org/urn:nbn:de:hbz:6-{index:011d}",
+    ) + tuple(url.format(index) for url in TRANSFER_URLS)
+    return [candidates[i % len(candidates)] for i in range(count)]
+
+
+def get_record(index: int, shape: RecordShape = RecordShape()) -> str:
+    """
+    Returns the record-element of the synthetic record `index`.
+
+    Keyword arguments:
+    index -- index of the record (determines identifiers and content)
+    shape -- shape of the record (default RecordShape())
+    """
+    deleted = shape.deleted > 0 \
+        and index % shape.deleted == shape.deleted - 1
+    header = f"""<header{' status="deleted"' if deleted else ""}>
+                <identifier>oai:wwu.de:{index:08d}</identifier>
+                <datestamp>2024-01-01T00:00:00Z</datestamp>
+            </header>"""
+    if deleted:
+        return f"""
+        <record>
+            {header}
+        </record>"""
+    elements = [
+        f'<dc:title xml:lang="de">Synthetic record {index}</dc:title>'
+    ]
+    elements.extend(
+        f"<dc:creator>Mustermann, {i}.</dc:creator>"
+        for i in range(shape.creators)
+    )
+    elements.append("<dc:rights>info:eu-repo/semantics/openAccess</dc:rights>")
+    elements.extend(
+        f"<dc:identifier>{identifier}</dc:identifier>"
+        for identifier in get_identifiers(index, shape.identifiers)
+    )
+    record = _record(header, elements, shape)
+    padding = 0
+    while len(record) < shape.size:
+        elements.append(
+            f"<dc:description>{'Lorem ipsum dolor sit amet. ' * 8}"
+            f"{padding}</dc:description>"
+        )
+        padding += 1
+        record = _record(header, elements, shape)
+    return record
+
+
+def get_record_response(
+    index: int, shape: RecordShape = RecordShape()
+) -> bytes:
+    """
+    Returns a GetRecord-response for the synthetic record `index`.
+
+    Keyword arguments:
+    index -- index of the record
+    shape -- shape of the record (default RecordShape())
+    """
+    return _response("GetRecord", get_record(index, shape), shape) \
+        .encode("utf-8")
+
+
+def get_list_response(
+    start: int,
+    page_size: int,
+    shape: RecordShape = RecordShape(),
+    resumption_token: Optional[str] = None
+) -> bytes:
+    """
+    Returns a ListRecords-response with the synthetic records `start`
+    to `start + page_size - 1`.
+
+    Keyword arguments:
+    start -- index of the first record
+    page_size -- number of records
+    shape -- shape of the records (default RecordShape())
+    resumption_token -- value of the resumptionToken-element; None
+                        omits the element (default None)
+    """
+    body = "".join(
+        get_record(index, shape) for index in range(start, start + page_size)
+    )
+    if resumption_token is not None:
+        body += (
+            f'\n        <resumptionToken cursor="{start}">'
+            f"{resumption_token}</resumptionToken>"
+        )
+    return _response("ListRecords", body, shape).encode("utf-8")
+
+
+def _record(header: str, elements: list[str], shape: RecordShape) -> str:
+    """Returns a record-element."""
+    content = "\n                    ".join(elements)
+    return f"""
+        <record>
+            {header}
+            <metadata>
+                <oai_dc:dc{NAMESPACES[1] if shape.namespaces else ""}>
+                    {content}
+                </oai_dc:dc>
+            </metadata>
+        </record>"""
+
+
+def _response(verb: str, body: str, shape: RecordShape) -> str:
+    """Returns an OAI-PMH response."""
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<OAI-PMH{NAMESPACES[0] if shape.namespaces else ""}>
+    <responseDate>2024-01-01T00:00:00Z</responseDate>
+    <request verb="{verb}">https://repositorium.uni-muenster.de/oai</request>
+    <{verb}>{body}
+    </{verb}>
+</OAI-PMH>
+"""
@@ -0,0 +1,302 @@
+"""
+This module contains the declarative definition of mappings (JSON/YAML)
+with a fixed vocabulary of post-processing operations instead of python
+functions.
+
+Format of a mapping (see generate_metadata_mapper_class):
+{
+  "mapper_tag": "Some Metadata Mapper",
+  "spec_version": [0, 3, 2, ""],
+  "use_standard_linear_map": true,
+  "linear_map": {
+    "source-organization": {"value": "https://d-nb.info/gnd/..."},
+    "transfer-urls": {
+      "path": ["metadata", "oai_dc:dc", "dc:identifier"],
+      "post-process": [
+        {"op": "filter-identifier-class", "classes": ["url"]},
+        {"op": "filter-contains", "value": "https://..."}
+      ]
+    }
+  }
+}
+
+Post-processing operations (None is passed through by all operations;
+list-operations treat a single string as list with one entry and ignore
+non-string entries):
+* "rsplit": `value.rsplit(separator, maxsplit)[index]`; parameters
+  "separator" (default None), "maxsplit" (default -1), "index"
+  (default -1)
+* "split": like "rsplit" but with `str.split`
+* "strip": strip string or strings in list; parameter "characters"
+  (default None)
+* "first": first element of a list (None for empty list); other values
+  are returned unchanged
+* "filter-contains": entries that contain the substring "value"
+* "filter-regex": entries matching (re.search) the regular expression
+  "pattern"; parameter "ignore-case" (default false)
+* "filter-identifier-class": entries of the given identifier-"classes"
+  (see identifier_classifier)
+Operations without parameters can also be given as plain string.
+"""
+
+from typing import Any, Callable, Iterable, Mapping
+from functools import partial
+from pathlib import Path
+from types import MappingProxyType
+import json
+import re
+
+from dcm_metadata_mapper.identifier_classifier import IDENTIFIER_CLASSIFIER
+
+
+def _as_list(value: Any) -> list[str]:
+    """Returns the string-entries of `value` as list."""
+    if isinstance(value, str):
+        return [value]
+    return [entry for entry in value if isinstance(entry, str)]
+
+
+def _rsplit(value, separator=None, maxsplit=-1, index=-1):
+    return value.rsplit(separator, maxsplit)[index]
+
+
+def _split(value, separator=None, maxsplit=-1, index=-1):
+    return value.split(separator, maxsplit)[index]
+
+
+def _strip(value, characters=None):
+    if isinstance(value, str):
+        return value.strip(characters)
+    return [
+        entry.strip(characters) if isinstance(entry, str) else entry
+        for entry in value
+    ]
+
+
+def _first(value):
+    if isinstance(value, (list, tuple)):
+        return value[0] if value else None
+    return value
+
+
+def _filter_contains(value, substring):
+    return [entry for entry in _as_list(value) if substring in entry]
+
+
+def _filter_regex(value, pattern):
+    return [entry for entry in _as_list(value) if pattern.search(entry)]
+
+
+def _filter_identifier_class(value, classes):
+    return IDENTIFIER_CLASSIFIER.filter(value, *classes)
+
+
+def _compile_filter_regex(pattern, **parameters):
+    # "ignore-case" is no valid identifier, i.e. it is checked here
+    ignore_case = parameters.pop("ignore-case", False)
+    if parameters:
+        raise TypeError(
+            f"Unexpected parameter(s) {', '.join(sorted(parameters))}."
+        )
+    if not isinstance(ignore_case, bool):
+        raise TypeError("Parameter 'ignore-case' has to be a boolean.")
+    return partial(
+        _filter_regex,
+        pattern=re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+    )
+
+
+def _compile_filter_identifier_class(classes):
+    unknown = set(classes) - set(IDENTIFIER_CLASSIFIER.classes)
+    if unknown:
+        raise ValueError(
+            f"Unknown identifier-class(es) {', '.join(sorted(unknown))}."
+        )
+    return partial(_filter_identifier_class, classes=tuple(classes))
+
+
+# operation-names and functions to create the corresponding callable
+# from the operation's parameters
+OPERATIONS: dict[str, Callable[..., Callable[[Any], Any]]] = {
+    "rsplit": lambda separator=None, maxsplit=-1, index=-1: partial(
+        _rsplit, separator=separator, maxsplit=maxsplit, index=index
+    ),
+    "split": lambda separator=None, maxsplit=-1, index=-1: partial(
+        _split, separator=separator, maxsplit=maxsplit, index=index
+    ),
+    "strip": lambda characters=None: partial(
+        _strip, characters=characters
+    ),
+    "first": lambda: _first,
+    "filter-contains": lambda value: partial(
+        _filter_contains, substring=value
+    ),
+    "filter-regex": _compile_filter_regex,
+    "filter-identifier-class": _compile_filter_identifier_class,
+}
+
+
+class PostProcess:
+    """
+    Callable post-processing defined as sequence of operations (see
+    OPERATIONS). Unlike lambdas, instances can be pickled and compared
+    by their definition.
+
+    Keyword arguments:
+    spec -- list of operations; every operation is either a string
+            (operation without parameters) or a dictionary with the
+            operation's name in "op" and its parameters
+    """
+
+    def __init__(self, spec: Iterable[str | Mapping[str, Any]]) -> None:
+        self.spec = tuple(
+            ({"op": operation} if isinstance(operation, str)
+             else dict(operation))
+            for operation in spec
+        )
+        self._operations = tuple(
+            self._compile_operation(operation) for operation in self.spec
+        )
+
+    @staticmethod
+    def _compile_operation(operation: dict[str, Any]) -> Callable:
+        """Returns the callable for a single operation."""
+        parameters = dict(operation)
+        name = parameters.pop("op", None)
+        if name not in OPERATIONS:
+            raise ValueError(
+                f"Unknown post-process operation '{name}', expected one of "
+                + f"{', '.join(OPERATIONS)}."
+            )
+        try:
+            return OPERATIONS[name](**parameters)
+        except TypeError as exc_info:
+            raise ValueError(
+                f"Bad parameters for post-process operation '{name}': "
+                + f"{parameters}."
+            ) from exc_info
+
+    def __call__(self, value: Any) -> Any:
+        for operation in self._operations:
+            if value is None:
+                return None
+            value = operation(value)
+        return value
+
+    @property
+    def fingerprint(self) -> str:
+        """Hashable representation of the definition."""
+        return json.dumps(self.spec, sort_keys=True)
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, PostProcess):
+            return NotImplemented
+        return self.fingerprint == other.fingerprint
+
+    def __hash__(self) -> int:
+        return hash(self.fingerprint)
+
+    def __repr__(self) -> str:
+        return f"PostProcess({list(self.spec)})"
+
+    def __reduce__(self):
+        return (PostProcess, (self.spec,))
+
+
+def compile_linear_map(
+    linear_map: Mapping[str, Mapping[str, Any]]
+) -> dict[str, dict[str, Any]]:
+    """
+    Returns a copy of a declarative linear map in which the
+    "post-process"-definitions are replaced by PostProcess-objects
+    (callables are kept).
+
+    Keyword arguments:
+    linear_map -- linear map with entries consisting of "value" or
+                  "path" and "post-process" (see
+                  generate_metadata_mapper_class)
+    """
+    compiled = {}
+    for key, entry in linear_map.items():
+        unknown = set(entry) - {"value", "path", "post-process"}
+        if unknown or ("value" not in entry and "path" not in entry):
+            raise ValueError(
+                f"Bad linear map-entry for '{key}': expected 'value' or "
+                + "'path' (and optionally 'post-process'), got "
+                + f"{', '.join(map(repr, entry))}."
+            )
+        compiled[key] = dict(entry)
+        if "path" in entry:
+            compiled[key]["path"] = list(entry["path"])
+        if "post-process" in entry and not callable(entry["post-process"]):
+            compiled[key]["post-process"] = PostProcess(entry["post-process"])
+    return compiled
+
+
+def freeze_linear_map(
+    linear_map: Mapping[str, Mapping[str, Any]]
+) -> Mapping[str, Mapping[str, Any]]:
+    """
+    Returns a read-only copy of a (compiled) linear map: the map and
+    its entries are MappingProxyTypes and paths are tuples.
+
+    Keyword arguments:
+    linear_map -- linear map (see compile_linear_map)
+    """
+    return MappingProxyType(
+        {
+            key: MappingProxyType(
+                dict(entry) | (
+                    {"path": tuple(entry["path"])} if "path" in entry
+                    else {}
+                )
+            )
+            for key, entry in linear_map.items()
+        }
+    )
+
+
+def load_mapping(source: str | Path | Mapping[str, Any]) -> dict[str, Any]:
+    """
+    Returns the keyword arguments for generate_metadata_mapper_class
+    from a declarative mapping.
+
+    Keyword arguments:
+    source -- path to a JSON- or YAML-file (suffix ".yaml" or ".yml";
+              requires PyYAML) or already parsed mapping
+    """
+    if isinstance(source, Mapping):
+        mapping = dict(source)
+    else:
+        path = Path(source)
+        text = path.read_text(encoding="utf-8")
+        if path.suffix.lower() in (".yaml", ".yml"):
+            try:
+                # pylint: disable-next=import-outside-toplevel
+                import yaml
+            except ImportError as exc_info:
+                raise ImportError(
+                    "Loading YAML-mappings requires the package 'PyYAML' "
+                    + "(install with 'pip install dcm-metadata-mapper[yaml]')."
+                ) from exc_info
+            mapping = yaml.safe_load(text)
+        else:
+            mapping = json.loads(text)
+
+    unknown = set(mapping) - {
+        "mapper_tag", "spec_version", "linear_map", "use_standard_linear_map"
+    }
+    if unknown or "mapper_tag" not in mapping \
+            or "spec_version" not in mapping:
+        raise ValueError(
+            "Bad mapping: requires 'mapper_tag' and 'spec_version', "
+            + "optionally 'linear_map' and 'use_standard_linear_map'"
+            + (f"; unknown: {', '.join(sorted(unknown))}." if unknown else ".")
+        )
+    return {
+        "mapper_tag": mapping["mapper_tag"],
+        "spec_version": tuple(mapping["spec_version"]),
+        "linear_map": compile_linear_map(mapping.get("linear_map") or {}),
+        "use_standard_linear_map":
+            mapping.get("use_standard_linear_map", False),
+    }
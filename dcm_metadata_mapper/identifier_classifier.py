@@ -0,0 +1,153 @@
+"""
+This module contains a classifier for identifiers (e.g. the entries of
+dc:identifier) based on precompiled regular expressions.
+"""
+
+from typing import Any, Optional, Iterable, Mapping
+import re
+
+
+# identifier-classes
+DOI = "doi"
+URN_NBN = "urn-nbn"
+HANDLE = "handle"
+URL = "url"
+
+# patterns (searched case-insensitively) of the identifier-classes;
+# classes are not exclusive, e.g. a resolver-URL for an URN is both URL
+# and URN_NBN
+IDENTIFIER_PATTERNS: dict[str, str] = {
+    DOI: r"10\.\d{4,9}\/[-._;()/:A-Z0-9]+",
+    URN_NBN: r"urn:nbn",
+    HANDLE: r"hdl\.handle\.net/|^hdl:",
+    URL: r"https?://",
+}
+
+
+class IdentifierClassifier:
+    """
+    Classifier for identifiers.
+
+    Every identifier is matched against the patterns once: the classes
+    of an entry are determined in a single pass and cached by the
+    identifier-string (bounded by `cache_size` entries). Subsequent
+    calls of `partition` or `filter` with the same identifiers (e.g. by
+    the post-processing of different keys of a mapper that refer to
+    the same source) reuse that result; since the cache is keyed by the
+    (immutable) strings, changes to a list are always taken into
+    account.
+
+    Keyword arguments:
+    patterns -- mapping of class-names and regular expressions
+                (default IDENTIFIER_PATTERNS)
+    flags -- flags for the compilation of the patterns
+             (default re.IGNORECASE)
+    cache_size -- maximum number of cached classifications; the cache
+                  is cleared when it is full (default 4096)
+    """
+
+    def __init__(
+        self,
+        patterns: Optional[Mapping[str, str]] = None,
+        flags: int = re.IGNORECASE,
+        cache_size: int = 4096
+    ) -> None:
+        self._patterns = tuple(
+            (name, re.compile(pattern, flags))
+            for name, pattern in (patterns or IDENTIFIER_PATTERNS).items()
+        )
+        self._bits = {
+            name: 1 << index for index, (name, _) in enumerate(self._patterns)
+        }
+        self._cache: dict[str, int] = {}
+        self._cache_size = cache_size
+
+    @property
+    def classes(self) -> tuple[str, ...]:
+        """Names of the identifier-classes."""
+        return tuple(self._bits)
+
+    def _classify(self, identifiers: Any) -> list[tuple[str, int]]:
+        """
+        Returns a list of (identifier, bitmask of classes) for all
+        entries of `identifiers` that are strings (a single string is
+        treated as a list with one entry).
+        """
+        if isinstance(identifiers, str):
+            identifiers = [identifiers]
+        cache = self._cache
+        result = []
+        for entry in identifiers:
+            if not isinstance(entry, str):
+                continue
+            mask = cache.get(entry)
+            if mask is None:
+                mask = 0
+                bit = 1
+                for _, pattern in self._patterns:
+                    if pattern.search(entry):
+                        mask |= bit
+                    bit <<= 1
+                # single dict-operations are atomic, i.e. the cache can
+                # be shared by threads
+                if len(cache) >= self._cache_size:
+                    cache.clear()
+                cache[entry] = mask
+            result.append((entry, mask))
+        return result
+
+    def partition(
+        self, identifiers: Optional[Iterable[Optional[str]] | str]
+    ) -> Optional[dict[str, list[str]]]:
+        """
+        Returns a dictionary of class-names and the identifiers that
+        belong to the respective class (or None if `identifiers` is
+        None).
+
+        Keyword arguments:
+        identifiers -- single identifier or list of identifiers; None-
+                       entries are ignored
+        """
+        if identifiers is None:
+            return None
+        result = {name: [] for name in self._bits}
+        for entry, mask in self._classify(identifiers):
+            for name, bit in self._bits.items():
+                if mask & bit:
+                    result[name].append(entry)
+        return result
+
+    def filter(
+        self,
+        identifiers: Optional[Iterable[Optional[str]] | str],
+        *classes: str,
+        contains: Optional[str] = None
+    ) -> Optional[list[str]]:
+        """
+        Returns a list of those identifiers that belong to any of the
+        given classes (or None if `identifiers` is None). The order of
+        `identifiers` is preserved.
+
+        Keyword arguments:
+        identifiers -- single identifier or list of identifiers; None-
+                       entries are ignored
+        classes -- names of identifier-classes
+        contains -- additionally require identifiers to contain this
+                    substring (default None)
+        """
+        if identifiers is None:
+            return None
+        try:
+            selection = sum(self._bits[name] for name in set(classes))
+        except KeyError as exc_info:
+            raise ValueError(
+                f"Unknown identifier-class {exc_info}."
+            ) from exc_info
+        return [
+            entry for entry, mask in self._classify(identifiers)
+            if mask & selection and (contains is None or contains in entry)
+        ]
+
+
+# shared classifier-instance for the mapper-definitions
+IDENTIFIER_CLASSIFIER = IdentifierClassifier()
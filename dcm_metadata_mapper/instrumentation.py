@@ -0,0 +1,130 @@
+"""
+This module contains an optional instrumentation of mappers and
+converters that records call counts, cumulative time, and error counts
+per operation and key.
+"""
+
+from typing import Any, Callable
+from threading import Lock
+from time import perf_counter_ns
+
+
+class Instrumentation:
+    """
+    Collector for call counts, cumulative time, and error counts of
+    instrumented functions, identified by an operation (e.g. "linear")
+    and a key (e.g. "dc-title").
+
+    Mappers and converters accept an instance as keyword argument
+    `instrumentation`; without it, they are not instrumented at all
+    (i.e. there is no overhead). Operations:
+    get_dict -- conversion of a document (key: CONVERTER_TAG)
+    iter_dicts -- conversion of a record during incremental conversion
+                  (key: CONVERTER_TAG)
+    linear -- evaluation of a linear map-entry, i.e. path traversal
+              and post-processing (key: map-key)
+    post-process -- post-processing of a linear map-entry (key: map-key)
+    nonlinear -- evaluation of a nonlinear map-entry (key: map-key)
+
+    An instance can be shared by multiple mappers and converters (and
+    threads).
+
+    Keyword arguments:
+    prefix -- prefix of the metric names in the Prometheus text format
+              (default "dcm_metadata")
+    """
+
+    def __init__(self, prefix: str = "dcm_metadata") -> None:
+        self.prefix = prefix
+        # (operation, key) -> [calls, nanoseconds, errors]
+        self._stats: dict[tuple[str, str], list[int]] = {}
+        self._lock = Lock()
+
+    def wrap(
+        self, operation: str, key: str, function: Callable[..., Any]
+    ) -> Callable[..., Any]:
+        """
+        Returns an instrumented version of `function`.
+
+        Keyword arguments:
+        operation -- name of the operation
+        key -- key within the operation
+        function -- function to be instrumented
+        """
+        with self._lock:
+            stats = self._stats.setdefault((operation, key), [0, 0, 0])
+        lock = self._lock
+
+        def instrumented(*args, **kwargs):
+            start = perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            except BaseException:
+                with lock:
+                    stats[2] += 1
+                raise
+            finally:
+                elapsed = perf_counter_ns() - start
+                with lock:
+                    stats[0] += 1
+                    stats[1] += elapsed
+
+        instrumented.__wrapped__ = function
+        return instrumented
+
+    def as_dict(self) -> dict[str, dict[str, dict[str, Any]]]:
+        """
+        Returns the recorded metrics as nested dictionary
+        {operation: {key: {"calls": int, "seconds": float,
+        "errors": int}}}.
+        """
+        result = {}
+        with self._lock:
+            for (operation, key), (calls, nanoseconds, errors) \
+                    in self._stats.items():
+                result.setdefault(operation, {})[key] = {
+                    "calls": calls,
+                    "seconds": nanoseconds / 1e9,
+                    "errors": errors,
+                }
+        return result
+
+    def to_prometheus(self) -> str:
+        """
+        Returns the recorded metrics in the Prometheus text format.
+        """
+        with self._lock:
+            stats = sorted(
+                (operation, key, list(values))
+                for (operation, key), values in self._stats.items()
+            )
+        lines = []
+        for index, (name, kind, description) in enumerate(
+            (
+                ("calls_total", "counter", "Number of calls."),
+                ("seconds_total", "counter", "Cumulative time of calls."),
+                ("errors_total", "counter", "Number of failed calls."),
+            )
+        ):
+            metric = f"{self.prefix}_{name}"
+            lines.append(f"# HELP {metric} {description}")
+            lines.append(f"# TYPE {metric} {kind}")
+            for operation, key, values in stats:
+                value = values[index] / 1e9 if index == 1 else values[index]
+                lines.append(
+                    f'{metric}{{operation="{_escape(operation)}",'
+                    + f'key="{_escape(key)}"}} {value}'
+                )
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        """Reset all recorded metrics."""
+        with self._lock:
+            for stats in self._stats.values():
+                stats[:] = [0, 0, 0]
+
+
+def _escape(value: str) -> str:
+    """Returns `value` escaped as Prometheus label value."""
+    return value.replace("\\", "\\\\").replace("\n", "\\n") \
+        .replace('"', '\\"')
@@ -1,12 +1,81 @@
 """
 Implementation of the metadata mapper-interface.
 """
-import re
-from typing import Any, Optional, Callable
+from typing import Any, Optional, Callable, Mapping
+from collections import OrderedDict
+from threading import Lock
+from types import MappingProxyType
+import graphlib
 
 from dcm_common.util import NestedDict, value_from_dict_path
 
 from dcm_metadata_mapper.mapper_interface import MapperInterface
+from dcm_metadata_mapper.identifier_classifier import DOI, URN_NBN
+from dcm_metadata_mapper.declarative_map import \
+    PostProcess, compile_linear_map, freeze_linear_map
+from dcm_metadata_mapper.instrumentation import Instrumentation
+
+
+# maximum number of generated classes that are cached by
+# generate_metadata_mapper_class
+MAPPER_CLASS_CACHE_SIZE = 256
+_mapper_class_cache: OrderedDict[Any, type[MapperInterface]] = OrderedDict()
+_mapper_class_cache_lock = Lock()
+
+
+class NonlinearFunction:
+    """
+    Nonlinear map-entry that depends on the values of other map-keys
+    (see depends_on). The function is called with the source metadata
+    and a dictionary of the values of the dependencies, i.e.
+    `function(source_metadata, values)`.
+
+    Keyword arguments:
+    function -- callable with the arguments source_metadata and values
+    dependencies -- keys of the linear or nonlinear map whose values
+                    are required by `function`
+    """
+
+    def __init__(
+        self,
+        function: Callable[[NestedDict, dict[str, Any]], Any],
+        dependencies: tuple[str, ...]
+    ) -> None:
+        self.function = function
+        self.dependencies = tuple(key.lower() for key in dependencies)
+
+    def __call__(
+        self, source_metadata: NestedDict, values: dict[str, Any]
+    ) -> Any:
+        return self.function(source_metadata, values)
+
+    def __repr__(self) -> str:
+        return (
+            f"NonlinearFunction({getattr(self.function, '__name__', '?')}, "
+            + f"dependencies={self.dependencies})"
+        )
+
+
+def depends_on(
+    *keys: str
+) -> Callable[[Callable[..., Any]], NonlinearFunction]:
+    """
+    Decorator for nonlinear map-functions that use the values of other
+    map-keys, e.g.
+    @depends_on("dc-terms-identifier", "external-identifier")
+    def primary_identifier(source_metadata, values):
+        return (values["dc-terms-identifier"] or [None])[0] \
+            or values["external-identifier"]
+
+    The values of the dependencies are evaluated once per record (see
+    generate_metadata_mapper_class) and passed as dictionary.
+
+    Keyword arguments:
+    keys -- keys of the linear or nonlinear map
+    """
+    def decorator(function: Callable[..., Any]) -> NonlinearFunction:
+        return NonlinearFunction(function, keys)
+    return decorator
 
 
 def generate_metadata_mapper_class(
@@ -30,15 +99,162 @@ def generate_metadata_mapper_class(
                   "path": navigate through the source_metadata to get the value.
                   "post-process": perform post-processing of the value
                                   defined using the "path" key.
-                                  It should handle None values,
-                                  which will otherwise lead to a TypeError.
+                                  Either a callable, which should handle
+                                  None values (which will otherwise
+                                  lead to a TypeError), or a declarative
+                                  list of operations (see
+                                  declarative_map.PostProcess).
                   (see LINEAR_MAP_STANDARD)
-    _nonlinear_map -- the nonlinear map as dict of key-function pairs
+    _nonlinear_map -- the nonlinear map as dict of key-function pairs;
+                      functions are called with the source_metadata
+                      or, if declared with depends_on, with the
+                      source_metadata and the values of other keys
     use_standard_linear_map -- whether to extend the provided linear_map
                                by using the LINEAR_MAP_STANDARD
                                (default False)
+
+    Generated classes provide the property SOURCE_PATHS: a tuple of all
+    paths in the source metadata that are accessed by the linear map,
+    e.g. for a projected conversion of the source metadata (see
+    OAIPMHMetadataConverter.get_dict); None if the class has a
+    nonlinear map (which may access arbitrary paths) or an entry with an
+    empty path (i.e. the entire source metadata).
+
+    Instances of generated classes accept the keyword argument
+    `instrumentation` (see instrumentation.Instrumentation) to record
+    call counts, time, and errors per map-key; without it, the
+    instances are not instrumented.
+
+    The maps of generated classes are read-only copies of the arguments
+    (see declarative_map.freeze_linear_map), i.e. later changes to the
+    arguments do not affect the class, and the classes share them with
+    their instances. Instances hold no mutable state, so a single
+    instance can be shared by multiple threads.
+
+    Dependencies between map-keys (see depends_on) are resolved once at
+    class creation into a dependency graph; unknown keys or cycles raise
+    a ValueError. get_all_metadata evaluates the nonlinear map in
+    topological order and passes the already computed values, i.e.
+    every key is evaluated at most once per record; get_metadata only
+    evaluates the dependencies of the requested key.
+
+    Generated classes are cached by the content of the arguments, i.e.
+    repeated calls with identical arguments return the same class.
+    Callables in the maps (post-processing and nonlinear functions) are
+    compared by identity.
+    """
+
+    fingerprint = _fingerprint(
+        (
+            mapper_tag,
+            spec_version,
+            linear_map,
+            _nonlinear_map,
+            use_standard_linear_map,
+            LINEAR_MAP_STANDARD if use_standard_linear_map else None,
+        )
+    )
+    with _mapper_class_cache_lock:
+        if fingerprint in _mapper_class_cache:
+            _mapper_class_cache.move_to_end(fingerprint)
+            return _mapper_class_cache[fingerprint]
+
+    mapper_class = _create_metadata_mapper_class(
+        mapper_tag, spec_version, linear_map, _nonlinear_map,
+        use_standard_linear_map
+    )
+
+    with _mapper_class_cache_lock:
+        mapper_class = _mapper_class_cache.setdefault(
+            fingerprint, mapper_class
+        )
+        while len(_mapper_class_cache) > MAPPER_CLASS_CACHE_SIZE:
+            _mapper_class_cache.popitem(last=False)
+    return mapper_class
+
+
+def _create_metadata_mapper_class(
+    mapper_tag: str,
+    spec_version: tuple[int, int, int, str],
+    linear_map: Optional[dict[str, dict[str, Any]]],
+    _nonlinear_map: Optional[dict[str, Callable[..., Any]]],
+    use_standard_linear_map: bool
+) -> type[MapperInterface]:
+    """
+    Creates a new mapper-class (see generate_metadata_mapper_class).
+
+    The maps are merged, compiled, and frozen once here; instances of
+    the class share these and do not hold any state of their own
+    (except for an optional instrumentation, see _instrument).
     """
 
+    effective_nonlinear_map = MappingProxyType(dict(_nonlinear_map or {}))
+    effective_linear_map = freeze_linear_map(
+        _merge_linear_maps(
+            linear_map, effective_nonlinear_map, use_standard_linear_map
+        )
+    )
+
+    # compile the map-entries into a single lookup table of accessors
+    # key -> function(source_metadata); nonlinear keys take precedence
+    linear_accessors = {
+        key: _compile_linear_map_entry(entry)
+        for key, entry in effective_linear_map.items()
+    }
+    # resolve the dependencies between map-keys into an evaluation order
+    # of the nonlinear map
+    nonlinear_dependencies = MappingProxyType(
+        _get_nonlinear_dependencies(
+            effective_nonlinear_map,
+            set(linear_accessors) | set(effective_nonlinear_map)
+        )
+    )
+    nonlinear_order = _sort_nonlinear_keys(nonlinear_dependencies)
+    nonlinear_accessors = _compile_nonlinear_accessors(
+        effective_nonlinear_map,
+        nonlinear_dependencies,
+        nonlinear_order,
+        linear_accessors
+    )
+    accessors = linear_accessors | nonlinear_accessors
+    nonlinear_steps = tuple(
+        (key, effective_nonlinear_map[key], nonlinear_dependencies[key])
+        for key in nonlinear_order
+    )
+
+    # arrange the map-entries for batch-evaluation with get_all_metadata:
+    # constant values, entries with an empty path (the entire source
+    # metadata), a trie of the other paths in the linear map (common
+    # prefixes are resolved only once), and the nonlinear map
+    constants = {
+        key: entry["value"]
+        for key, entry in effective_linear_map.items()
+        if "value" in entry
+    }
+    root_accessors = tuple(
+        (key, linear_accessors[key])
+        for key, entry in effective_linear_map.items()
+        if "value" not in entry and not entry["path"]
+    )
+    path_trie = _compile_path_trie(
+        {
+            key: entry
+            for key, entry in effective_linear_map.items()
+            if "value" not in entry and entry["path"]
+        }
+    )
+
+    # paths in the source metadata required by the mapper
+    source_paths = None
+    if not effective_nonlinear_map and not root_accessors:
+        source_paths = tuple(
+            dict.fromkeys(
+                tuple(entry["path"])
+                for entry in effective_linear_map.values()
+                if "value" not in entry
+            )
+        )
+
     class MetadataMapper(MapperInterface):
         """
         Factory for metadata mappers.
@@ -46,36 +262,20 @@ def generate_metadata_mapper_class(
 
         _SPECVERSION = spec_version
         MAPPER_TAG = mapper_tag
+        SOURCE_PATHS = source_paths
 
-        def __init__(self) -> None:
-
-            self.use_standard_linear_map = use_standard_linear_map
-
-            # Define the linear map
-            if linear_map is not None:
-                if self.use_standard_linear_map:
-                    # Get the union of the two maps.
-                    # The user input should be the right-hand operand.
-                    self.linear_map = LINEAR_MAP_STANDARD | linear_map
-                else:
-                    self.linear_map = linear_map
-            else:
-                if self.use_standard_linear_map:
-                    self.linear_map = LINEAR_MAP_STANDARD.copy()
-                else:
-                    self.linear_map = {}
+        # the (effective, read-only) maps are shared by all instances
+        linear_map = effective_linear_map
+        _nonlinear_map = effective_nonlinear_map
+        _nonlinear_dependencies = nonlinear_dependencies
+        instrumentation: Optional[Instrumentation] = None
 
-            # Define the nonlinear map
-            if _nonlinear_map is not None:
-                self._nonlinear_map = _nonlinear_map
-            else:
-                self._nonlinear_map = {}
-
-            # Delete all keys included in the _nonlinear_map
-            # from the linear map
-            for key in self._nonlinear_map.keys():
-                if key in self.linear_map:
-                    del self.linear_map[key]
+        def __init__(
+            self, instrumentation: Optional[Instrumentation] = None
+        ) -> None:
+            if instrumentation is not None:
+                self.instrumentation = instrumentation
+                _instrument(self, instrumentation)
 
         def get_metadata(
             self,
@@ -83,21 +283,37 @@ def generate_metadata_mapper_class(
             source_metadata: NestedDict
         ) -> Optional[str | list[str]]:
 
-            if key.lower() in self.linear_map:
-                # linear map-section
-                value = self._get_metadata_linear(
-                    key.lower(),
-                    source_metadata
-                )
-            elif key.lower() in self._nonlinear_map:
-                # nonlinear map-section
-                value = self._get_metadata_nonlinear(
-                    key.lower(),
-                    source_metadata
-                )
-            else:
+            accessor = accessors.get(key.lower())
+            if accessor is None:
                 return None
-            return value
+            return accessor(source_metadata)
+
+        def get_all_metadata(
+            self,
+            source_metadata: NestedDict
+        ) -> dict[str, Optional[str | list[str]]]:
+
+            result = dict.fromkeys(accessors)
+            result.update(constants)
+            for key, accessor in root_accessors:
+                result[key] = accessor(source_metadata)
+            _evaluate_path_trie(
+                path_trie,
+                source_metadata,
+                source_metadata,
+                result,
+                linear_accessors
+            )
+            for key, function, dependencies in nonlinear_steps:
+                if dependencies:
+                    result[key] = function(
+                        source_metadata,
+                        {dependency: result[dependency]
+                         for dependency in dependencies}
+                    )
+                else:
+                    result[key] = function(source_metadata)
+            return result
 
         def _get_metadata_linear(
             self,
@@ -112,35 +328,403 @@ def generate_metadata_mapper_class(
             e.g., ["header", "identifier"].
             Optional, perform post-processing as instructed
             in the "post-process" key, e.g., lambda pp: pp.rsplit(":", 1)[1].
-            """
-
-            # default to those entries already existing in source_metadata
-            # if static value, return that
-            if "value" in self.linear_map[key_lower]:
-                return self.linear_map[key_lower]["value"]
-
-            # otherwise use path through nested dict as specified in map
-            value = value_from_dict_path(
-                nesteddict=source_metadata,
-                path=self.linear_map[key_lower]["path"]
-            )
-
-            # perform post-processing if available
-            if "post-process" in self.linear_map[key_lower]:
-                value = self.linear_map[key_lower]["post-process"](value)
 
-            return value
+            The map-entries are compiled into accessors once per class
+            (see _compile_linear_map_entry).
+            """
+            return linear_accessors[key_lower](source_metadata)
 
         def _get_metadata_nonlinear(
             self,
             key_lower: str,
             source_metadata: NestedDict
         ) -> Optional[str | list[str]]:
-            return self._nonlinear_map[key_lower](source_metadata)
+            return nonlinear_accessors[key_lower](source_metadata)
 
     MetadataMapper.__doc__ = mapper_tag
+    MetadataMapper.use_standard_linear_map = use_standard_linear_map
     return MetadataMapper
 
+
+def _instrument(
+    mapper: MapperInterface, instrumentation: Instrumentation
+) -> None:
+    """
+    Replaces the methods get_metadata, get_all_metadata,
+    _get_metadata_linear, and _get_metadata_nonlinear of `mapper` by
+    instrumented versions (instance attributes). These evaluate every
+    map-entry individually, i.e. the operations "linear",
+    "post-process", and "nonlinear" of `instrumentation` are recorded
+    per key.
+    """
+    linear_accessors = {}
+    for key, entry in mapper.linear_map.items():
+        if "post-process" in entry:
+            entry = entry | {
+                "post-process": instrumentation.wrap(
+                    "post-process", key, entry["post-process"]
+                )
+            }
+        linear_accessors[key] = instrumentation.wrap(
+            "linear", key, _compile_linear_map_entry(entry)
+        )
+    nonlinear_functions = {
+        key: instrumentation.wrap("nonlinear", key, function)
+        for key, function in mapper._nonlinear_map.items()
+    }
+    dependencies = mapper._nonlinear_dependencies
+    order = _sort_nonlinear_keys(dependencies)
+    nonlinear_accessors = _compile_nonlinear_accessors(
+        nonlinear_functions, dependencies, order, linear_accessors
+    )
+    accessors = linear_accessors | nonlinear_accessors
+
+    def get_metadata(key, source_metadata):
+        accessor = accessors.get(key.lower())
+        if accessor is None:
+            return None
+        return accessor(source_metadata)
+
+    def get_all_metadata(source_metadata):
+        values = {
+            key: accessor(source_metadata)
+            for key, accessor in linear_accessors.items()
+        }
+        for key in order:
+            values[key] = _call_nonlinear(
+                nonlinear_functions[key], dependencies[key],
+                source_metadata, values
+            )
+        return {key: values[key] for key in accessors}
+
+    def get_metadata_linear(key_lower, source_metadata):
+        return linear_accessors[key_lower](source_metadata)
+
+    def get_metadata_nonlinear(key_lower, source_metadata):
+        return nonlinear_accessors[key_lower](source_metadata)
+
+    mapper.get_metadata = get_metadata
+    mapper.get_all_metadata = get_all_metadata
+    mapper._get_metadata_linear = get_metadata_linear
+    mapper._get_metadata_nonlinear = get_metadata_nonlinear
+
+
+def _merge_linear_maps(
+    linear_map: Optional[Mapping[str, Mapping[str, Any]]],
+    _nonlinear_map: Optional[Mapping[str, Callable[..., Any]]],
+    use_standard_linear_map: bool
+) -> dict[str, dict[str, Any]]:
+    """
+    Returns a copy of the effective linear map of a mapper,
+    i.e. the union with the LINEAR_MAP_STANDARD (if requested; the
+    user input is the right-hand operand) without those keys that are
+    included in the _nonlinear_map.
+    """
+    if use_standard_linear_map:
+        merged = LINEAR_MAP_STANDARD | (linear_map or {})
+    else:
+        merged = dict(linear_map or {})
+
+    for key in (_nonlinear_map or {}):
+        merged.pop(key, None)
+
+    # copy entries to decouple the result from the input and compile
+    # declarative post-processing
+    return compile_linear_map(merged)
+
+
+def _get_nonlinear_dependencies(
+    nonlinear_map: Mapping[str, Callable[..., Any]],
+    keys: set[str]
+) -> dict[str, tuple[str, ...]]:
+    """
+    Returns the dependencies (see depends_on) of the entries of
+    `nonlinear_map` as dictionary of key and tuple of keys. Raises
+    ValueError for dependencies that are not in `keys` (all keys of
+    the mapper).
+    """
+    dependencies = {}
+    for key, function in nonlinear_map.items():
+        dependencies[key] = function.dependencies \
+            if isinstance(function, NonlinearFunction) else ()
+        unknown = [
+            dependency for dependency in dependencies[key]
+            if dependency not in keys
+        ]
+        if unknown:
+            raise ValueError(
+                f"Nonlinear map-entry '{key}' depends on unknown key(s) "
+                + f"{', '.join(repr(dependency) for dependency in unknown)}."
+            )
+    return dependencies
+
+
+def _sort_nonlinear_keys(
+    dependencies: Mapping[str, tuple[str, ...]]
+) -> tuple[str, ...]:
+    """
+    Returns the keys of the nonlinear map in topological order of their
+    `dependencies` (see _get_nonlinear_dependencies); dependencies on
+    linear keys are not considered (these are evaluated first). Raises
+    ValueError for cyclic dependencies.
+    """
+    sorter = graphlib.TopologicalSorter()
+    for key, dependencies_ in dependencies.items():
+        sorter.add(
+            key,
+            *(
+                dependency for dependency in dependencies_
+                if dependency in dependencies
+            )
+        )
+    try:
+        return tuple(sorter.static_order())
+    except graphlib.CycleError as exc_info:
+        raise ValueError(
+            "Cyclic dependencies in the nonlinear map: "
+            + " -> ".join(exc_info.args[1]) + "."
+        ) from exc_info
+
+
+def _call_nonlinear(
+    function: Callable[..., Any],
+    dependencies: tuple[str, ...],
+    source_metadata: NestedDict,
+    values: Mapping[str, Any]
+) -> Any:
+    """
+    Returns the result of a nonlinear map-function; functions with
+    dependencies receive the values of their dependencies (taken from
+    `values`).
+    """
+    if not dependencies:
+        return function(source_metadata)
+    return function(
+        source_metadata,
+        {dependency: values[dependency] for dependency in dependencies}
+    )
+
+
+def _compile_nonlinear_accessors(
+    nonlinear_map: Mapping[str, Callable[..., Any]],
+    dependencies: Mapping[str, tuple[str, ...]],
+    order: tuple[str, ...],
+    linear_accessors: Mapping[str, Callable[[NestedDict], Any]]
+) -> dict[str, Callable[[NestedDict], Any]]:
+    """
+    Returns accessors (function(source_metadata)) for the entries of
+    `nonlinear_map` (in its order). Functions without dependencies are
+    used directly; for the others, the keys required by the entry
+    (transitively) are collected once and evaluated in the given
+    topological `order` (linear keys first), each at most once per call.
+    """
+    position = {key: index for index, key in enumerate(order)}
+    accessors = {}
+    for key, function in nonlinear_map.items():
+        if not dependencies[key]:
+            accessors[key] = function
+            continue
+        required = set()
+        pending = [key]
+        while pending:
+            current = pending.pop()
+            if current not in required:
+                required.add(current)
+                pending.extend(dependencies.get(current, ()))
+        plan = tuple(
+            (
+                required_key,
+                nonlinear_map[required_key]
+                if required_key in nonlinear_map
+                else linear_accessors[required_key],
+                dependencies.get(required_key, ()),
+            )
+            for required_key in sorted(
+                required, key=lambda k: position.get(k, -1)
+            )
+        )
+        accessors[key] = _compile_plan(plan)
+    return accessors
+
+
+def _compile_plan(
+    plan: tuple[tuple[str, Callable[..., Any], tuple[str, ...]], ...]
+) -> Callable[[NestedDict], Any]:
+    """
+    Returns an accessor that evaluates the steps (key, function,
+    dependencies) of `plan` in order and returns the value of the last
+    step.
+    """
+    def accessor(source_metadata):
+        values = {}
+        for key, function, dependencies in plan:
+            values[key] = _call_nonlinear(
+                function, dependencies, source_metadata, values
+            )
+        return values[plan[-1][0]]
+    return accessor
+
+
+def _fingerprint(value: Any) -> Any:
+    """
+    Returns a hashable representation of the content of `value`.
+    Callables and other unhashable objects are represented by their
+    identity.
+    """
+    if isinstance(value, (dict, MappingProxyType)):
+        return (
+            dict,
+            tuple((key, _fingerprint(item)) for key, item in value.items())
+        )
+    if isinstance(value, (list, tuple)):
+        return (type(value), tuple(_fingerprint(item) for item in value))
+    if isinstance(value, PostProcess):
+        return (PostProcess, value.fingerprint)
+    if callable(value):
+        return (id, id(value))
+    try:
+        hash(value)
+    except TypeError:
+        return (id, id(value))
+    return (type(value), value)
+
+
+def _compile_path_getter(path: list[str]) -> Callable[[NestedDict], Any]:
+    """
+    Returns a function that takes source_metadata and returns the value
+    found at the given path.
+
+    The common case (all keys present) is handled by direct indexing
+    with a fixed depth; anything else falls back to
+    value_from_dict_path, i.e. the result is always identical.
+    """
+    path = list(path)
+
+    def fallback(source_metadata):
+        return value_from_dict_path(nesteddict=source_metadata, path=path)
+
+    match path:
+        case [key0]:
+            def getter(source_metadata):
+                try:
+                    return source_metadata[key0]
+                except (KeyError, TypeError):
+                    return fallback(source_metadata)
+        case [key0, key1]:
+            def getter(source_metadata):
+                try:
+                    return source_metadata[key0][key1]
+                except (KeyError, TypeError):
+                    return fallback(source_metadata)
+        case [key0, key1, key2]:
+            def getter(source_metadata):
+                try:
+                    return source_metadata[key0][key1][key2]
+                except (KeyError, TypeError):
+                    return fallback(source_metadata)
+        case [key0, key1, key2, key3]:
+            def getter(source_metadata):
+                try:
+                    return source_metadata[key0][key1][key2][key3]
+                except (KeyError, TypeError):
+                    return fallback(source_metadata)
+        case _:
+            getter = fallback
+    return getter
+
+
+def _compile_path_trie(linear_map: dict[str, dict[str, Any]]) -> dict:
+    """
+    Returns a trie of the paths in the given (path-based) linear map.
+
+    Every node is a 3-tuple of
+    * children: dictionary of path-segment and node,
+    * leaves: tuple of (key, post-process or None) of the map-entries
+      with a path that ends at this node,
+    * subtree: tuple of (key, post-process or None) of all map-entries
+      with a path that ends at this node or one of its descendants.
+    The root is given as dictionary of its children.
+    """
+    root: dict = {}
+    for key, entry in linear_map.items():
+        children = root
+        for depth, segment in enumerate(entry["path"]):
+            if segment not in children:
+                children[segment] = ({}, [], [])
+            node = children[segment]
+            node[2].append((key, entry.get("post-process")))
+            if depth == len(entry["path"]) - 1:
+                node[1].append((key, entry.get("post-process")))
+            children = node[0]
+
+    def freeze(children):
+        return {
+            segment: (freeze(node[0]), tuple(node[1]), tuple(node[2]))
+            for segment, node in children.items()
+        }
+    return freeze(root)
+
+
+def _evaluate_path_trie(
+    children: dict,
+    value: Any,
+    source_metadata: NestedDict,
+    result: dict[str, Any],
+    linear_accessors: dict[str, Callable[[NestedDict], Any]]
+) -> None:
+    """
+    Resolves all map-entries below the given trie-node for `value`
+    (the value found at the node's path in `source_metadata`) and
+    writes the results into `result`.
+
+    Missing keys resolve to None for the entire subtree; if `value`
+    cannot be accessed directly, the affected map-entries are evaluated
+    individually via their compiled accessors.
+    """
+    for segment, (grandchildren, leaves, subtree) in children.items():
+        try:
+            child = value[segment]
+        except KeyError:
+            for key, post_process in subtree:
+                result[key] = \
+                    None if post_process is None else post_process(None)
+            continue
+        except TypeError:
+            for key, _ in subtree:
+                result[key] = linear_accessors[key](source_metadata)
+            continue
+
+        for key, post_process in leaves:
+            result[key] = \
+                child if post_process is None else post_process(child)
+        if grandchildren:
+            _evaluate_path_trie(
+                grandchildren, child, source_metadata, result,
+                linear_accessors
+            )
+
+
+def _compile_linear_map_entry(
+    entry: dict[str, Any]
+) -> Callable[[NestedDict], Any]:
+    """
+    Returns a specialized accessor for a single linear map-entry, i.e.
+    a function that takes source_metadata and returns the mapped value:
+    * "value": constant return
+    * "path": fixed-depth path getter
+    * "path" and "post-process": path getter followed by post-process
+    """
+    if "value" in entry:
+        value = entry["value"]
+        return lambda source_metadata: value
+
+    getter = _compile_path_getter(entry["path"])
+    if "post-process" not in entry:
+        return getter
+
+    post_process = entry["post-process"]
+    return lambda source_metadata: post_process(getter(source_metadata))
+
 # LINEAR_MAP_STANDARD defines a dictionary with common key-value pairs
 # for pre-filling the linear map.
 # FIXME:
@@ -154,11 +738,15 @@ def generate_metadata_mapper_class(
 LINEAR_MAP_STANDARD: dict[str, dict[str, Any]] = {
     "origin-system-identifier": {
         "path": ["header", "identifier"],
-        "post-process": lambda pp: None if pp is None else pp.rsplit(":", 1)[0]
+        "post-process": PostProcess(
+            [{"op": "rsplit", "separator": ":", "maxsplit": 1, "index": 0}]
+        )
     },
     "external-identifier": {
         "path": ["header", "identifier"],
-        "post-process": lambda pp: None if pp is None else pp.rsplit(":", 1)[1]
+        "post-process": PostProcess(
+            [{"op": "rsplit", "separator": ":", "maxsplit": 1, "index": 1}]
+        )
     },
     "dc-creator": {
         "path": ["metadata", "oai_dc:dc", "dc:creator"]
@@ -171,15 +759,8 @@ LINEAR_MAP_STANDARD: dict[str, dict[str, Any]] = {
     },
     "dc-terms-identifier": {
         "path": ["metadata", "oai_dc:dc", "dc:identifier"],
-        "post-process": (lambda pp: None if pp is None else\
-            [
-                entry for entry in pp
-                    if entry is not None and re.search(
-                        r"10\.\d{4,9}\/[-._;()/:A-Z0-9]+|urn:nbn",
-                        entry,
-                        re.IGNORECASE
-                    )
-            ]
+        "post-process": PostProcess(
+            [{"op": "filter-identifier-class", "classes": [DOI, URN_NBN]}]
         )
     }
 }
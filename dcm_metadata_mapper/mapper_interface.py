@@ -24,6 +24,10 @@ class MapperInterface(metaclass=abc.ABCMeta):
     get_specversion -- method; public get-method for _SPECVERSION
     get_metadata -- method; retrieve information on a specific key from
                     a dictionary of source metadata; returns list or None
+    get_all_metadata -- method (optional; defaults to get_metadata per
+                        key); retrieve information on all keys known
+                        to the mapper from a dictionary of source
+                        metadata; returns dictionary
     """
     # setup requirements for an object to be regarded as implementing
     # the MapperInterface
@@ -86,3 +90,28 @@ class MapperInterface(metaclass=abc.ABCMeta):
             f"Class {self.__class__.__name__} does not define method "\
                 "self.get_metadata"
         )
+
+    def get_all_metadata(self, source_metadata: NestedDict) \
+            -> dict[str, Optional[str | list[str]]]:
+        """
+        Retrieve information on all keys known to the mapper from a
+        dictionary of source metadata.
+
+        Returns dictionary of keys and the values that get_metadata
+        would return for the individual keys.
+
+        The default implementation calls get_metadata for the keys of
+        the (optional) attributes `linear_map` and `_nonlinear_map`;
+        implementations with other keys or a faster batch-evaluation
+        override this method (see mapper_factory).
+
+        Keyword arguments:
+        source_metadata -- dictionary containing the comprehensive
+                           source metadata
+        """
+
+        keys = dict.fromkeys(getattr(self, "linear_map", None) or {}) \
+            | dict.fromkeys(getattr(self, "_nonlinear_map", None) or {})
+        return {
+            key: self.get_metadata(key, source_metadata) for key in keys
+        }
@@ -0,0 +1,140 @@
+"""
+This module contains a registry for mapper-classes that resolves
+classes lazily, i.e. a mapper-module is only imported once its class
+is requested.
+"""
+
+from typing import Optional, Iterable
+from importlib import import_module
+from threading import Lock
+
+from dcm_metadata_mapper.mapper_interface import MapperInterface
+
+
+# entry point-group for the discovery of mapper-classes provided by
+# other packages; the entry point's name is used as alias, e.g.
+# miami = lzvnrw_mapper.miami:MiamiMetadataMapper
+ENTRY_POINT_GROUP = "dcm_metadata_mapper.mappers"
+
+
+class MapperRegistry:
+    """
+    Registry of mapper-classes by their MAPPER_TAG and additional
+    aliases (e.g. "miami").
+
+    Classes are registered by reference ("<module>:<attribute>") and
+    imported on first lookup. Additional classes are discovered through
+    the entry point-group ENTRY_POINT_GROUP when a name is not known.
+
+    Keyword arguments:
+    entry_point_group -- name of the entry point-group; None disables
+                         the discovery via entry points
+                         (default ENTRY_POINT_GROUP)
+    """
+
+    def __init__(
+        self, entry_point_group: Optional[str] = ENTRY_POINT_GROUP
+    ) -> None:
+        self._entry_point_group = entry_point_group
+        self._references: dict[str, str] = {}
+        self._classes: dict[str, type[MapperInterface]] = {}
+        self._lock = Lock()
+
+    def register(
+        self,
+        reference: str,
+        tag: Optional[str] = None,
+        aliases: Optional[Iterable[str]] = None
+    ) -> None:
+        """
+        Register a mapper-class by reference.
+
+        Keyword arguments:
+        reference -- location of the class as "<module>:<attribute>"
+        tag -- MAPPER_TAG of the class; if omitted, the class is
+               only registered under its aliases until it is first
+               imported (default None)
+        aliases -- additional names for the class (default None)
+        """
+        if ":" not in reference:
+            raise ValueError(
+                f"Bad mapper reference '{reference}', expected format "
+                + "'<module>:<attribute>'."
+            )
+        with self._lock:
+            for name in ([tag] if tag else []) + list(aliases or []):
+                if self._references.get(name, reference) != reference:
+                    raise ValueError(
+                        f"Name '{name}' is already registered for "
+                        + f"'{self._references[name]}'."
+                    )
+                self._references[name] = reference
+
+    def get(self, name: str) -> type[MapperInterface]:
+        """
+        Returns the mapper-class registered for the given tag or alias
+        (imports the mapper-module if necessary).
+
+        Raises KeyError if no class is registered for `name`.
+        """
+        if name not in self._references:
+            self._discover(name)
+        try:
+            reference = self._references[name]
+        except KeyError as exc_info:
+            raise KeyError(f"Unknown mapper '{name}'.") from exc_info
+        return self._resolve(reference)
+
+    def __contains__(self, name: str) -> bool:
+        try:
+            self.get(name)
+        except KeyError:
+            return False
+        return True
+
+    def names(self) -> list[str]:
+        """
+        Returns a list of all known tags and aliases (without
+        importing any mapper-module).
+        """
+        self._load_entry_points()
+        return sorted(self._references)
+
+    def _resolve(self, reference: str) -> type[MapperInterface]:
+        """Imports (once) and returns the class for `reference`."""
+        if reference not in self._classes:
+            module, attribute = reference.split(":", 1)
+            mapper_class = getattr(import_module(module), attribute)
+            with self._lock:
+                self._classes[reference] = mapper_class
+                self._references.setdefault(
+                    mapper_class.MAPPER_TAG, reference
+                )
+        return self._classes[reference]
+
+    def _load_entry_points(self) -> None:
+        """Registers the mapper-classes given via entry points."""
+        if self._entry_point_group is None:
+            return
+        # importlib.metadata is imported on demand since its import
+        # alone takes longer than that of all mapper-modules
+        # pylint: disable-next=import-outside-toplevel
+        from importlib.metadata import entry_points
+        for entry_point in entry_points(group=self._entry_point_group):
+            if entry_point.name not in self._references:
+                self.register(entry_point.value, aliases=[entry_point.name])
+
+    def _discover(self, name: str) -> None:
+        """
+        Tries to find a mapper-class for `name` via entry points. If
+        `name` is not an alias, the classes without known tag are
+        imported to determine their MAPPER_TAG.
+        """
+        self._load_entry_points()
+        if name in self._references:
+            return
+        for reference in set(self._references.values()):
+            if reference not in self._classes:
+                self._resolve(reference)
+            if name in self._references:
+                return
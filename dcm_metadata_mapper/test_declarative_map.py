@@ -0,0 +1,164 @@
+"""
+Test suite for declarative mappings.
+"""
+import json
+import pickle
+
+import pytest
+from dcm_metadata_mapper.mapper_factory import \
+    generate_metadata_mapper_class, LINEAR_MAP_STANDARD
+from dcm_metadata_mapper.declarative_map import \
+    PostProcess, compile_linear_map, load_mapping
+
+
+@pytest.fixture(name="mapping")
+def get_mapping():
+    """Returns a declarative mapping."""
+    return {
+        "mapper_tag": "Some Metadata Mapper",
+        "spec_version": [0, 3, 2, ""],
+        "use_standard_linear_map": True,
+        "linear_map": {
+            "source-organization": {"value": "some organization"},
+            "transfer-urls": {
+                "path": ["metadata", "oai_dc:dc", "dc:identifier"],
+                "post-process": [
+                    {"op": "filter-identifier-class", "classes": ["url"]},
+                    {"op": "filter-contains", "value": "/transfer/"},
+                ]
+            }
+        }
+    }
+
+
+@pytest.fixture(name="source_dict")
+def get_source_dict():
+    """Returns a source metadata-dictionary."""
+    return {
+        "header": {"identifier": "oai:wwu.de:x"},
+        "metadata": {
+            "oai_dc:dc": {
+                "dc:title": "This is a test",
+                "dc:identifier": [
+                    None,
+                    "urn:nbn:de:hbz:x-xxxxxxxxxxx",
+                    "https://repositorium.uni-muenster.de/transfer/miami/x",
+                ]
+            }
+        }
+    }
+
+
+@pytest.mark.parametrize(
+    ("spec", "value", "expected"),
+    [
+        ([{"op": "rsplit", "separator": ":", "maxsplit": 1, "index": 0}],
+         "oai:wwu.de:x", "oai:wwu.de"),
+        ([{"op": "split", "separator": ":", "index": 1}],
+         "oai:wwu.de:x", "wwu.de"),
+        (["strip"], "  x ", "x"),
+        ([{"op": "strip", "characters": "/"}], ["/a/", None], ["a", None]),
+        (["first"], ["a", "b"], "a"),
+        (["first"], [], None),
+        (["first"], "a", "a"),
+        ([{"op": "filter-contains", "value": "a"}], ["ab", None, "b"], ["ab"]),
+        ([{"op": "filter-contains", "value": "a"}], "ab", ["ab"]),
+        ([{"op": "filter-regex", "pattern": "^A"}], ["ab", "Ab"], ["Ab"]),
+        ([{"op": "filter-regex", "pattern": "^A", "ignore-case": True}],
+         ["ab", "Ab"], ["ab", "Ab"]),
+        ([{"op": "filter-identifier-class", "classes": ["doi"]}],
+         ["10.11111/x", "x"], ["10.11111/x"]),
+        ([{"op": "filter-contains", "value": "x"}, "first", "strip"],
+         ["a", " x "], "x"),
+        ([{"op": "filter-contains", "value": "x"}, "first", "strip"],
+         ["a"], None),
+        (["strip", "first"], None, None),
+    ]
+)
+def test_post_process_operations(spec, value, expected):
+    """Test the post-process operations."""
+    assert PostProcess(spec)(value) == expected
+
+
+@pytest.mark.parametrize(
+    "spec",
+    [
+        ["unknown"],
+        [{"value": "x"}],
+        [{"op": "filter-contains"}],
+        [{"op": "first", "unknown": 0}],
+        [{"op": "filter-regex", "pattern": "^A", "ignore_case": True}],
+        [{"op": "filter-regex", "pattern": "^A", "ignore-case": "yes"}],
+        [{"op": "filter-identifier-class", "classes": ["unknown"]}],
+    ]
+)
+def test_post_process_bad_spec(spec):
+    """Test rejection of bad post-process definitions."""
+    with pytest.raises(ValueError):
+        PostProcess(spec)
+
+
+def test_compile_linear_map_bad_entry():
+    """Test rejection of bad linear map-entries."""
+    with pytest.raises(ValueError):
+        compile_linear_map({"key": {"post-process": ["first"]}})
+    with pytest.raises(ValueError):
+        compile_linear_map({"key": {"path": ["a"], "unknown": 0}})
+
+
+@pytest.mark.parametrize("suffix", [".json", ".yaml"])
+def test_load_mapping(mapping, source_dict, tmp_path, suffix):
+    """Test loading and generating a mapper from a mapping-file."""
+    path = tmp_path / f"mapping{suffix}"
+    if suffix == ".yaml":
+        yaml = pytest.importorskip("yaml")
+        path.write_text(yaml.safe_dump(mapping), encoding="utf-8")
+    else:
+        path.write_text(json.dumps(mapping), encoding="utf-8")
+
+    mapper = generate_metadata_mapper_class(**load_mapping(path))()
+
+    assert mapper.MAPPER_TAG == "Some Metadata Mapper"
+    assert mapper.get_specversion() == (0, 3, 2, "")
+    assert mapper.get_all_metadata(source_dict) == {
+        "origin-system-identifier": "oai:wwu.de",
+        "external-identifier": "x",
+        "dc-creator": None,
+        "dc-title": "This is a test",
+        "dc-rights": None,
+        "dc-terms-identifier": ["urn:nbn:de:hbz:x-xxxxxxxxxxx"],
+        "source-organization": "some organization",
+        "transfer-urls": [
+            "https://repositorium.uni-muenster.de/transfer/miami/x"
+        ],
+    }
+
+
+def test_load_mapping_bad_mapping(mapping):
+    """Test rejection of bad mappings."""
+    with pytest.raises(ValueError):
+        load_mapping(mapping | {"unknown": 0})
+    del mapping["spec_version"]
+    with pytest.raises(ValueError):
+        load_mapping(mapping)
+
+
+def test_declarative_mapping_pickle(mapping, source_dict):
+    """
+    Assert that declarative maps can be pickled and yield the same
+    (cached) mapper-class.
+    """
+    kwargs = load_mapping(mapping)
+
+    restored = pickle.loads(pickle.dumps(kwargs))
+    assert pickle.loads(pickle.dumps(LINEAR_MAP_STANDARD)) \
+        == LINEAR_MAP_STANDARD
+
+    assert restored == kwargs
+    assert generate_metadata_mapper_class(**restored) \
+        is generate_metadata_mapper_class(**kwargs)
+    assert generate_metadata_mapper_class(**restored)().get_all_metadata(
+        source_dict
+    ) == generate_metadata_mapper_class(**kwargs)().get_all_metadata(
+        source_dict
+    )
@@ -0,0 +1,112 @@
+"""
+Test suite for the identifier classifier.
+"""
+import pytest
+from dcm_metadata_mapper.identifier_classifier import \
+    IdentifierClassifier, DOI, URN_NBN, HANDLE, URL
+
+
+@pytest.fixture(name="identifiers")
+def get_identifiers():
+    """Returns a list of identifiers."""
+    return [
+        None,
+        "https://nbn-resolving.org/urn:nbn:de:hbz:x-xxxxxxxxxxx",
+        "URN:NBN:de:hbz:x-xxxxxxxxxxx",
+        "10.11111/xxxxxxxxxxx",
+        "https://hdl.handle.net/20.500.12345/x",
+        "https://repositorium.uni-muenster.de/transfer/miami/x.pdf",
+        "some identifier",
+    ]
+
+
+def test_partition(identifiers):
+    """Test the partition of identifiers into classes."""
+    assert IdentifierClassifier().partition(identifiers) == {
+        DOI: ["10.11111/xxxxxxxxxxx"],
+        URN_NBN: [
+            "https://nbn-resolving.org/urn:nbn:de:hbz:x-xxxxxxxxxxx",
+            "URN:NBN:de:hbz:x-xxxxxxxxxxx",
+        ],
+        HANDLE: ["https://hdl.handle.net/20.500.12345/x"],
+        URL: [
+            "https://nbn-resolving.org/urn:nbn:de:hbz:x-xxxxxxxxxxx",
+            "https://hdl.handle.net/20.500.12345/x",
+            "https://repositorium.uni-muenster.de/transfer/miami/x.pdf",
+        ],
+    }
+
+
+def test_filter(identifiers):
+    """Test filtering identifiers by classes."""
+    classifier = IdentifierClassifier()
+
+    assert classifier.filter(identifiers, DOI, URN_NBN) == [
+        "https://nbn-resolving.org/urn:nbn:de:hbz:x-xxxxxxxxxxx",
+        "URN:NBN:de:hbz:x-xxxxxxxxxxx",
+        "10.11111/xxxxxxxxxxx",
+    ]
+    assert classifier.filter(
+        identifiers, URL, contains="https://repositorium.uni-muenster.de/"
+    ) == ["https://repositorium.uni-muenster.de/transfer/miami/x.pdf"]
+    assert classifier.filter(identifiers, HANDLE, contains="unknown") == []
+    with pytest.raises(ValueError):
+        classifier.filter(identifiers, "unknown")
+
+
+def test_none_and_single_identifier():
+    """Test input of None and a single identifier (string)."""
+    classifier = IdentifierClassifier()
+
+    assert classifier.partition(None) is None
+    assert classifier.filter(None, DOI) is None
+    assert classifier.filter("10.11111/x", DOI) == ["10.11111/x"]
+
+
+def test_single_pass(identifiers):
+    """
+    Assert that repeated classification of the same identifiers is
+    served from the result of the first pass.
+    """
+    calls = []
+
+    class Pattern:
+        """Pattern that records its calls."""
+        def search(self, entry):
+            calls.append(entry)
+            return None
+
+    classifier = IdentifierClassifier({"some-class": ""})
+    classifier._patterns = (("some-class", Pattern()),)
+
+    classifier.filter(identifiers, "some-class")
+    classifier.partition(identifiers)
+    classifier.filter(identifiers, "some-class", contains="x")
+    classifier.filter(identifiers.copy(), "some-class")
+
+    assert len(calls) == len(set(identifiers) - {None})
+
+
+def test_modified_list():
+    """
+    Assert that lists which are changed in place are classified
+    again.
+    """
+    classifier = IdentifierClassifier()
+    identifiers = ["10.11111/x"]
+    assert classifier.partition(identifiers)[URN_NBN] == []
+
+    identifiers.append("urn:nbn:de:hbz:6-123")
+
+    assert classifier.partition(identifiers)[URN_NBN] == [
+        "urn:nbn:de:hbz:6-123"
+    ]
+    assert classifier.filter(identifiers, DOI, URN_NBN) == identifiers
+
+
+def test_cache_size():
+    """Test that the cache is bounded."""
+    classifier = IdentifierClassifier(cache_size=2)
+    for i in range(5):
+        classifier.filter([f"10.11111/{i}"], DOI)
+    assert len(classifier._cache) <= 2
@@ -0,0 +1,122 @@
+"""
+Test suite for the instrumentation of mappers and converters.
+"""
+import pytest
+from dcm_metadata_mapper.instrumentation import Instrumentation
+from dcm_metadata_mapper.mapper_factory import generate_metadata_mapper_class
+from lzvnrw_converter.oaipmh_converter import OAIPMHMetadataConverter
+from lzvnrw_mapper.miami import MiamiMetadataMapper
+
+
+RECORD = """<OAI-PMH>
+    <GetRecord>
+        <record>
+            <header>
+                <identifier>oai:wwu.de:0</identifier>
+            </header>
+            <metadata>
+                <oai_dc:dc>
+                    <dc:title>This is a test</dc:title>
+                    <dc:identifier>urn:nbn:de:hbz:x-xxxxxxxxxxx</dc:identifier>
+                </oai_dc:dc>
+            </metadata>
+        </record>
+    </GetRecord>
+</OAI-PMH>
+"""
+
+
+def test_wrap():
+    """Test recording of calls, time, and errors."""
+    instrumentation = Instrumentation()
+    function = instrumentation.wrap("operation", "key", lambda x: 1 / x)
+
+    assert function(1) == 1
+    with pytest.raises(ZeroDivisionError):
+        function(0)
+
+    stats = instrumentation.as_dict()["operation"]["key"]
+    assert stats["calls"] == 2
+    assert stats["errors"] == 1
+    assert stats["seconds"] > 0
+
+    instrumentation.reset()
+    assert instrumentation.as_dict() == {
+        "operation": {"key": {"calls": 0, "seconds": 0.0, "errors": 0}}
+    }
+
+
+def test_to_prometheus():
+    """Test export in the Prometheus text format."""
+    instrumentation = Instrumentation(prefix="test")
+    instrumentation.wrap("linear", 'a"b', lambda: None)()
+
+    text = instrumentation.to_prometheus()
+    assert "# TYPE test_calls_total counter\n" in text
+    assert 'test_calls_total{operation="linear",key="a\\"b"} 1\n' in text
+    assert 'test_errors_total{operation="linear",key="a\\"b"} 0\n' in text
+    assert 'test_seconds_total{operation="linear",key="a\\"b"} ' in text
+
+
+def test_mapper_instrumentation():
+    """
+    Assert that an instrumented mapper returns the same results and
+    records per-key metrics.
+    """
+    instrumentation = Instrumentation()
+    source_metadata = OAIPMHMetadataConverter().get_dict(RECORD)
+    reference = MiamiMetadataMapper()
+    mapper = MiamiMetadataMapper(instrumentation=instrumentation)
+
+    assert mapper.get_all_metadata(source_metadata) \
+        == reference.get_all_metadata(source_metadata)
+    for key in reference.linear_map:
+        assert mapper.get_metadata(key.upper(), source_metadata) \
+            == reference.get_metadata(key, source_metadata)
+    assert mapper.get_metadata("unknown", source_metadata) is None
+
+    stats = instrumentation.as_dict()
+    assert stats["linear"]["dc-title"]["calls"] == 2
+    assert stats["post-process"]["dc-terms-identifier"]["calls"] == 2
+    assert "dc-title" not in stats["post-process"]
+    # other instances are not affected
+    reference.get_all_metadata(source_metadata)
+    assert instrumentation.as_dict()["linear"]["dc-title"]["calls"] == 2
+
+
+def test_mapper_instrumentation_nonlinear():
+    """Test instrumentation of nonlinear map-entries and errors."""
+    instrumentation = Instrumentation()
+    mapper_class = generate_metadata_mapper_class(
+        "Instrumented Mapper",
+        (0, 0, 0, ""),
+        {"a": {"path": ["a"], "post-process": lambda x: x["b"]}},
+        {"c": lambda source_metadata: source_metadata["c"]},
+    )
+    mapper = mapper_class(instrumentation=instrumentation)
+
+    assert mapper._get_metadata_nonlinear("c", {"c": 1}) == 1
+    assert mapper._get_metadata_linear("a", {"a": {"b": 2}}) == 2
+    with pytest.raises(TypeError):
+        mapper.get_metadata("a", {})
+
+    stats = instrumentation.as_dict()
+    assert stats["nonlinear"]["c"]["calls"] == 1
+    assert stats["linear"]["a"] == {
+        "calls": 2, "seconds": stats["linear"]["a"]["seconds"], "errors": 1
+    }
+    assert stats["post-process"]["a"]["errors"] == 1
+
+
+def test_converter_instrumentation():
+    """Test instrumentation of the converter."""
+    instrumentation = Instrumentation()
+    converter = OAIPMHMetadataConverter(instrumentation=instrumentation)
+
+    assert converter.get_dict(RECORD) \
+        == OAIPMHMetadataConverter().get_dict(RECORD)
+    assert len(list(converter.iter_dicts(RECORD))) == 1
+
+    stats = instrumentation.as_dict()
+    assert stats["get_dict"][converter.CONVERTER_TAG]["calls"] == 1
+    assert stats["iter_dicts"][converter.CONVERTER_TAG]["calls"] == 1
@@ -2,10 +2,17 @@
 Test suite for the OAI-PMH-specific implementation of the
 metadata mapper.
 """
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
 import pytest
+from dcm_common.util import value_from_dict_path
 from lzvnrw_converter.oaipmh_converter import OAIPMHMetadataConverter
 from dcm_metadata_mapper.mapper_factory import\
-    generate_metadata_mapper_class, LINEAR_MAP_STANDARD
+    generate_metadata_mapper_class, depends_on, LINEAR_MAP_STANDARD
+from dcm_metadata_mapper.mapper_interface import MapperInterface
+from dcm_metadata_mapper.declarative_map import freeze_linear_map
+from dcm_metadata_mapper.instrumentation import Instrumentation
 
 
 def count_length(source_dict: dict) -> int:
@@ -183,13 +190,14 @@ def test_linear_maps(
     Assert that the linear maps of the different mappers are as expected.
     """
     # user_mapper_only has simply user_linear_map
-    assert user_mapper_only.linear_map == user_linear_map
+    assert user_mapper_only.linear_map == freeze_linear_map(user_linear_map)
     # user_mapper_with_standard has the union
     # of LINEAR_MAP_STANDARD and user_linear_map
     assert user_mapper_with_standard.linear_map ==\
-        LINEAR_MAP_STANDARD | user_linear_map
+        freeze_linear_map(LINEAR_MAP_STANDARD | user_linear_map)
     # user_mapper_only_standard has simply LINEAR_MAP_STANDARD
-    assert user_mapper_only_standard.linear_map == LINEAR_MAP_STANDARD
+    assert user_mapper_only_standard.linear_map ==\
+        freeze_linear_map(LINEAR_MAP_STANDARD)
 
 
 def test_key_existence_in_linear_map(
@@ -402,3 +410,432 @@ def test_deleted_record(deleted_record_dict, user_mapper_with_standard):
     assert result_dc_terms_identifier is None
     assert result_transfer_urls is None
     assert result_unknown_key is None
+
+
+def test_linear_map_compiled_path_fallback(minimal_source_dict):
+    """
+    Ensure that the compiled accessors return the same values as
+    value_from_dict_path, also for paths that cannot be resolved by
+    direct access.
+    """
+    paths = [
+        ["header", "identifier"],
+        ["metadata", "oai_dc:dc", "dc:title", "#text"],
+        ["metadata", "oai_dc:dc", "dc:creator", "unknown"],
+        ["metadata", "unknown", "dc:title"],
+        ["metadata", "oai_dc:dc", "dc:title", "#text", "unknown", "unknown"],
+    ]
+    user_mapper = generate_metadata_mapper_class(
+        mapper_tag="Some Metadata Mapper",
+        spec_version = (0, 3, 2, ""),
+        linear_map={
+            f"path-{i}": {"path": path} for i, path in enumerate(paths)
+        }
+    )()
+
+    for i, path in enumerate(paths):
+        assert user_mapper.get_metadata(
+            key=f"path-{i}",
+            source_metadata=minimal_source_dict
+        ) == value_from_dict_path(minimal_source_dict, path)
+
+
+@pytest.mark.parametrize(
+    "source_dict_fixture",
+    ["minimal_source_dict", "deleted_record_dict"]
+)
+def test_get_all_metadata(source_dict_fixture, request, user_linear_map):
+    """
+    Ensure that get_all_metadata returns the same values as individual
+    calls of get_metadata for all keys of the mapper.
+    """
+    source_dict = request.getfixturevalue(source_dict_fixture)
+    user_mapper = generate_metadata_mapper_class(
+        mapper_tag="Some Metadata Mapper",
+        spec_version = (0, 3, 2, ""),
+        linear_map=user_linear_map | {
+            "dc-title-text": {
+                "path": ["metadata", "oai_dc:dc", "dc:title", "#text"]
+            }
+        },
+        _nonlinear_map={
+            "length-metadata-strings": (
+                lambda source: None if "metadata" not in source
+                else count_length(source)
+            )
+        },
+        use_standard_linear_map=True
+    )()
+
+    result = user_mapper.get_all_metadata(source_dict)
+
+    assert list(result) == list(
+        LINEAR_MAP_STANDARD | user_linear_map
+    ) + ["dc-title-text", "length-metadata-strings"]
+    for key, value in result.items():
+        assert value == user_mapper.get_metadata(key, source_dict)
+
+
+def test_generated_class_cache(user_linear_map):
+    """
+    Assert that identical arguments yield the same class and that
+    instances share the maps of their class.
+    """
+    def generate(**kwargs):
+        return generate_metadata_mapper_class(
+            **(
+                {
+                    "mapper_tag": "Some Metadata Mapper",
+                    "spec_version": (0, 3, 2, ""),
+                    "linear_map": user_linear_map,
+                    "_nonlinear_map": {
+                        "length-metadata-strings": count_length
+                    },
+                    "use_standard_linear_map": True,
+                } | kwargs
+            )
+        )
+
+    mapper_class = generate()
+    # identical content yields same class
+    assert generate() is mapper_class
+    assert generate(linear_map=user_linear_map.copy()) is mapper_class
+    # different content yields different class
+    assert generate(spec_version=(0, 3, 3, "")) is not mapper_class
+    assert generate(use_standard_linear_map=False) is not mapper_class
+    assert generate(
+        linear_map=user_linear_map | {"dc-rights": {"path": ["metadata"]}}
+    ) is not mapper_class
+    assert generate(
+        _nonlinear_map={"length-metadata-strings": lambda x: 0}
+    ) is not mapper_class
+
+    # no per-instance copies of the maps
+    mapper_a, mapper_b = mapper_class(), mapper_class()
+    assert mapper_a.linear_map is mapper_b.linear_map
+    assert mapper_a._nonlinear_map is mapper_b._nonlinear_map
+    assert not vars(mapper_a)
+
+
+def test_source_paths(user_mapper_with_standard, user_linear_map):
+    """
+    Assert that SOURCE_PATHS lists the paths of the linear map and that
+    a projected conversion yields the same metadata as the full
+    conversion.
+    """
+    assert user_mapper_with_standard.SOURCE_PATHS == (
+        ("header", "identifier"),
+        ("metadata", "oai_dc:dc", "dc:creator"),
+        ("metadata", "oai_dc:dc", "dc:title"),
+        ("metadata", "oai_dc:dc", "dc:rights"),
+        ("metadata", "oai_dc:dc", "dc:identifier"),
+    )
+    assert generate_metadata_mapper_class(
+        mapper_tag="Some Metadata Mapper",
+        spec_version = (0, 3, 2, ""),
+        linear_map=user_linear_map,
+        _nonlinear_map={"length-metadata-strings": count_length},
+    ).SOURCE_PATHS is None
+
+    xml = """<OAI-PMH>
+    <GetRecord>
+        <record>
+            <header>
+                <identifier>oai:wwu.de:x</identifier>
+            </header>
+            <metadata>
+                <oai_dc:dc>
+                    <dc:title>This is a test</dc:title>
+                    <dc:description>Large description</dc:description>
+                    <dc:identifier>urn:nbn:de:hbz:x-xxxxxxxxxxx</dc:identifier>
+                </oai_dc:dc>
+            </metadata>
+        </record>
+    </GetRecord>
+</OAI-PMH>
+"""
+    converter = OAIPMHMetadataConverter()
+    projected = converter.get_dict(
+        xml, paths=user_mapper_with_standard.SOURCE_PATHS
+    )
+    assert "dc:description" not in projected["metadata"]["oai_dc:dc"]
+    assert user_mapper_with_standard.get_all_metadata(projected) \
+        == user_mapper_with_standard.get_all_metadata(converter.get_dict(xml))
+
+
+def test_read_only_maps(minimal_source_dict, user_linear_map):
+    """
+    Assert that the maps of a mapper are read-only and decoupled from
+    the arguments of generate_metadata_mapper_class.
+    """
+    nonlinear_map = {"length-metadata-strings": count_length}
+    mapper = generate_metadata_mapper_class(
+        mapper_tag="Some Metadata Mapper",
+        spec_version=(0, 3, 2, ""),
+        linear_map=user_linear_map,
+        _nonlinear_map=nonlinear_map,
+        use_standard_linear_map=True
+    )()
+    expected = mapper.get_all_metadata(minimal_source_dict)
+
+    with pytest.raises(TypeError):
+        mapper.linear_map["dc-title"] = {"value": "title"}
+    with pytest.raises(TypeError):
+        del mapper.linear_map["dc-title"]
+    with pytest.raises(TypeError):
+        mapper.linear_map["dc-title"]["path"] = ["header"]
+    with pytest.raises(TypeError):
+        mapper._nonlinear_map["length-metadata-strings"] = len
+    assert isinstance(mapper.linear_map["dc-title"]["path"], tuple)
+
+    # changes to the arguments do not affect the mapper
+    user_linear_map["source-organization"]["value"] = "other organization"
+    user_linear_map["transfer-urls"]["path"].append("x")
+    del user_linear_map["dc-terms-identifier"]
+    nonlinear_map.clear()
+    assert mapper.get_all_metadata(minimal_source_dict) == expected
+
+    # the maps of a mapper can be the base of another mapper
+    derived = generate_metadata_mapper_class(
+        mapper_tag="Derived Metadata Mapper",
+        spec_version=(0, 3, 2, ""),
+        linear_map=mapper.linear_map
+        | {"source-organization": {"value": "derived organization"}},
+        _nonlinear_map=mapper._nonlinear_map,
+    )()
+    assert derived.get_all_metadata(minimal_source_dict) \
+        == expected | {"source-organization": "derived organization"}
+    assert mapper.get_all_metadata(minimal_source_dict) == expected
+
+
+def test_shared_mapper_threads(user_linear_map):
+    """
+    Stress test: map records from many threads with a single mapper
+    instance and assert that the results match a sequential mapping.
+    """
+    mapper = generate_metadata_mapper_class(
+        mapper_tag="Some Metadata Mapper",
+        spec_version=(0, 3, 2, ""),
+        linear_map=user_linear_map,
+        _nonlinear_map={"length-metadata-strings": count_length},
+        use_standard_linear_map=True
+    )()
+    records = [
+        {
+            "header": {"identifier": f"oai:wwu.de:{i}"},
+            "metadata": {
+                "oai_dc:dc": {
+                    "dc:title": f"Title {i}",
+                    "dc:creator": [f"Creator {i}", f"Creator {i + 1}"],
+                    "dc:identifier": [
+                        f"urn:nbn:de:hbz:6-{i}",
+                        "https://repositorium.uni-muenster.de/transfer/"
+                        + f"miami/{i}.pdf",
+                    ],
+                }
+            },
+        }
+        for i in range(200)
+    ]
+    expected = [mapper.get_all_metadata(record) for record in records]
+    threads = 16
+    barrier = threading.Barrier(threads)
+
+    def work(offset):
+        barrier.wait()
+        results = []
+        for _ in range(20):
+            for i in range(len(records)):
+                index = (i + offset) % len(records)
+                results.append(
+                    (index, mapper.get_all_metadata(records[index]))
+                )
+                assert mapper.get_metadata(
+                    "DC-Title", records[index]
+                ) == expected[index]["dc-title"]
+        return results
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        futures = [
+            executor.submit(work, offset * 13) for offset in range(threads)
+        ]
+        for future in futures:
+            for index, result in future.result():
+                assert result == expected[index]
+
+
+def get_dependent_nonlinear_map(calls: list[str]) -> dict:
+    """
+    Returns a nonlinear map with dependencies between its entries and
+    on linear keys; evaluated keys are appended to `calls`.
+    """
+    def count_identifiers(source_metadata):
+        calls.append("count")
+        return len(
+            source_metadata["metadata"]["oai_dc:dc"]["dc:identifier"]
+        )
+
+    @depends_on("DC-Terms-Identifier", "external-identifier")
+    def primary_identifier(source_metadata, values):
+        calls.append("primary")
+        return (values["dc-terms-identifier"] or [None])[0] \
+            or values["external-identifier"]
+
+    @depends_on("primary-identifier", "identifier-count")
+    def summary(source_metadata, values):
+        calls.append("summary")
+        return f"{values['primary-identifier']} " \
+            + f"({values['identifier-count']})"
+
+    @depends_on("primary-identifier", "summary")
+    def report(source_metadata, values):
+        calls.append("report")
+        return [values["primary-identifier"], values["summary"]]
+
+    # entries are given before their dependencies
+    return {
+        "report": report,
+        "summary": summary,
+        "primary-identifier": primary_identifier,
+        "identifier-count": count_identifiers,
+    }
+
+
+def test_nonlinear_dependencies(minimal_source_dict):
+    """
+    Test nonlinear map-entries that depend on other keys (evaluated at
+    most once per record).
+    """
+    calls = []
+    mapper = generate_metadata_mapper_class(
+        mapper_tag="Some Metadata Mapper",
+        spec_version=(0, 3, 2, ""),
+        linear_map=None,
+        _nonlinear_map=get_dependent_nonlinear_map(calls),
+        use_standard_linear_map=True
+    )()
+    primary = "https://nbn-resolving.org/urn:nbn:de:hbz:x-xxxxxxxxxxx"
+    summary = f"{primary} (5)"
+
+    result = mapper.get_all_metadata(minimal_source_dict)
+
+    assert result["primary-identifier"] == primary
+    assert result["identifier-count"] == 5
+    assert result["summary"] == summary
+    assert result["report"] == [primary, summary]
+    assert sorted(calls) == ["count", "primary", "report", "summary"]
+    assert list(result)[-4:] == [
+        "report", "summary", "primary-identifier", "identifier-count"
+    ]
+
+    calls.clear()
+    assert mapper.get_metadata("Report", minimal_source_dict) \
+        == [primary, summary]
+    assert sorted(calls[:2]) == ["count", "primary"]
+    assert calls[2:] == ["summary", "report"]
+    calls.clear()
+    assert mapper.get_metadata("primary-identifier", minimal_source_dict) \
+        == primary
+    assert calls == ["primary"]
+    assert {
+        key: mapper.get_metadata(key, minimal_source_dict) for key in result
+    } == result
+
+
+def test_nonlinear_dependencies_invalid():
+    """Test unknown and cyclic dependencies of nonlinear map-entries."""
+    with pytest.raises(ValueError, match="unknown key"):
+        generate_metadata_mapper_class(
+            mapper_tag="Some Metadata Mapper",
+            spec_version=(0, 3, 2, ""),
+            linear_map=None,
+            _nonlinear_map={"a": depends_on("b")(lambda s, v: None)},
+        )
+    with pytest.raises(ValueError, match="Cyclic"):
+        generate_metadata_mapper_class(
+            mapper_tag="Some Metadata Mapper",
+            spec_version=(0, 3, 2, ""),
+            linear_map=None,
+            _nonlinear_map={
+                "a": depends_on("b")(lambda s, v: None),
+                "b": depends_on("a")(lambda s, v: None),
+            },
+        )
+
+
+def test_nonlinear_dependencies_instrumentation(minimal_source_dict):
+    """Test instrumented mappers with dependent nonlinear map-entries."""
+    calls = []
+    mapper_class = generate_metadata_mapper_class(
+        mapper_tag="Some Metadata Mapper",
+        spec_version=(0, 3, 2, ""),
+        linear_map=None,
+        _nonlinear_map=get_dependent_nonlinear_map(calls),
+        use_standard_linear_map=True
+    )
+    expected = mapper_class().get_all_metadata(minimal_source_dict)
+    instrumentation = Instrumentation()
+    mapper = mapper_class(instrumentation=instrumentation)
+
+    assert mapper.get_all_metadata(minimal_source_dict) == expected
+    assert list(mapper.get_all_metadata(minimal_source_dict)) \
+        == list(expected)
+    stats = instrumentation.as_dict()
+    assert stats["nonlinear"]["primary-identifier"]["calls"] == 2
+    assert stats["linear"]["dc-terms-identifier"]["calls"] == 2
+    assert mapper.get_metadata("summary", minimal_source_dict) \
+        == expected["summary"]
+
+
+def test_get_all_metadata_default():
+    """
+    Test that MapperInterface-implementations without get_all_metadata
+    can be instantiated and use the default implementation.
+    """
+    class SomeMapper(MapperInterface):
+        """Mapper without get_all_metadata."""
+        _SPECVERSION = (0, 0, 0, "")
+        MAPPER_TAG = "Some Mapper"
+        linear_map = {"a": {"path": ["a"]}}
+        _nonlinear_map = {"b": lambda source_metadata: 2}
+
+        def get_metadata(self, key, source_metadata):
+            if key == "b":
+                return self._nonlinear_map["b"](source_metadata)
+            return source_metadata.get(key)
+
+    class OtherMapper(MapperInterface):
+        """Mapper without maps."""
+        _SPECVERSION = (0, 0, 0, "")
+        MAPPER_TAG = "Other Mapper"
+
+        def get_metadata(self, key, source_metadata):
+            return None
+
+    assert SomeMapper().get_all_metadata({"a": 1}) == {"a": 1, "b": 2}
+    assert OtherMapper().get_all_metadata({"a": 1}) == {}
+
+
+def test_empty_path(minimal_source_dict):
+    """
+    Assert that entries with an empty path return the entire source
+    metadata in get_metadata and get_all_metadata.
+    """
+    mapper = generate_metadata_mapper_class(
+        mapper_tag="Some Metadata Mapper",
+        spec_version=(0, 3, 2, ""),
+        linear_map={
+            "record": {"path": []},
+            "header": {"path": [], "post-process": lambda x: x["header"]},
+            "dc-title": {"path": ["metadata", "oai_dc:dc", "dc:title"]},
+        },
+    )()
+
+    result = mapper.get_all_metadata(minimal_source_dict)
+
+    assert result["record"] is minimal_source_dict
+    assert result["header"] == minimal_source_dict["header"]
+    assert result == {
+        key: mapper.get_metadata(key, minimal_source_dict) for key in result
+    }
+    assert mapper.SOURCE_PATHS is None
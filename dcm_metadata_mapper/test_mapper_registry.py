@@ -0,0 +1,110 @@
+"""
+Test suite for the mapper registry.
+"""
+import sys
+import importlib.metadata
+from importlib.metadata import EntryPoint
+
+import pytest
+from dcm_metadata_mapper.mapper_registry import MapperRegistry
+from lzvnrw_mapper import registry
+from lzvnrw_mapper.miami import MiamiMetadataMapper
+
+
+@pytest.fixture(name="mapper_module")
+def get_mapper_module(tmp_path, monkeypatch):
+    """
+    Returns the name of a (not yet imported) module that defines a
+    mapper-class `SomeMapper`.
+    """
+    (tmp_path / "some_mapper_module.py").write_text(
+        """
+from dcm_metadata_mapper.mapper_factory import\\
+    generate_metadata_mapper_class
+
+SomeMapper = generate_metadata_mapper_class(
+    mapper_tag="Some Metadata Mapper",
+    spec_version = (0, 3, 2, ""),
+    linear_map={"source-organization": {"value": "some organization"}}
+)
+""",
+        encoding="utf-8"
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield "some_mapper_module"
+    sys.modules.pop("some_mapper_module", None)
+
+
+def test_registry_lazy_import(mapper_module):
+    """Assert that the mapper-module is imported on first lookup."""
+    some_registry = MapperRegistry(entry_point_group=None)
+    some_registry.register(
+        f"{mapper_module}:SomeMapper",
+        tag="Some Metadata Mapper",
+        aliases=["some"]
+    )
+
+    assert mapper_module not in sys.modules
+    assert "some" in some_registry.names()
+    assert mapper_module not in sys.modules
+
+    mapper_class = some_registry.get("some")
+
+    assert mapper_module in sys.modules
+    assert mapper_class.MAPPER_TAG == "Some Metadata Mapper"
+    assert some_registry.get("Some Metadata Mapper") is mapper_class
+
+
+def test_registry_unknown_and_conflict():
+    """Test behavior for unknown names and conflicting registrations."""
+    some_registry = MapperRegistry(entry_point_group=None)
+    some_registry.register("a:A", aliases=["a"])
+    # repeated registration of the same reference is accepted
+    some_registry.register("a:A", aliases=["a"])
+
+    with pytest.raises(ValueError):
+        some_registry.register("b:B", aliases=["a"])
+    with pytest.raises(ValueError):
+        some_registry.register("b.B", aliases=["b"])
+
+    some_registry = MapperRegistry(entry_point_group=None)
+    with pytest.raises(KeyError):
+        some_registry.get("unknown")
+    assert "unknown" not in some_registry
+
+
+def test_registry_entry_points(mapper_module, monkeypatch):
+    """Test the discovery of mapper-classes via entry points."""
+    monkeypatch.setattr(
+        importlib.metadata,
+        "entry_points",
+        lambda group: [
+            EntryPoint(
+                name="some",
+                value=f"{mapper_module}:SomeMapper",
+                group=group
+            )
+        ]
+    )
+    some_registry = MapperRegistry()
+
+    assert some_registry.names() == ["some"]
+    # lookup by tag imports the entry points' classes
+    assert some_registry.get("Some Metadata Mapper") \
+        is some_registry.get("some")
+
+
+@pytest.mark.parametrize(
+    ("name", "mapper_tag"),
+    [
+        ("miami", "Miami Metadata Mapper"),
+        ("hbz-opus", "Hbz OPUS Metadata Mapper"),
+        ("whge-opus", "Whge OPUS Metadata Mapper"),
+        ("hfm-opus", "Hfm OPUS Metadata Mapper"),
+    ]
+)
+def test_lzvnrw_registry(name, mapper_tag):
+    """Test the registry of the lzvnrw_mapper-package."""
+    assert registry.get(name).MAPPER_TAG == mapper_tag
+    assert registry.get(mapper_tag) is registry.get(name)
+    assert registry.get("miami") is MiamiMetadataMapper
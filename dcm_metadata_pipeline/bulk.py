@@ -0,0 +1,734 @@
+"""
+This module contains a process-pool based pipeline for the bulk-
+conversion and -mapping of source metadata-files and OAI-PMH dumps
+(files or streams) as well as the re-mapping of converted records from
+a record store.
+"""
+
+from typing import Any, Optional, Callable, Iterable, Iterator
+from dataclasses import dataclass, field
+from functools import partial
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+from glob import glob
+from time import perf_counter
+import os
+
+from dcm_metadata_mapper.mapper_interface import MapperInterface
+from dcm_metadata_converter.converter_interface import ConverterInterface
+from lzvnrw_converter.oaipmh_converter import OAIPMHMetadataConverter
+from lzvnrw_converter.oaipmh_dump import \
+    IncompleteRecordError, OAIPMHDumpReader, record_converter, \
+    scan_records
+from lzvnrw_converter.compression import SUFFIXES
+from lzvnrw_mapper import registry
+from dcm_metadata_pipeline.cache import MappingCache
+from dcm_metadata_pipeline.record_store import RecordStore, read_chunk
+from dcm_metadata_pipeline.stages import Stage, StagedPipeline
+
+
+# glob-patterns of source metadata-files (plain and compressed XML)
+DEFAULT_PATTERNS = ("**/*.xml",) + tuple(
+    f"**/*.xml{suffix}" for suffix in SUFFIXES
+)
+
+
+@dataclass(frozen=True)
+class BulkResult:
+    """
+    Result of the conversion and mapping of a single file (or record
+    of a dump-file).
+
+    Keyword arguments:
+    path -- path of the source file
+    metadata -- mapped metadata as key-value pairs (see
+                MapperInterface.get_all_metadata); None if an error
+                occurred
+    error -- error message if the file could not be processed
+             (default None)
+    offset -- byte-offset of the record in a dump-file (default None)
+    timings -- seconds spent per stage ("read", "convert", "map"; with a
+               cache, conversion is included in "map"); not compared
+               (default None)
+    """
+    path: str
+    metadata: Optional[dict[str, Any]]
+    error: Optional[str] = None
+    offset: Optional[int] = None
+    timings: Optional[dict[str, float]] = field(
+        default=None, compare=False
+    )
+
+
+def collect_paths(
+    sources: str | Path | Iterable[str | Path],
+    pattern: str | Iterable[str] = DEFAULT_PATTERNS,
+    unmatched: Optional[list[str]] = None
+) -> list[Path]:
+    """
+    Returns the list of files given by `sources`.
+
+    Keyword arguments:
+    sources -- single or multiple entries of either a file, a directory
+               (searched with `pattern`), or a glob-expression
+    pattern -- one or multiple glob-patterns used for directories
+               (default DEFAULT_PATTERNS; XML-files, also gzip- or
+               zstd-compressed)
+    unmatched -- if given, the sources that match no file (including
+                 missing files and empty directories) are appended
+                 (default None)
+    """
+    if isinstance(sources, (str, Path)):
+        sources = [sources]
+    patterns = [pattern] if isinstance(pattern, str) else list(pattern)
+
+    paths = []
+    for source in sources:
+        count = len(paths)
+        source = Path(source)
+        if source.is_dir():
+            paths.extend(
+                sorted(
+                    {
+                        p for pattern_ in patterns
+                        for p in source.glob(pattern_) if p.is_file()
+                    }
+                )
+            )
+        elif source.is_file():
+            paths.append(source)
+        else:
+            paths.extend(
+                Path(p) for p in sorted(glob(str(source), recursive=True))
+            )
+        if len(paths) == count and unmatched is not None:
+            unmatched.append(str(source))
+    return paths
+
+
+# mapper instances of the current (worker-)process by tag
+_mapper_instances: dict[str, MapperInterface] = {}
+
+
+def get_mapper(mapper_tag: str) -> MapperInterface:
+    """
+    Returns an instance of the mapper-class identified by `mapper_tag`
+    (MAPPER_TAG or alias; see lzvnrw_mapper.registry). Instances are
+    created once per process; the factory-generated classes cannot be
+    pickled, so workers look up the classes by tag.
+    """
+    if mapper_tag not in _mapper_instances:
+        try:
+            mapper_class = registry.get(mapper_tag)
+        except KeyError as exc_info:
+            raise ValueError(f"Unknown mapper '{mapper_tag}'.") from exc_info
+        _mapper_instances[mapper_tag] = mapper_class()
+    return _mapper_instances[mapper_tag]
+
+
+# caches of the current (worker-)process by directory
+_cache_instances: dict[str, MappingCache] = {}
+
+
+def get_cache(directory: str) -> MappingCache:
+    """
+    Returns the MappingCache of the current process for `directory`.
+    """
+    if directory not in _cache_instances:
+        _cache_instances[directory] = MappingCache(directory=directory)
+    return _cache_instances[directory]
+
+
+def map_file(
+    path: str | Path,
+    mapper: MapperInterface,
+    converter: ConverterInterface,
+    projected: bool = False,
+    cache: Optional[MappingCache] = None
+) -> BulkResult:
+    """
+    Returns the BulkResult of converting and mapping a single file
+    (gzip- or zstd-compressed files are decompressed by converters that
+    support it, see OAIPMHMetadataConverter.get_dict).
+
+    Keyword arguments:
+    path -- path of the source file
+    mapper -- mapper-instance
+    converter -- converter-instance
+    projected -- if True and the mapper provides SOURCE_PATHS, only
+                 these paths are converted (the converter has to
+                 support the argument `paths` in get_dict; see
+                 OAIPMHMetadataConverter) (default False)
+    cache -- cache for the mapped metadata (see MappingCache)
+             (default None)
+    """
+    paths = getattr(mapper, "SOURCE_PATHS", None) if projected else None
+    kwargs = {} if paths is None else {"paths": paths}
+    try:
+        start = perf_counter()
+        source_metadata = Path(path).read_bytes()
+        read = perf_counter()
+        if cache is not None:
+            metadata = cache.get_all_metadata(
+                source_metadata, mapper, converter, **kwargs
+            )
+            return BulkResult(
+                str(path),
+                metadata,
+                timings={"read": read - start, "map": perf_counter() - read}
+            )
+        source_dict = converter.get_dict(source_metadata, **kwargs)
+        converted = perf_counter()
+        metadata = mapper.get_all_metadata(source_dict)
+        return BulkResult(
+            str(path),
+            metadata,
+            timings={
+                "read": read - start,
+                "convert": converted - read,
+                "map": perf_counter() - converted,
+            }
+        )
+    except Exception as exc_info:  # pylint: disable=broad-exception-caught
+        return BulkResult(
+            str(path), None, f"{type(exc_info).__name__}: {exc_info}"
+        )
+
+
+def _map_chunk(
+    mapper_tag: str,
+    converter: type[ConverterInterface],
+    paths: list[str],
+    projected: bool,
+    cache_dir: Optional[str] = None
+) -> list[BulkResult]:
+    """Worker task: convert and map a chunk of files."""
+    mapper = get_mapper(mapper_tag)
+    converter_instance = converter()
+    cache = None if cache_dir is None else get_cache(cache_dir)
+    return [
+        map_file(path, mapper, converter_instance, projected, cache)
+        for path in paths
+    ]
+
+
+def map_files(
+    paths: Iterable[str | Path],
+    mapper_tag: str,
+    converter: type[ConverterInterface] = OAIPMHMetadataConverter,
+    workers: Optional[int] = None,
+    chunksize: int = 64,
+    ordered: bool = True,
+    projected: bool = False,
+    cache_dir: Optional[str | Path] = None
+) -> Iterator[BulkResult]:
+    """
+    Convert and map files in a pool of worker processes.
+
+    Returns iterator of BulkResults. Tasks are submitted in chunks
+    while the results are consumed, i.e. the number of pending tasks
+    (and their results) is bounded by twice the number of workers.
+
+    Keyword arguments:
+    paths -- iterable of paths to source metadata-files
+             (see collect_paths)
+    mapper_tag -- MAPPER_TAG or alias of the mapper
+                  (see lzvnrw_mapper.registry)
+    converter -- converter-class (default OAIPMHMetadataConverter)
+    workers -- number of worker processes; 0 runs all tasks in the
+               current process (default None; uses os.cpu_count())
+    chunksize -- number of files per task (default 64)
+    ordered -- if True, results are returned in the order of `paths`;
+               otherwise in the order of completion (default True)
+    projected -- use projected conversion (see map_file)
+                 (default False)
+    cache_dir -- directory of a MappingCache shared by the workers;
+                 files with identical content are only mapped once
+                 (default None)
+    """
+    # validate mapper before spawning workers
+    get_mapper(mapper_tag)
+    if cache_dir is not None:
+        cache_dir = str(cache_dir)
+    yield from _run(
+        _map_chunk,
+        (
+            (mapper_tag, converter, chunk, projected, cache_dir)
+            for chunk in _chunked((str(p) for p in paths), chunksize)
+        ),
+        workers,
+        ordered
+    )
+
+
+def _read_item(path: str) -> tuple[str, bytes, dict] | BulkResult:
+    """Staged pipeline: read a file."""
+    try:
+        start = perf_counter()
+        data = Path(path).read_bytes()
+        return path, data, {"read": perf_counter() - start}
+    except Exception as exc_info:  # pylint: disable=broad-exception-caught
+        return BulkResult(path, None, f"{type(exc_info).__name__}: {exc_info}")
+
+
+def _convert_item(
+    converter: type[ConverterInterface],
+    paths: Optional[tuple],
+    item: tuple[str, bytes, dict] | BulkResult
+) -> tuple[str, Any, dict] | BulkResult:
+    """Staged pipeline: convert the data of a file."""
+    if isinstance(item, BulkResult):
+        return item
+    path, data, timings = item
+    try:
+        start = perf_counter()
+        kwargs = {} if paths is None else {"paths": paths}
+        record = converter().get_dict(data, **kwargs)
+        timings["convert"] = perf_counter() - start
+        return path, record, timings
+    except Exception as exc_info:  # pylint: disable=broad-exception-caught
+        return BulkResult(path, None, f"{type(exc_info).__name__}: {exc_info}")
+
+
+def _map_item(
+    mapper_tag: str, item: tuple[str, Any, dict] | BulkResult
+) -> BulkResult:
+    """Staged pipeline: map a converted record."""
+    if isinstance(item, BulkResult):
+        return item
+    path, record, timings = item
+    try:
+        start = perf_counter()
+        metadata = get_mapper(mapper_tag).get_all_metadata(record)
+        timings["map"] = perf_counter() - start
+        return BulkResult(path, metadata, timings=timings)
+    except Exception as exc_info:  # pylint: disable=broad-exception-caught
+        return BulkResult(path, None, f"{type(exc_info).__name__}: {exc_info}")
+
+
+def staged_pipeline(
+    mapper_tag: str,
+    converter: type[ConverterInterface] = OAIPMHMetadataConverter,
+    read_workers: int = 4,
+    convert_workers: Optional[int] = None,
+    map_workers: int = 1,
+    batch_size: int = 16,
+    queue_size: int = 256,
+    projected: bool = False
+) -> StagedPipeline:
+    """
+    Returns a staged pipeline (see stages.StagedPipeline) for the
+    conversion and mapping of files with the stages "read" (threads),
+    "convert" (processes), and "map" (processes); its results are
+    BulkResults. The number of workers per stage can be tuned with the
+    statistics of the pipeline (see StagedPipeline.stats).
+
+    Keyword arguments:
+    mapper_tag -- MAPPER_TAG or alias of the mapper
+                  (see lzvnrw_mapper.registry)
+    converter -- converter-class (default OAIPMHMetadataConverter)
+    read_workers -- number of threads reading files (default 4)
+    convert_workers -- number of processes converting records
+                       (default None; uses os.cpu_count())
+    map_workers -- number of processes mapping records (default 1)
+    batch_size -- number of items per batch sent to the processes
+                  (default 16)
+    queue_size -- capacity of the queues between the stages
+                  (default 256)
+    projected -- use projected conversion (see map_file)
+                 (default False)
+    """
+    mapper = get_mapper(mapper_tag)
+    paths = getattr(mapper, "SOURCE_PATHS", None) if projected else None
+    return StagedPipeline(
+        [
+            Stage("read", _read_item, read_workers),
+            Stage(
+                "convert",
+                partial(_convert_item, converter, paths),
+                convert_workers or os.cpu_count() or 1,
+                processes=True,
+                batch_size=batch_size
+            ),
+            Stage(
+                "map",
+                partial(_map_item, mapper_tag),
+                map_workers,
+                processes=True,
+                batch_size=batch_size
+            ),
+        ],
+        queue_size
+    )
+
+
+def map_files_staged(
+    paths: Iterable[str | Path],
+    mapper_tag: str,
+    pipeline: Optional[StagedPipeline] = None,
+    ordered: bool = True,
+    **kwargs
+) -> Iterator[BulkResult]:
+    """
+    Convert and map files in a staged pipeline (see staged_pipeline)
+    in which reading, conversion, and mapping run concurrently and are
+    connected by bounded queues (backpressure).
+
+    Returns iterator of BulkResults.
+
+    Keyword arguments:
+    paths -- iterable of paths to source metadata-files
+             (see collect_paths)
+    mapper_tag -- MAPPER_TAG or alias of the mapper
+                  (see lzvnrw_mapper.registry)
+    pipeline -- pipeline returned by staged_pipeline, e.g. to access
+                its statistics (default None; uses
+                staged_pipeline(mapper_tag, **kwargs))
+    ordered -- if True, results are returned in the order of `paths`;
+               otherwise in the order of completion (default True)
+    kwargs -- keyword arguments for staged_pipeline
+    """
+    if pipeline is None:
+        pipeline = staged_pipeline(mapper_tag, **kwargs)
+    yield from pipeline.run((str(p) for p in paths), ordered)
+
+
+def _map_range(
+    mapper_tag: str,
+    path: str,
+    start: int,
+    end: int,
+    engine: str,
+    projected: bool
+) -> list[BulkResult]:
+    """Worker task: convert and map the records in a range of a dump."""
+    mapper = get_mapper(mapper_tag)
+    paths = getattr(mapper, "SOURCE_PATHS", None) if projected else None
+    results = []
+    with OAIPMHDumpReader(path, engine=engine, paths=paths) as reader:
+        try:
+            for offset, view in reader.slices(start, end):
+                try:
+                    results.append(
+                        _map_record(
+                            path, offset, view, mapper, reader.convert
+                        )
+                    )
+                finally:
+                    view.release()
+        except IncompleteRecordError as exc_info:
+            # keep the records that have been mapped already
+            results.append(
+                BulkResult(
+                    path, None, f"{type(exc_info).__name__}: {exc_info}",
+                    exc_info.offset
+                )
+            )
+    return results
+
+
+def _map_records(
+    mapper_tag: str,
+    source: str,
+    records: list[tuple[int, bytes]],
+    engine: str,
+    projected: bool
+) -> list[BulkResult]:
+    """
+    Worker task: convert and map a batch of raw records (errors of the
+    stream are given as exceptions instead of raw records, see
+    _scan_records).
+    """
+    mapper = get_mapper(mapper_tag)
+    paths = getattr(mapper, "SOURCE_PATHS", None) if projected else None
+    convert = record_converter(engine, paths)
+    return [
+        BulkResult(source, None, f"{type(raw).__name__}: {raw}", offset)
+        if isinstance(raw, Exception)
+        else _map_record(source, offset, raw, mapper, convert)
+        for offset, raw in records
+    ]
+
+
+def _scan_records(
+    chunks: Iterable[bytes]
+) -> Iterator[tuple[Optional[int], bytes | Exception]]:
+    """
+    Returns iterator of the records of a stream (see scan_records); an
+    incomplete last record or a truncated or corrupt compressed stream
+    are returned as a tuple of offset and exception.
+    """
+    try:
+        yield from scan_records(chunks)
+    except IncompleteRecordError as exc_info:
+        yield exc_info.offset, exc_info
+    except (EOFError, ValueError) as exc_info:
+        # truncated (EOFError) or corrupt compressed stream
+        yield None, exc_info
+
+
+def _map_record(
+    path: str,
+    offset: int,
+    raw: bytes | memoryview,
+    mapper: MapperInterface,
+    convert: Callable[[bytes | memoryview], Any]
+) -> BulkResult:
+    """Returns the BulkResult of converting and mapping a raw record."""
+    try:
+        start = perf_counter()
+        record = convert(raw)
+        converted = perf_counter()
+        metadata = mapper.get_all_metadata(record)
+        return BulkResult(
+            path,
+            metadata,
+            offset=offset,
+            timings={
+                "convert": converted - start,
+                "map": perf_counter() - converted,
+            }
+        )
+    except Exception as exc_info:  # pylint: disable=broad-exception-caught
+        return BulkResult(
+            path, None, f"{type(exc_info).__name__}: {exc_info}", offset
+        )
+
+
+def map_dump(
+    path: str | Path,
+    mapper_tag: str,
+    engine: str = "xmltodict",
+    workers: Optional[int] = None,
+    range_size: int = 16 * 1024 * 1024,
+    ordered: bool = True,
+    projected: bool = False
+) -> Iterator[BulkResult]:
+    """
+    Convert and map the records of an OAI-PMH dump (see
+    lzvnrw_converter.oaipmh_dump) in a pool of worker processes.
+
+    Returns iterator of BulkResults (with the byte-offsets of the
+    records). The file is split into byte-ranges of about `range_size`
+    bytes that are memory-mapped and processed by the workers
+    independently; like in map_files, the number of pending ranges is
+    bounded by twice the number of workers. An incomplete record (e.g.
+    of a truncated dump) is returned as BulkResult with error.
+
+    Keyword arguments:
+    path -- path of the dump-file
+    mapper_tag -- MAPPER_TAG or alias of the mapper
+                  (see lzvnrw_mapper.registry)
+    engine -- name of the XML-engine (see xml_engine.ENGINES)
+              (default "xmltodict")
+    workers -- number of worker processes (see map_files)
+               (default None; uses os.cpu_count())
+    range_size -- approximate size of the byte-ranges in bytes
+                  (default 16 MiB)
+    ordered -- if True, results are returned in the order of the
+               records; otherwise in the order of completion
+               (default True)
+    projected -- use projected conversion (see map_file)
+                 (default False)
+    """
+    # validate mapper before spawning workers
+    get_mapper(mapper_tag)
+    with OAIPMHDumpReader(path) as reader:
+        ranges = reader.ranges(max(1, -(-len(reader) // range_size)))
+    yield from _run(
+        _map_range,
+        (
+            (mapper_tag, str(path), start, end, engine, projected)
+            for start, end in ranges
+        ),
+        workers,
+        ordered
+    )
+
+
+def map_stream(
+    chunks: Iterable[bytes],
+    mapper_tag: str,
+    source: str = "<stream>",
+    engine: str = "xmltodict",
+    workers: Optional[int] = None,
+    batch_size: int = 1000,
+    ordered: bool = True,
+    projected: bool = False
+) -> Iterator[BulkResult]:
+    """
+    Convert and map the records of an OAI-PMH dump that is read as a
+    stream (e.g. from stdin or a compressed file; see
+    lzvnrw_converter.oaipmh_dump.scan_records) in a pool of worker
+    processes.
+
+    Returns iterator of BulkResults (with the byte-offsets of the
+    records in the stream). The records are scanned in the current
+    process and sent to the workers in batches of `batch_size`; the
+    stream is only read as far as required by the pending batches
+    (at most twice the number of workers). An incomplete last record
+    or a truncated compressed stream is returned as BulkResult with
+    error.
+
+    Keyword arguments:
+    chunks -- iterable of (uncompressed) bytes-chunks of the dump (see
+              lzvnrw_converter.compression.decompress_chunks)
+    mapper_tag -- MAPPER_TAG or alias of the mapper
+                  (see lzvnrw_mapper.registry)
+    source -- name of the stream used as path in the results
+              (default "<stream>")
+    engine -- name of the XML-engine (see xml_engine.ENGINES)
+              (default "xmltodict")
+    workers -- number of worker processes (see map_files)
+               (default None; uses os.cpu_count())
+    batch_size -- number of records per task (default 1000)
+    ordered -- if True, results are returned in the order of the
+               records; otherwise in the order of completion
+               (default True)
+    projected -- use projected conversion (see map_file)
+                 (default False)
+    """
+    # validate mapper before spawning workers
+    get_mapper(mapper_tag)
+    yield from _run(
+        _map_records,
+        (
+            (mapper_tag, source, batch, engine, projected)
+            for batch in _chunked(_scan_records(chunks), batch_size)
+        ),
+        workers,
+        ordered
+    )
+
+
+def _map_store_chunk(
+    mapper_tag: str,
+    path: str,
+    offsets: list[int]
+) -> list[BulkResult]:
+    """Worker task: map the current records of a record store-chunk."""
+    mapper = get_mapper(mapper_tag)
+    results = []
+    start = perf_counter()
+    for offset, record in read_chunk(path, offsets):
+        loaded = perf_counter()
+        try:
+            metadata = mapper.get_all_metadata(record)
+        except Exception as exc_info:  # pylint: disable=broad-exception-caught
+            results.append(
+                BulkResult(
+                    path, None, f"{type(exc_info).__name__}: {exc_info}",
+                    offset
+                )
+            )
+        else:
+            results.append(
+                BulkResult(
+                    path,
+                    metadata,
+                    offset=offset,
+                    timings={
+                        "read": loaded - start,
+                        "map": perf_counter() - loaded,
+                    }
+                )
+            )
+        start = perf_counter()
+    return results
+
+
+def map_store(
+    directory: str | Path,
+    mapper_tag: str,
+    workers: Optional[int] = None,
+    ordered: bool = True,
+    **kwargs
+) -> Iterator[BulkResult]:
+    """
+    Map the converted records of a record store (see
+    record_store.RecordStore) in a pool of worker processes without
+    parsing the source metadata again.
+
+    Returns iterator of BulkResults (with the path of the chunk-file and
+    the byte-offset of the record). Every chunk-file is read
+    sequentially by one worker. Raises FileNotFoundError if there is no
+    store at `directory` and ValueError for a store of another
+    converter (see RecordStore).
+
+    Keyword arguments:
+    directory -- directory of the record store
+    mapper_tag -- MAPPER_TAG or alias of the mapper
+                  (see lzvnrw_mapper.registry)
+    workers -- number of worker processes (see map_files)
+               (default None; uses os.cpu_count())
+    ordered -- if True, results are returned in the order of the
+               records in the store; otherwise in the order of
+               completion (default True)
+    kwargs -- additional keyword arguments for RecordStore (e.g. the
+              converter of the stored records)
+    """
+    # validate mapper before spawning workers
+    get_mapper(mapper_tag)
+    with RecordStore(directory, create=False, **kwargs) as store:
+        chunks = store.chunks()
+    yield from _run(
+        _map_store_chunk,
+        ((mapper_tag, str(path), offsets) for path, offsets in chunks),
+        workers,
+        ordered
+    )
+
+
+def _run(
+    task: Callable[..., list[BulkResult]],
+    arguments: Iterator[tuple],
+    workers: Optional[int],
+    ordered: bool
+) -> Iterator[BulkResult]:
+    """
+    Runs `task` for all `arguments` in a pool of worker processes and
+    returns iterator of the results. Tasks are submitted while the
+    results are consumed (at most twice the number of workers are
+    pending). With zero workers, the tasks run in the current process.
+    """
+    if workers == 0:
+        for args in arguments:
+            yield from task(*args)
+        return
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+
+        def submit() -> bool:
+            args = next(arguments, None)
+            if args is None:
+                return False
+            pending.append(executor.submit(task, *args))
+            return True
+
+        while len(pending) < 2 * workers and submit():
+            pass
+
+        while pending:
+            if ordered:
+                done = [pending.popleft()]
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.remove(future)
+            for future in done:
+                submit()
+                yield from future.result()
+
+
+def _chunked(iterable: Iterable[Any], size: int) -> Iterator[list[Any]]:
+    """Returns iterator of lists with `size` elements of `iterable`."""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,278 @@
+"""
+This module contains a content-addressed cache for the results of the
+conversion and mapping of source metadata with an in-memory LRU-tier
+and an optional on-disk tier (with size-based eviction).
+"""
+
+from typing import Any, Optional
+from collections import OrderedDict
+from pathlib import Path
+from hashlib import blake2b
+from threading import RLock
+import copy
+import json
+import os
+import tempfile
+
+from dcm_metadata_mapper.mapper_interface import MapperInterface
+from dcm_metadata_converter.converter_interface import ConverterInterface
+from lzvnrw_converter.compact import thaw
+
+
+def cache_key(
+    source_metadata: str | bytes,
+    mapper: MapperInterface,
+    converter: ConverterInterface
+) -> str:
+    """
+    Returns the cache key for the mapped metadata of `source_metadata`.
+
+    The key is a hash of the raw source metadata and of the tags and
+    specification versions (_SPECVERSION) of mapper and converter, i.e.
+    a new specification version invalidates previous entries.
+
+    Keyword arguments:
+    source_metadata -- source metadata in source format
+    mapper -- mapper-instance
+    converter -- converter-instance
+    """
+    if isinstance(source_metadata, str):
+        source_metadata = source_metadata.encode("utf-8")
+    digest = blake2b(digest_size=20)
+    digest.update(
+        repr(
+            (
+                mapper.MAPPER_TAG,
+                mapper.get_specversion(),
+                converter.CONVERTER_TAG,
+                converter.get_specversion(),
+            )
+        ).encode("utf-8")
+    )
+    digest.update(b"\0")
+    digest.update(source_metadata)
+    return digest.hexdigest()
+
+
+class MappingCache:
+    """
+    Content-addressed cache for mapped metadata (see
+    MapperInterface.get_all_metadata).
+
+    Entries are kept in an in-memory LRU-tier with `maxsize` entries
+    and, if `directory` is given, in an on-disk tier (one JSON-file per
+    entry) of at most `max_disk_size` bytes; when exceeded, the least
+    recently used files are removed. The on-disk tier can be shared by
+    multiple processes (files are written atomically): its size is
+    accounted against the directory itself, which is re-scanned when
+    the tracked size exceeds `max_disk_size` and after every
+    `max_disk_size / 16` bytes written by this instance; i.e. with N
+    processes, the directory may temporarily exceed the limit by about
+    N x `max_disk_size` / 16 bytes. The recency of entries is shared
+    via the modification times of the files.
+
+    Returned values are copies, i.e. modifications do not affect the
+    cache.
+
+    Keyword arguments:
+    maxsize -- maximum number of entries of the in-memory tier
+               (default 1024)
+    directory -- directory of the on-disk tier; None disables the tier
+                 (default None)
+    max_disk_size -- maximum size of the on-disk tier in bytes
+                     (default 256 MiB)
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        directory: Optional[str | Path] = None,
+        max_disk_size: int = 256 * 1024 * 1024
+    ) -> None:
+        self.maxsize = maxsize
+        self.directory = None if directory is None else Path(directory)
+        self.max_disk_size = max_disk_size
+        self.hits = 0
+        self.misses = 0
+        self._memory: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        self._files: OrderedDict[str, int] = OrderedDict()
+        self._disk_size = 0
+        # bytes written since the last scan of the directory
+        self._written = 0
+        self._lock = RLock()
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._scan()
+
+    def get(self, key: str) -> Optional[dict[str, Any]]:
+        """
+        Returns a copy of the cached value for `key` or None.
+
+        Keyword arguments:
+        key -- cache key (see cache_key)
+        """
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+            elif self.directory is not None:
+                value = self._read(key)
+                if value is not None:
+                    self._remember(key, value)
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return copy.deepcopy(value)
+
+    def put(self, key: str, value: dict[str, Any]) -> None:
+        """
+        Store `value` (a copy) for `key`.
+
+        Keyword arguments:
+        key -- cache key (see cache_key)
+        value -- mapped metadata
+        """
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._remember(key, value)
+            if self.directory is not None:
+                self._write(key, value)
+
+    def clear(self) -> None:
+        """
+        Remove all entries (of both tiers, including the files written
+        by other processes).
+        """
+        with self._lock:
+            self._memory.clear()
+            if self.directory is not None:
+                self._scan(evict=False)
+            for key in list(self._files):
+                self._remove(key)
+
+    def get_all_metadata(
+        self,
+        source_metadata: str | bytes,
+        mapper: MapperInterface,
+        converter: ConverterInterface,
+        **kwargs
+    ) -> dict[str, Any]:
+        """
+        Returns the mapped metadata of `source_metadata` (see
+        MapperInterface.get_all_metadata) from the cache or, in case of
+        a cache miss, converts and maps the source metadata and stores
+        the result.
+
+        Keyword arguments:
+        source_metadata -- source metadata in source format
+        mapper -- mapper-instance
+        converter -- converter-instance
+        kwargs -- additional keyword arguments for converter.get_dict
+                  (e.g. `paths`; these must not affect the result)
+        """
+        key = cache_key(source_metadata, mapper, converter)
+        metadata = self.get(key)
+        if metadata is None:
+            metadata = mapper.get_all_metadata(
+                converter.get_dict(source_metadata, **kwargs)
+            )
+            self.put(key, metadata)
+        return metadata
+
+    @property
+    def disk_size(self) -> int:
+        """Size of the on-disk tier in bytes."""
+        return self._disk_size
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    def _remember(self, key: str, value: dict[str, Any]) -> None:
+        """Adds an entry to the in-memory tier (evicting the LRU)."""
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def _path(self, key: str) -> Path:
+        """Returns the path of an entry in the on-disk tier."""
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _scan(self, evict: bool = True) -> None:
+        """
+        (Re-)Initializes the on-disk tier with the files in the directory
+        (including those of other processes) ordered by mtime; ties are
+        resolved by the recency known to this instance.
+        """
+        rank = {key: index for index, key in enumerate(self._files)}
+        files = []
+        for path in self.directory.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append(
+                (
+                    stat.st_mtime_ns, rank.get(path.stem, -1), path.stem,
+                    stat.st_size
+                )
+            )
+        self._files.clear()
+        self._disk_size = 0
+        self._written = 0
+        for _, _, key, size in sorted(files):
+            self._files[key] = size
+            self._disk_size += size
+        if evict:
+            self._evict()
+
+    def _read(self, key: str) -> Optional[dict[str, Any]]:
+        """Returns an entry of the on-disk tier or None."""
+        path = self._path(key)
+        try:
+            value = json.loads(path.read_bytes())
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            # removed by another process or incomplete
+            if key in self._files:
+                self._disk_size -= self._files.pop(key)
+            return None
+        if key not in self._files:
+            # written by another process
+            self._files[key] = path.stat().st_size
+            self._disk_size += self._files[key]
+        self._files.move_to_end(key)
+        return value
+
+    def _write(self, key: str, value: dict[str, Any]) -> None:
+        """Adds an entry to the on-disk tier (evicting LRU-entries)."""
+        # compact values (see lzvnrw_converter.compact) as dictionaries
+        data = json.dumps(thaw(value), ensure_ascii=False).encode("utf-8")
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            dir=path.parent, suffix=".tmp", delete=False
+        ) as file:
+            file.write(data)
+        os.replace(file.name, path)
+        self._disk_size += len(data) - self._files.pop(key, 0)
+        self._files[key] = len(data)
+        self._written += len(data)
+        if self._disk_size > self.max_disk_size \
+                or self._written > self.max_disk_size // 16:
+            # account for the files written by other processes
+            self._scan()
+
+    def _evict(self) -> None:
+        """Removes LRU-entries until the on-disk tier fits."""
+        while self._disk_size > self.max_disk_size and self._files:
+            self._remove(next(iter(self._files)))
+
+    def _remove(self, key: str) -> None:
+        """Removes an entry from the on-disk tier."""
+        self._disk_size -= self._files.pop(key)
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,368 @@
+"""
+This module contains the command line interface `dcm-map` for the
+bulk-conversion and -mapping of source metadata into newline-delimited
+JSON or MessagePack (one object per record), e.g.
+dcm-map -m miami records/ > metadata.ndjson
+dcm-map -m miami --dump pages.xml.gz -o metadata.ndjson --stats
+dcm-map -m miami --store records.store/ > metadata.ndjson
+cat pages.xml | dcm-map -m miami
+"""
+
+from typing import Any, Optional, IO, BinaryIO, Iterable, Iterator
+from functools import partial
+from pathlib import Path
+import argparse
+import sys
+import time
+
+from lzvnrw_converter.compression import \
+    decompress_chunks, detect_compression
+from lzvnrw_converter.oaipmh_converter import OAIPMHMetadataConverter
+from lzvnrw_converter.xml_engine import ENGINES
+from lzvnrw_mapper import registry
+from dcm_metadata_pipeline.bulk import \
+    BulkResult, collect_paths, get_mapper, map_files, map_dump, \
+    map_stream, map_store, map_files_staged, staged_pipeline
+from dcm_metadata_pipeline.encoders import ENCODERS, RecordWriter
+from dcm_metadata_pipeline.stages import StagedPipeline, StageStats
+
+
+# number of bytes read from streams at once
+CHUNK_SIZE = 65536
+# name of the standard input as source
+STDIN = "-"
+
+
+def get_parser() -> argparse.ArgumentParser:
+    """Returns the argument parser of `dcm-map`."""
+    parser = argparse.ArgumentParser(
+        prog="dcm-map",
+        description="Convert and map source metadata (OAI-PMH) into "
+        + "newline-delimited JSON or MessagePack (one object per record).",
+    )
+    parser.add_argument(
+        "sources", nargs="*", default=[STDIN],
+        help="XML-files (also gzip-/zstd-compressed), directories, or "
+        + "glob-expressions; '-' reads (concatenated) OAI-PMH responses "
+        + "from stdin (default '-')"
+    )
+    parser.add_argument(
+        "-m", "--mapper",
+        help="MAPPER_TAG or alias of the mapper (see --list-mappers)"
+    )
+    parser.add_argument(
+        "--list-mappers", action="store_true",
+        help="print the available mappers and exit"
+    )
+    parser.add_argument(
+        "--dump", action="store_true",
+        help="read files as dumps of one or more (concatenated) OAI-PMH "
+        + "responses (e.g. ListRecords-pages) instead of one "
+        + "GetRecord-response per file"
+    )
+    parser.add_argument(
+        "--store", action="store_true",
+        help="read sources as directories of record stores (converted "
+        + "records; see dcm_metadata_pipeline.record_store)"
+    )
+    parser.add_argument(
+        "--staged", action="store_true",
+        help="map files in a staged pipeline (read, convert, and map "
+        + "concurrently with bounded queues; -w sets the convert-workers)"
+    )
+    parser.add_argument(
+        "--read-workers", type=int, default=4,
+        help="number of reading threads with --staged (default 4)"
+    )
+    parser.add_argument(
+        "--map-workers", type=int, default=1,
+        help="number of mapping processes with --staged (default 1)"
+    )
+    parser.add_argument(
+        "-o", "--output", default=STDIN,
+        help="output file (default '-'; stdout)"
+    )
+    parser.add_argument(
+        "-f", "--format", default="auto", choices=["auto", *ENCODERS],
+        help="output format (encoder); 'auto' uses orjson if installed "
+        + "and json otherwise (default 'auto')"
+    )
+    parser.add_argument(
+        "-w", "--workers", type=int, default=None,
+        help="number of worker processes; 0 runs in the current process "
+        + "(default: number of CPUs)"
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=1000,
+        help="number of records per written (and flushed) batch and per "
+        + "task when reading streams (default 1000)"
+    )
+    parser.add_argument(
+        "--engine", default="xmltodict", choices=list(ENGINES),
+        help="XML-engine of the converter (default 'xmltodict')"
+    )
+    parser.add_argument(
+        "--projected", action="store_true",
+        help="only convert the paths required by the mapper"
+    )
+    parser.add_argument(
+        "--unordered", action="store_true",
+        help="write records in the order of completion"
+    )
+    parser.add_argument(
+        "--with-source", action="store_true",
+        help="write objects {\"path\": ..., \"offset\": ..., "
+        + "\"metadata\": ...} instead of the mapped metadata only"
+    )
+    parser.add_argument(
+        "--stats", action="store_true",
+        help="print records/s and the time per stage (with --staged also "
+        + "queue depths and throughput per stage) to stderr"
+    )
+    return parser
+
+
+def iter_results(
+    args: argparse.Namespace, pipeline: Optional[StagedPipeline] = None
+) -> Iterator[BulkResult]:
+    """
+    Returns iterator of the BulkResults for the sources in `args` (in
+    the order of the sources).
+
+    Keyword arguments:
+    args -- parsed arguments (see get_parser)
+    pipeline -- staged pipeline for files (see bulk.staged_pipeline)
+                (default None; uses map_files)
+    """
+    options = {
+        "mapper_tag": args.mapper,
+        "workers": args.workers,
+        "ordered": not args.unordered,
+    }
+    if args.store:
+        # stored records are already converted
+        for source in args.sources:
+            try:
+                yield from map_store(source, **options)
+            except (OSError, ValueError) as exc_info:
+                # missing store or stale/bad manifest
+                yield BulkResult(
+                    source, None, f"{type(exc_info).__name__}: {exc_info}"
+                )
+        return
+    options["projected"] = args.projected
+    files = []
+    for source in list(args.sources) + [None]:
+        if source != STDIN and source is not None:
+            files.append(source)
+            continue
+        # process the files collected so far
+        unmatched = []
+        paths = collect_paths(files, unmatched=unmatched)
+        for source_ in unmatched:
+            yield BulkResult(
+                source_, None,
+                f"FileNotFoundError: No files match '{source_}'."
+            )
+        if paths and args.dump:
+            for path in paths:
+                yield from _map_dump_file(path, args, options)
+        elif paths and pipeline is not None:
+            yield from map_files_staged(
+                paths, args.mapper, pipeline=pipeline,
+                ordered=options["ordered"]
+            )
+        elif paths:
+            yield from map_files(
+                paths,
+                converter=partial(
+                    OAIPMHMetadataConverter, engine=args.engine
+                ),
+                **options
+            )
+        files = []
+        if source == STDIN:
+            yield from map_stream(
+                decompress_chunks(_read_chunks(sys.stdin.buffer)),
+                source="<stdin>",
+                engine=args.engine,
+                batch_size=args.batch_size,
+                **options
+            )
+
+
+def write_results(
+    results: Iterable[BulkResult],
+    output: BinaryIO,
+    batch_size: int = 1000,
+    with_source: bool = False,
+    encoder: str = "auto"
+) -> dict[str, Any]:
+    """
+    Writes `results` with an encoder (see encoders.RecordWriter) into
+    `output` (flushed after every batch) and error messages to stderr.
+
+    Returns statistics {"records": int, "errors": int, "timings":
+    {stage: seconds}} (see BulkResult.timings; "write" is the time of
+    encoding and output).
+
+    Keyword arguments:
+    results -- iterable of BulkResults
+    output -- binary output
+    batch_size -- number of records per flushed batch (default 1000)
+    with_source -- if True, the path and offset of the record are
+                   written alongside the metadata (default False)
+    encoder -- name of the encoder (see encoders.get_encoder)
+               (default "auto")
+    """
+    stats = {"records": 0, "errors": 0, "timings": {"write": 0.0}}
+    timings = stats["timings"]
+    writer = RecordWriter(output, encoder)
+    for result in results:
+        stats["records"] += 1
+        for stage, seconds in (result.timings or {}).items():
+            timings[stage] = timings.get(stage, 0.0) + seconds
+        if result.error is not None:
+            stats["errors"] += 1
+            location = result.path if result.offset is None \
+                else f"{result.path}:{result.offset}"
+            print(f"{location}: {result.error}", file=sys.stderr)
+            continue
+        start = time.perf_counter()
+        if with_source:
+            writer.write(
+                {
+                    "path": result.path,
+                    "offset": result.offset,
+                    "metadata": result.metadata,
+                }
+            )
+        else:
+            writer.write(result.metadata)
+        if writer.records % batch_size == 0:
+            writer.flush()
+        timings["write"] += time.perf_counter() - start
+    start = time.perf_counter()
+    writer.flush()
+    timings["write"] += time.perf_counter() - start
+    return stats
+
+
+def print_stats(stats: dict[str, Any], elapsed: float) -> None:
+    """Prints the statistics of write_results to stderr."""
+    print(
+        f"records: {stats['records']} (errors: {stats['errors']})\n"
+        + f"elapsed: {elapsed:.3f} s "
+        + f"({stats['records'] / elapsed if elapsed else 0:.0f} records/s)"
+        + "\nstage times (cumulative over workers):",
+        file=sys.stderr
+    )
+    for stage in ("read", "convert", "map", "write"):
+        if stage in stats["timings"]:
+            print(
+                f"  {stage:<8}{stats['timings'][stage]:>10.3f} s",
+                file=sys.stderr
+            )
+
+
+def print_stage_stats(stats: list[StageStats]) -> None:
+    """Prints the statistics of a staged pipeline to stderr."""
+    print(
+        "pipeline stages (workers, records/s, utilization, queue depth "
+        + "max/size):",
+        file=sys.stderr
+    )
+    for stage in stats:
+        print(
+            f"  {stage.name:<8}{stage.workers:>4}"
+            + f"{stage.throughput:>10.0f}/s{stage.utilization:>7.0%}"
+            + f"{stage.max_queue_depth:>7}/{stage.queue_size}",
+            file=sys.stderr
+        )
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """Entry point of `dcm-map`."""
+    parser = get_parser()
+    args = parser.parse_args(argv)
+
+    if args.list_mappers:
+        print("\n".join(registry.names()))
+        return
+    if args.mapper is None:
+        parser.error("the following arguments are required: -m/--mapper")
+    try:
+        get_mapper(args.mapper)
+    except ValueError as exc_info:
+        parser.error(str(exc_info))
+    if args.batch_size < 1:
+        parser.error("--batch-size must be positive")
+    pipeline = None
+    if args.staged:
+        try:
+            pipeline = staged_pipeline(
+                args.mapper,
+                converter=partial(
+                    OAIPMHMetadataConverter, engine=args.engine
+                ),
+                read_workers=args.read_workers,
+                convert_workers=args.workers,
+                map_workers=args.map_workers,
+                projected=args.projected
+            )
+        except ValueError as exc_info:
+            parser.error(str(exc_info))
+
+    start = time.perf_counter()
+    if args.output == STDIN:
+        sys.stdout.flush()
+        stats = write_results(
+            iter_results(args, pipeline), sys.stdout.buffer, args.batch_size,
+            args.with_source, args.format
+        )
+    else:
+        with open(args.output, "wb") as output:
+            stats = write_results(
+                iter_results(args, pipeline), output, args.batch_size,
+                args.with_source, args.format
+            )
+    elapsed = time.perf_counter() - start
+
+    if args.stats:
+        print_stats(stats, elapsed)
+        if pipeline is not None:
+            print_stage_stats(pipeline.stats())
+    if stats["errors"]:
+        sys.exit(1)
+
+
+def _map_dump_file(
+    path: Path, args: argparse.Namespace, options: dict[str, Any]
+) -> Iterator[BulkResult]:
+    """
+    Returns iterator of the BulkResults of a dump-file; compressed
+    files are read as stream.
+    """
+    with open(path, "rb") as file:
+        compression = detect_compression(file.read(4))
+    if compression is None:
+        yield from map_dump(path, engine=args.engine, **options)
+        return
+    with open(path, "rb") as file:
+        yield from map_stream(
+            decompress_chunks(_read_chunks(file), compression),
+            source=str(path),
+            engine=args.engine,
+            batch_size=args.batch_size,
+            **options
+        )
+
+
+def _read_chunks(file: IO[bytes]) -> Iterator[bytes]:
+    """Returns iterator over the chunks of a binary file."""
+    while chunk := file.read(CHUNK_SIZE):
+        yield chunk
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+This module contains the columnar batch-mapping of converted records
+into Arrow tables (one row per record, one column per mapped key) and
+Parquet-files.
+
+Requires the package pyarrow (install with
+'pip install dcm-metadata-mapper[arrow]').
+"""
+
+from typing import Any, Optional, Iterable, Iterator
+from collections.abc import Mapping
+from pathlib import Path
+import json
+
+from dcm_common.util import NestedDict
+
+from dcm_metadata_mapper.mapper_interface import MapperInterface
+from lzvnrw_converter.compact import thaw
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+# keys with (potentially) multiple values; mapped into list-columns
+DEFAULT_LIST_KEYS = (
+    "dc-creator",
+    "dc-title",
+    "dc-rights",
+    "dc-terms-identifier",
+    "transfer-urls",
+)
+
+
+class ColumnarMapper:
+    """
+    Maps converted records into column buffers (see
+    MapperInterface.get_all_metadata) and builds Arrow record batches
+    from these.
+
+    Columns of the keys in `list_keys` have the type list<string>,
+    all other columns the type string. Single values in list-columns
+    are wrapped into a list, single-element lists in string-columns are
+    unwrapped (multiple elements raise a ValueError). Values that are
+    no strings are converted: elements with text and attributes (e.g.
+    {"@xml:lang": "de", "#text": "..."}) to their text, everything else
+    to JSON.
+
+    Keyword arguments:
+    mapper -- mapper-instance
+    list_keys -- keys that are mapped into list-columns
+                 (default DEFAULT_LIST_KEYS)
+    keys -- keys (columns) of the table; None uses all keys of the
+            mapper (default None)
+    """
+
+    def __init__(
+        self,
+        mapper: MapperInterface,
+        list_keys: Iterable[str] = DEFAULT_LIST_KEYS,
+        keys: Optional[Iterable[str]] = None
+    ) -> None:
+        if pa is None:
+            raise ImportError(
+                "ColumnarMapper requires the package 'pyarrow' (install "
+                + "with 'pip install dcm-metadata-mapper[arrow]')."
+            )
+        self.mapper = mapper
+        self.list_keys = frozenset(key.lower() for key in list_keys)
+        self.keys = None if keys is None else [key.lower() for key in keys]
+        if self.keys is None and hasattr(mapper, "linear_map"):
+            self.keys = list(
+                dict.fromkeys(mapper.linear_map)
+                | dict.fromkeys(getattr(mapper, "_nonlinear_map", {}))
+            )
+
+    @property
+    def schema(self) -> "pa.Schema":
+        """Arrow schema of the tables (requires known keys)."""
+        if self.keys is None:
+            raise ValueError(
+                "Schema is unknown before the first record (mapper "
+                + "without linear_map and no keys given)."
+            )
+        return pa.schema(
+            [
+                (
+                    key,
+                    pa.list_(pa.string()) if key in self.list_keys
+                    else pa.string()
+                )
+                for key in self.keys
+            ]
+        )
+
+    def iter_batches(
+        self, records: Iterable[NestedDict], batch_size: int = 65536
+    ) -> Iterator["pa.RecordBatch"]:
+        """
+        Returns iterator of Arrow record batches with at most
+        `batch_size` rows each, i.e. the memory footprint is bounded by
+        the batch size.
+
+        Keyword arguments:
+        records -- iterable of converted records (see
+                   OAIPMHMetadataConverter.get_dict/iter_dicts)
+        batch_size -- maximum number of rows per batch (default 65536)
+        """
+        columns = None
+        size = 0
+        for record in records:
+            metadata = self.mapper.get_all_metadata(record)
+            if self.keys is None:
+                self.keys = list(metadata)
+            if columns is None:
+                columns = {key: [] for key in self.keys}
+            for key, column in columns.items():
+                column.append(self._value(key, metadata.get(key)))
+            size += 1
+            if size == batch_size:
+                yield self._batch(columns)
+                columns = None
+                size = 0
+        if columns is not None:
+            yield self._batch(columns)
+
+    def to_table(self, records: Iterable[NestedDict]) -> "pa.Table":
+        """
+        Returns an Arrow table of the mapped `records`.
+
+        Keyword arguments:
+        records -- iterable of converted records
+        """
+        batches = list(self.iter_batches(records))
+        return pa.Table.from_batches(batches, schema=self.schema)
+
+    def write_parquet(
+        self,
+        records: Iterable[NestedDict],
+        path: str | Path,
+        row_group_size: int = 65536,
+        compression: str = "zstd"
+    ) -> int:
+        """
+        Writes the mapped `records` into a Parquet-file with one row
+        group per `row_group_size` records (the records are mapped and
+        written row group by row group).
+
+        Returns the number of written rows.
+
+        Keyword arguments:
+        records -- iterable of converted records
+        path -- path of the Parquet-file
+        row_group_size -- number of rows per row group (default 65536)
+        compression -- Parquet-compression codec (default "zstd")
+        """
+        writer = None
+        rows = 0
+        try:
+            for batch in self.iter_batches(records, row_group_size):
+                if writer is None:
+                    writer = pq.ParquetWriter(
+                        str(path), self.schema, compression=compression
+                    )
+                writer.write_batch(batch, row_group_size=row_group_size)
+                rows += batch.num_rows
+            if writer is None:
+                writer = pq.ParquetWriter(
+                    str(path), self.schema, compression=compression
+                )
+        finally:
+            if writer is not None:
+                writer.close()
+        return rows
+
+    def _value(self, key: str, value: Any) -> Any:
+        """Returns the column value of a mapped value."""
+        if value is None:
+            return None
+        if key in self.list_keys:
+            if isinstance(value, (list, tuple)):
+                return [_string(item) for item in value]
+            return [_string(value)]
+        if isinstance(value, (list, tuple)):
+            if len(value) > 1:
+                raise ValueError(
+                    f"Multiple values for key '{key}' which is not in "
+                    + "list_keys."
+                )
+            return _string(value[0]) if value else None
+        return _string(value)
+
+    def _batch(self, columns: dict[str, list[Any]]) -> "pa.RecordBatch":
+        """Returns a record batch of column buffers."""
+        return pa.RecordBatch.from_arrays(
+            [
+                pa.array(column, type=field.type)
+                for column, field in zip(columns.values(), self.schema)
+            ],
+            schema=self.schema,
+        )
+
+
+def _string(value: Any) -> Optional[str]:
+    """Returns the string representation of a mapped value."""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, Mapping) and "#text" in value:
+        return _string(value["#text"])
+    return json.dumps(thaw(value), ensure_ascii=False)
@@ -0,0 +1,238 @@
+"""
+This module contains pluggable encoders for mapped metadata and a
+buffered writer that writes the encoded records in batches.
+
+Encoders:
+json -- newline-delimited JSON (standard library)
+orjson -- newline-delimited JSON (requires the package orjson; install
+          with 'pip install dcm-metadata-mapper[orjson]')
+msgpack -- stream of MessagePack-objects (requires the package msgpack;
+           install with 'pip install dcm-metadata-mapper[msgpack]')
+"""
+
+from typing import Any, BinaryIO, Iterable, Iterator
+from collections.abc import Mapping
+import abc
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class Encoder(abc.ABC):
+    """
+    Base class of the encoders: encodes a single record (e.g. mapped
+    metadata) into bytes, such that concatenated records can be
+    decoded as stream. Mappings that are no dictionaries (e.g. compact
+    records) are encoded like dictionaries.
+    """
+
+    NAME = ""
+
+    @abc.abstractmethod
+    def encode(self, record: Any) -> bytes:
+        """
+        Returns the encoded record.
+
+        Keyword arguments:
+        record -- record to be encoded
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def decode(self, data: bytes) -> Iterator[Any]:
+        """
+        Returns iterator of the records in `data` (concatenated encoded
+        records).
+
+        Keyword arguments:
+        data -- encoded records
+        """
+        raise NotImplementedError
+
+
+class JSONEncoder(Encoder):
+    """Encoder for newline-delimited JSON based on the module json."""
+
+    NAME = "json"
+
+    def __init__(self) -> None:
+        self._encode = json.JSONEncoder(
+            ensure_ascii=False, separators=(",", ":"), default=_default
+        ).encode
+
+    def encode(self, record: Any) -> bytes:
+        return (self._encode(record) + "\n").encode("utf-8")
+
+    def decode(self, data: bytes) -> Iterator[Any]:
+        for line in data.splitlines():
+            if line:
+                yield json.loads(line)
+
+
+class OrjsonEncoder(JSONEncoder):
+    """Encoder for newline-delimited JSON based on orjson."""
+
+    NAME = "orjson"
+
+    def __init__(self) -> None:
+        # pylint: disable=super-init-not-called
+        if orjson is None:
+            raise ImportError(
+                "OrjsonEncoder requires the package 'orjson' (install "
+                + "with 'pip install dcm-metadata-mapper[orjson]')."
+            )
+        self._option = orjson.OPT_APPEND_NEWLINE
+
+    def encode(self, record: Any) -> bytes:
+        return orjson.dumps(record, default=_default, option=self._option)
+
+
+class MsgpackEncoder(Encoder):
+    """Encoder for a stream of MessagePack-objects."""
+
+    NAME = "msgpack"
+
+    def __init__(self) -> None:
+        if msgpack is None:
+            raise ImportError(
+                "MsgpackEncoder requires the package 'msgpack' (install "
+                + "with 'pip install dcm-metadata-mapper[msgpack]')."
+            )
+        # packers are reused (their internal buffer is reset after
+        # every record)
+        self._packer = msgpack.Packer(default=_default)
+
+    def encode(self, record: Any) -> bytes:
+        return self._packer.pack(record)
+
+    def decode(self, data: bytes) -> Iterator[Any]:
+        unpacker = msgpack.Unpacker(raw=False)
+        unpacker.feed(data)
+        yield from unpacker
+
+
+# encoder-classes by name
+ENCODERS: dict[str, type[Encoder]] = {
+    JSONEncoder.NAME: JSONEncoder,
+    OrjsonEncoder.NAME: OrjsonEncoder,
+    MsgpackEncoder.NAME: MsgpackEncoder,
+}
+
+
+def get_encoder(name: str = "auto") -> Encoder:
+    """
+    Returns an encoder-instance.
+
+    Keyword arguments:
+    name -- name of the encoder (see ENCODERS) or "auto" for "orjson"
+            if installed and "json" otherwise (default "auto")
+    """
+    if name == "auto":
+        name = OrjsonEncoder.NAME if orjson is not None \
+            else JSONEncoder.NAME
+    try:
+        return ENCODERS[name]()
+    except KeyError as exc_info:
+        raise ValueError(
+            f"Unknown encoder '{name}', expected one of "
+            + f"{', '.join(ENCODERS)}."
+        ) from exc_info
+
+
+class RecordWriter:
+    """
+    Writes encoded records into a binary output. The records are
+    collected in a preallocated buffer of `buffer_size` bytes that is
+    reused for every batch and written when it is full (one write-call
+    per batch instead of one per record; larger records are written
+    directly).
+
+    Use as context manager (flushes the buffer on exit), e.g.
+    with RecordWriter(sys.stdout.buffer) as writer:
+        writer.write_all(records)
+
+    Keyword arguments:
+    output -- binary output (e.g. a file opened with "wb")
+    encoder -- encoder-instance or name (see get_encoder)
+               (default "auto")
+    buffer_size -- size of the buffer in bytes (default 1 MiB)
+    """
+
+    def __init__(
+        self,
+        output: BinaryIO,
+        encoder: Encoder | str = "auto",
+        buffer_size: int = 1024 * 1024
+    ) -> None:
+        self.output = output
+        self.encoder = get_encoder(encoder) if isinstance(encoder, str) \
+            else encoder
+        self.records = 0
+        self._buffer = bytearray(buffer_size)
+        self._view = memoryview(self._buffer)
+        self._size = 0  # number of used bytes of the buffer
+        self._encode = self.encoder.encode
+
+    def __enter__(self) -> "RecordWriter":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.flush()
+
+    def write(self, record: Any) -> None:
+        """
+        Encodes `record` into the buffer (and writes the buffer if it
+        is full).
+
+        Keyword arguments:
+        record -- record to be written
+        """
+        data = self._encode(record)
+        end = self._size + len(data)
+        if end > len(self._buffer):
+            self._write()
+            end = len(data)
+            if end > len(self._buffer):
+                self.output.write(data)
+                self.records += 1
+                return
+        self._buffer[self._size:end] = data
+        self._size = end
+        self.records += 1
+
+    def write_all(self, records: Iterable[Any]) -> None:
+        """
+        Writes all `records` (see write).
+
+        Keyword arguments:
+        records -- iterable of records
+        """
+        for record in records:
+            self.write(record)
+
+    def flush(self) -> None:
+        """Writes the buffer and flushes the output."""
+        self._write()
+        self.output.flush()
+
+    def _write(self) -> None:
+        """Writes the buffer into the output and empties the buffer."""
+        if self._size:
+            self.output.write(self._view[:self._size])
+            self._size = 0
+
+
+def _default(value: Any) -> Any:
+    """Returns serializable representations of mappings."""
+    if isinstance(value, Mapping):
+        return dict(value)
+    raise TypeError(
+        f"Object of type {type(value).__name__} is not serializable."
+    )
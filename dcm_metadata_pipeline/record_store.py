@@ -0,0 +1,401 @@
+"""
+This module contains an on-disk store of converted records (see
+OAIPMHMetadataConverter.get_dict) for re-mapping without re-parsing the
+source metadata.
+
+Records are appended as MessagePack-objects to chunk-files with an
+offset index per chunk; a manifest records the converter (tag and
+specversion) that produced the records.
+
+Requires the package msgpack (install with
+'pip install dcm-metadata-mapper[msgpack]').
+"""
+
+from typing import Any, Optional, Iterable, Iterator
+from pathlib import Path
+import json
+import os
+
+from dcm_common.util import NestedDict
+
+from dcm_metadata_converter.converter_interface import ConverterInterface
+from lzvnrw_converter.oaipmh_converter import OAIPMHMetadataConverter
+from dcm_metadata_pipeline.state import record_header
+from dcm_metadata_pipeline.encoders import MsgpackEncoder
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+# version of the store-layout
+STORE_FORMAT = 1
+MANIFEST = "manifest.json"
+
+
+class RecordStore:
+    """
+    Append-only store of converted records keyed by OAI-identifier.
+
+    The records are written sequentially into chunk-files
+    (<number>.msgpack) of about `chunk_size` bytes; for every chunk, an
+    index-file (<number>.index) lists the identifier, offset, and
+    length of its records. Records that are put again (or deleted)
+    supersede earlier versions, which remain in their chunk until the
+    store is rebuilt. Changes become persistent with `commit` (and when
+    leaving the context manager); uncommitted data is discarded when
+    the store is opened again.
+
+    The store is bound to a converter (CONVERTER_TAG and specversion):
+    opening a store that was written by another converter (or
+    specversion) raises a ValueError unless `discard_stale` is set, in
+    which case all records are removed.
+
+    Use as context manager, e.g.
+    with RecordStore("store") as store:
+        for record in converter.iter_dicts(response):
+            store.put(record)
+    ...
+    with RecordStore("store") as store:
+        for identifier, record in store:
+            mapper.get_all_metadata(record)
+
+    Keyword arguments:
+    directory -- directory of the store (created if necessary)
+    converter -- converter (instance or class) of the stored records
+                 (default OAIPMHMetadataConverter)
+    chunk_size -- size of the chunk-files in bytes after which a new
+                  chunk is started (default 64 MiB)
+    discard_stale -- if True, the records of another converter are
+                     discarded instead of raising a ValueError
+                     (default False)
+    create -- if False, an existing store is required (e.g. for
+              reading), i.e. a FileNotFoundError is raised if the
+              directory or its manifest is missing (default True)
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        converter: ConverterInterface | type = OAIPMHMetadataConverter,
+        chunk_size: int = 64 * 1024 * 1024,
+        discard_stale: bool = False,
+        create: bool = True
+    ) -> None:
+        if msgpack is None:
+            raise ImportError(
+                "RecordStore requires the package 'msgpack' (install "
+                + "with 'pip install dcm-metadata-mapper[msgpack]')."
+            )
+        self.directory = Path(directory)
+        self.chunk_size = chunk_size
+        self.converter_tag = converter.CONVERTER_TAG
+        self.specversion = list(converter._SPECVERSION)
+        self._encode = MsgpackEncoder().encode
+        # identifier -> (chunk, offset, length) of the latest version
+        self._index: dict[str, tuple[int, int, int]] = {}
+        # uncommitted index entries of the current chunk
+        self._entries: list[tuple[str, int, int]] = []
+        self._chunks = 0
+        self._file = None
+        self._size = 0
+
+        if create:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        elif not (self.directory / MANIFEST).is_file():
+            raise FileNotFoundError(
+                f"No record store at '{self.directory}' (missing "
+                + f"{MANIFEST})."
+            )
+        manifest = self._read_manifest()
+        if manifest is not None and not self._compatible(manifest):
+            if not discard_stale:
+                raise ValueError(
+                    f"Record store '{self.directory}' contains records of "
+                    + f"'{manifest.get('converter')}' "
+                    + f"{tuple(manifest.get('specversion', ()))}, expected "
+                    + f"'{self.converter_tag}' {tuple(self.specversion)} "
+                    + "(use discard_stale to rebuild the store)."
+                )
+            self.clear()
+            manifest = None
+        if manifest is not None:
+            self._chunks = manifest["chunks"]
+            for chunk in range(self._chunks):
+                self._load_index(chunk)
+
+    def __enter__(self) -> "RecordStore":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, identifier: str) -> bool:
+        return identifier in self._index
+
+    def __iter__(self) -> Iterator[tuple[str, NestedDict]]:
+        return self.records()
+
+    def identifiers(self) -> list[str]:
+        """Returns the identifiers of the stored records."""
+        return list(self._index)
+
+    def put(
+        self, record: NestedDict, identifier: Optional[str] = None
+    ) -> None:
+        """
+        Appends `record` to the store (superseding an earlier version).
+
+        Keyword arguments:
+        record -- converted record (full conversion, i.e. not projected)
+        identifier -- identifier of the record (default None; uses the
+                      OAI-identifier from the header of the record)
+        """
+        if identifier is None:
+            identifier, _, _ = record_header(record)
+            if identifier is None:
+                raise ValueError("Record without identifier.")
+        data = self._encode(record)
+        file = self._writable()
+        file.write(data)
+        self._add(identifier, self._size, len(data))
+        self._size += len(data)
+
+    def put_all(self, records: Iterable[NestedDict]) -> None:
+        """
+        Appends all `records` (see put).
+
+        Keyword arguments:
+        records -- iterable of converted records
+        """
+        for record in records:
+            self.put(record)
+
+    def delete(self, identifier: str) -> None:
+        """
+        Removes the record `identifier` from the store.
+
+        Keyword arguments:
+        identifier -- identifier of the record
+        """
+        if identifier in self._index:
+            self._writable()
+            # entries of length 0 mark deleted records
+            self._add(identifier, self._size, 0)
+
+    def get(self, identifier: str) -> Optional[NestedDict]:
+        """
+        Returns the record `identifier` or None if it is not stored.
+
+        Keyword arguments:
+        identifier -- identifier of the record
+        """
+        location = self._index.get(identifier)
+        if location is None:
+            return None
+        chunk, offset, length = location
+        self._flush()
+        with open(self._chunk_path(chunk), "rb") as file:
+            file.seek(offset)
+            return msgpack.unpackb(file.read(length), raw=False)
+
+    def chunks(self) -> list[tuple[Path, list[int]]]:
+        """
+        Returns a list of tuples of chunk-file and the sorted offsets of
+        the current records in that chunk (see read_chunk).
+        """
+        offsets: list[list[int]] = [[] for _ in range(self._chunks)]
+        for chunk, offset, _ in self._index.values():
+            offsets[chunk].append(offset)
+        self._flush()
+        return [
+            (self._chunk_path(chunk), sorted(chunk_offsets))
+            for chunk, chunk_offsets in enumerate(offsets)
+            if chunk_offsets
+        ]
+
+    def records(self) -> Iterator[tuple[str, NestedDict]]:
+        """
+        Returns iterator of tuples of identifier and record for all
+        records of the store; the chunk-files are read sequentially.
+        """
+        identifiers = {
+            location[:2]: identifier
+            for identifier, location in self._index.items()
+        }
+        for path, offsets in self.chunks():
+            chunk = int(path.stem)
+            for offset, record in read_chunk(path, offsets):
+                yield identifiers[(chunk, offset)], record
+
+    def commit(self) -> None:
+        """Writes the index of the current chunk and the manifest."""
+        if self._file is None:
+            return
+        self._flush()
+        os.fsync(self._file.fileno())
+        self._write_index()
+        self._write_manifest()
+
+    def close(self) -> None:
+        """Commit and close the store."""
+        self.commit()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def clear(self) -> None:
+        """Removes all records from the store."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        for path in self.directory.iterdir():
+            if path.suffix in (".msgpack", ".index") \
+                    or path.name == MANIFEST:
+                path.unlink()
+        self._index.clear()
+        self._entries.clear()
+        self._chunks = 0
+        self._size = 0
+
+    def _compatible(self, manifest: dict[str, Any]) -> bool:
+        """Returns whether the manifest matches the converter."""
+        return (
+            manifest.get("format") == STORE_FORMAT
+            and manifest.get("converter") == self.converter_tag
+            and manifest.get("specversion") == self.specversion
+        )
+
+    def _writable(self) -> Any:
+        """
+        Returns the file of the current chunk (a new chunk is started if
+        the current one is full).
+        """
+        if self._file is not None and self._size >= self.chunk_size:
+            self.commit()
+            self._file.close()
+            self._file = None
+            self._entries = []
+            self._chunks += 1
+        if self._file is None:
+            if self._chunks == 0:
+                self._chunks = 1
+            chunk = self._chunks - 1
+            path = self._chunk_path(chunk)
+            self._entries = self._read_index(chunk)
+            # discard uncommitted data (e.g. after a crash)
+            self._size = max(
+                (offset + length for _, offset, length in self._entries),
+                default=0
+            )
+            self._file = open(path, "ab")
+            self._file.truncate(self._size)
+        return self._file
+
+    def _add(self, identifier: str, offset: int, length: int) -> None:
+        """Adds an entry to the index."""
+        self._entries.append((identifier, offset, length))
+        if length:
+            self._index[identifier] = (self._chunks - 1, offset, length)
+        else:
+            self._index.pop(identifier, None)
+
+    def _flush(self) -> None:
+        """Flushes the current chunk (if any)."""
+        if self._file is not None:
+            self._file.flush()
+
+    def _chunk_path(self, chunk: int) -> Path:
+        """Returns the path of a chunk-file."""
+        return self.directory / f"{chunk:05d}.msgpack"
+
+    def _index_path(self, chunk: int) -> Path:
+        """Returns the path of an index-file."""
+        return self.directory / f"{chunk:05d}.index"
+
+    def _read_index(self, chunk: int) -> list[tuple[str, int, int]]:
+        """Returns the committed index-entries of a chunk."""
+        path = self._index_path(chunk)
+        if not path.is_file():
+            return []
+        return [
+            tuple(entry)
+            for entry in msgpack.unpackb(path.read_bytes(), raw=False)
+        ]
+
+    def _load_index(self, chunk: int) -> None:
+        """Loads the index of a chunk into the index of the store."""
+        for identifier, offset, length in self._read_index(chunk):
+            if length:
+                self._index[identifier] = (chunk, offset, length)
+            else:
+                self._index.pop(identifier, None)
+
+    def _write_index(self) -> None:
+        """Writes the index of the current chunk (atomically)."""
+        path = self._index_path(self._chunks - 1)
+        _write_atomic(path, msgpack.packb(self._entries))
+
+    def _read_manifest(self) -> Optional[dict[str, Any]]:
+        """Returns the manifest of the store (if any)."""
+        path = self.directory / MANIFEST
+        if not path.is_file():
+            return None
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    def _write_manifest(self) -> None:
+        """Writes the manifest of the store (atomically)."""
+        _write_atomic(
+            self.directory / MANIFEST,
+            json.dumps(
+                {
+                    "format": STORE_FORMAT,
+                    "converter": self.converter_tag,
+                    "specversion": self.specversion,
+                    "chunks": self._chunks,
+                },
+                indent=2
+            ).encode("utf-8")
+        )
+
+
+def read_chunk(
+    path: str | Path, offsets: Optional[Iterable[int]] = None
+) -> Iterator[tuple[int, NestedDict]]:
+    """
+    Returns iterator of tuples of offset and record of a chunk-file
+    (read sequentially).
+
+    Keyword arguments:
+    path -- path of the chunk-file
+    offsets -- offsets of the records to be returned (see
+               RecordStore.chunks); None returns all records, including
+               superseded ones (default None)
+    """
+    if msgpack is None:
+        raise ImportError(
+            "read_chunk requires the package 'msgpack' (install with "
+            + "'pip install dcm-metadata-mapper[msgpack]')."
+        )
+    wanted = None if offsets is None else set(offsets)
+    with open(path, "rb") as file:
+        unpacker = msgpack.Unpacker(file, raw=False)
+        offset = 0
+        for record in unpacker:
+            if wanted is None or offset in wanted:
+                yield offset, record
+            offset = unpacker.tell()
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    """Writes `data` into `path` via a temporary file."""
+    temporary = path.with_name(path.name + ".tmp")
+    with open(temporary, "wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
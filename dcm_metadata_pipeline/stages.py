@@ -0,0 +1,420 @@
+"""
+This module contains a staged producer/consumer-pipeline: every stage
+(e.g. read, convert, map) runs in its own workers (threads or processes)
+and the stages are connected by bounded queues, such that a slow stage
+(or consumer, e.g. a writer) blocks the upstream stages (backpressure)
+instead of letting intermediate results accumulate in memory.
+"""
+
+from typing import Any, Optional, Callable, Iterable, Iterator
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
+from threading import Event, Lock, Semaphore, Thread
+from time import perf_counter
+import queue
+
+
+# interval in seconds in which blocked workers check for cancellation
+_POLL_INTERVAL = 0.1
+# marks the end of the items in a queue
+_END = object()
+
+
+@dataclass(frozen=True)
+class StageStats:
+    """
+    Snapshot of the statistics of a pipeline-stage.
+
+    Keyword arguments:
+    name -- name of the stage
+    workers -- number of workers of the stage
+    processed -- number of processed items
+    busy -- seconds spent processing items (summed over the workers)
+    queue_depth -- current number of items in the input-queue
+    max_queue_depth -- maximum number of items in the input-queue
+    queue_size -- capacity of the input-queue
+    elapsed -- seconds since the start of the pipeline
+    """
+    name: str
+    workers: int
+    processed: int
+    busy: float
+    queue_depth: int
+    max_queue_depth: int
+    queue_size: int
+    elapsed: float
+
+    @property
+    def throughput(self) -> float:
+        """Returns the processed items per second."""
+        return self.processed / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def utilization(self) -> float:
+        """Returns the fraction of time the workers were busy."""
+        if not self.elapsed or not self.workers:
+            return 0.0
+        return self.busy / (self.elapsed * self.workers)
+
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    Definition of a pipeline-stage.
+
+    The function is called for every item of the stage's input and
+    returns the item for the next stage (None drops the item). With
+    `processes`, the function and items have to be picklable (e.g.
+    module-level functions or functools.partial of these) and items are
+    sent to the worker processes in batches of up to `batch_size`
+    items (available in the input-queue).
+
+    Keyword arguments:
+    name -- name of the stage
+    function -- callable that processes a single item
+    workers -- number of workers (default 1)
+    processes -- if True, the items are processed in a pool of
+                 `workers` processes; otherwise in threads
+                 (default False)
+    batch_size -- maximum number of items per batch (default 1)
+    """
+    name: str
+    function: Callable[[Any], Any]
+    workers: int = 1
+    processes: bool = False
+    batch_size: int = 1
+
+
+class StagedPipeline:
+    """
+    Pipeline of stages connected by bounded queues.
+
+    The items of the source are fed into the queue of the first stage
+    by a separate thread; every stage takes items from its input-queue
+    and puts the results into the input-queue of the next stage. The
+    results of the last stage are returned by `run` through an
+    output-queue; the consumer of `run` is reported as the stage
+    "output" in `stats`. If a stage raises an exception, the pipeline
+    is stopped and the exception is re-raised by `run`.
+
+    By default, results are returned in the order of the source: items
+    carry a sequence number and completed results are held back in a
+    reorder buffer until their predecessors are complete. The number
+    of items in the pipeline (including the reorder buffer) is limited
+    to `queue_size` per queue, i.e. a slow item stalls the feeder
+    instead of letting the buffer grow. With `ordered=False`, results
+    are returned in the order of completion.
+
+    Use e.g.
+    pipeline = StagedPipeline(
+        [Stage("read", read), Stage("map", map_, 4, processes=True)]
+    )
+    for result in pipeline.run(paths):
+        write(result)
+    print(pipeline.stats())
+
+    Keyword arguments:
+    stages -- list of stages
+    queue_size -- capacity of the queues between the stages in items
+                  (default 64)
+    """
+
+    OUTPUT = "output"
+
+    def __init__(self, stages: list[Stage], queue_size: int = 64) -> None:
+        if not stages:
+            raise ValueError("Pipeline requires at least one stage.")
+        names = [stage.name for stage in stages]
+        if len(set(names)) < len(names) or self.OUTPUT in names:
+            raise ValueError(
+                f"Stage-names have to be unique and not '{self.OUTPUT}'."
+            )
+        for stage in stages:
+            if stage.workers < 1 or stage.batch_size < 1:
+                raise ValueError(
+                    f"Stage '{stage.name}' requires at least one worker "
+                    + "and a positive batch size."
+                )
+        self.stages = stages
+        self.queue_size = queue_size
+        self._lock = Lock()
+        self._reset()
+
+    def stats(self) -> list[StageStats]:
+        """
+        Returns the statistics of the stages and of the output (the
+        consumer of `run`) of the current or last run.
+        """
+        elapsed = 0.0
+        if self._start is not None:
+            elapsed = (self._end or perf_counter()) - self._start
+        with self._lock:
+            return [
+                StageStats(
+                    name,
+                    workers,
+                    self._processed[name],
+                    self._busy[name],
+                    queue_.qsize(),
+                    self._max_depth[name],
+                    self.queue_size,
+                    elapsed,
+                )
+                for (name, workers), queue_ in zip(
+                    [(stage.name, stage.workers) for stage in self.stages]
+                    + [(self.OUTPUT, 1)],
+                    self._queues
+                )
+            ]
+
+    def run(
+        self, source: Iterable[Any], ordered: bool = True
+    ) -> Iterator[Any]:
+        """
+        Runs the pipeline for the items of `source` and returns iterator
+        of the results of the last stage. Closing the iterator early
+        stops the pipeline.
+
+        Keyword arguments:
+        source -- iterable of input items of the first stage
+        ordered -- if True, results are returned in the order of
+                   `source`; otherwise in the order of completion
+                   (default True)
+        """
+        self._reset()
+        self._ordered = ordered
+        # limits the number of items in the pipeline (ordered only)
+        self._window = Semaphore(self.queue_size * len(self._queues))
+        self._start = perf_counter()
+        pools = [
+            ProcessPoolExecutor(max_workers=stage.workers)
+            if stage.processes else None
+            for stage in self.stages
+        ]
+        threads = [
+            Thread(target=self._feed, args=(source,), daemon=True)
+        ]
+        for index, (stage, pool) in enumerate(zip(self.stages, pools)):
+            threads.extend(
+                Thread(
+                    target=self._work,
+                    args=(index, stage, pool),
+                    name=f"{stage.name}-{worker}",
+                    daemon=True
+                )
+                for worker in range(stage.workers)
+            )
+        for thread in threads:
+            thread.start()
+
+        try:
+            for item in self._results():
+                self._count(self.OUTPUT, 1, 0.0)
+                start = perf_counter()
+                yield item
+                self._count(self.OUTPUT, 0, perf_counter() - start)
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+            for pool in pools:
+                if pool is not None:
+                    pool.shutdown(cancel_futures=True)
+            self._end = perf_counter()
+        if self._error is not None:
+            raise self._error
+
+    def _reset(self) -> None:
+        """Resets the queues and statistics."""
+        names = [stage.name for stage in self.stages] + [self.OUTPUT]
+        self._queues = [queue.Queue(self.queue_size) for _ in names]
+        self._processed = dict.fromkeys(names, 0)
+        self._busy = dict.fromkeys(names, 0.0)
+        self._max_depth = dict.fromkeys(names, 0)
+        self._remaining = [stage.workers for stage in self.stages]
+        self._ordered = False
+        self._window: Optional[Semaphore] = None
+        self._stop = Event()
+        self._error: Optional[BaseException] = None
+        self._start: Optional[float] = None
+        self._end: Optional[float] = None
+
+    def _results(self) -> Iterator[Any]:
+        """
+        Returns iterator of the items of the output-queue (restores the
+        order of the source if `ordered`).
+        """
+        output = self._queues[-1]
+        buffer: dict[int, Any] = {}  # reorder buffer
+        sequence = 0  # sequence number of the next result
+        while (item := self._get(output)) is not _END:
+            if not self._ordered:
+                yield item
+                continue
+            buffer[item[0]] = item[1]
+            while sequence in buffer:
+                result = buffer.pop(sequence)
+                sequence += 1
+                self._window.release()
+                if result is not None:
+                    yield result
+
+    def _feed(self, source: Iterable[Any]) -> None:
+        """Thread target: puts the items of `source` into the pipeline."""
+        try:
+            for sequence, item in enumerate(source):
+                if self._ordered:
+                    if not self._acquire_window():
+                        return
+                    item = (sequence, item)
+                if not self._put(0, item):
+                    return
+        except Exception as exc_info:  # pylint: disable=broad-exception-caught
+            self._fail(exc_info)
+            return
+        for _ in range(self.stages[0].workers):
+            self._put(0, _END)
+
+    def _work(
+        self, index: int, stage: Stage, pool: Optional[ProcessPoolExecutor]
+    ) -> None:
+        """Thread target: a worker of the stage at `index`."""
+        queue_ = self._queues[index]
+        while True:
+            batch = self._get_batch(queue_, stage.batch_size)
+            items = [item for item in batch if item is not _END]
+            if items and not self._process(index, stage, pool, items):
+                return
+            if self._stop.is_set():
+                return
+            if len(items) < len(batch):
+                break
+        # the last worker of a stage passes the end on
+        with self._lock:
+            self._remaining[index] -= 1
+            last = self._remaining[index] == 0
+        if last:
+            workers = self.stages[index + 1].workers \
+                if index + 1 < len(self.stages) else 1
+            for _ in range(workers):
+                self._put(index + 1, _END)
+
+    def _process(
+        self,
+        index: int,
+        stage: Stage,
+        pool: Optional[ProcessPoolExecutor],
+        items: list[Any]
+    ) -> bool:
+        """
+        Processes a batch of items of the stage at `index` and puts the
+        results into the next queue. Returns False if the pipeline is
+        stopped.
+        """
+        apply = _apply_ordered if self._ordered else _apply
+        start = perf_counter()
+        try:
+            if pool is None:
+                results = apply(stage.function, items)
+            else:
+                results = pool.submit(apply, stage.function, items).result()
+        except Exception as exc_info:  # pylint: disable=broad-exception-caught
+            self._fail(exc_info)
+            return False
+        if self._ordered:
+            # dropped items are passed on to release their sequence
+            # number in the reorder buffer
+            processed = sum(item is not None for _, item in items)
+        else:
+            processed = len(items)
+            results = [result for result in results if result is not None]
+        self._count(stage.name, processed, perf_counter() - start)
+        return all(self._put(index + 1, result) for result in results)
+
+    def _get_batch(self, queue_: queue.Queue, size: int) -> list[Any]:
+        """
+        Returns a batch of up to `size` items (at least one; stops at
+        the end-marker) from `queue_`.
+        """
+        batch = [self._get(queue_)]
+        while len(batch) < size and batch[-1] is not _END:
+            try:
+                batch.append(queue_.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _acquire_window(self) -> bool:
+        """
+        Reserves a place for an item in the pipeline (blocks while the
+        pipeline is full). Returns False if the pipeline is stopped.
+        """
+        while not self._stop.is_set():
+            if self._window.acquire(timeout=_POLL_INTERVAL):
+                return True
+        return False
+
+    def _get(self, queue_: queue.Queue) -> Any:
+        """
+        Returns the next item of `queue_` (or the end-marker if the
+        pipeline is stopped).
+        """
+        while not self._stop.is_set():
+            try:
+                return queue_.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _put(self, index: int, item: Any) -> bool:
+        """
+        Puts `item` into the queue at `index` (blocks while the queue is
+        full). Returns False if the pipeline is stopped.
+        """
+        queue_ = self._queues[index]
+        while not self._stop.is_set():
+            try:
+                queue_.put(item, timeout=_POLL_INTERVAL)
+            except queue.Full:
+                continue
+            if item is not _END:
+                name = self.stages[index].name \
+                    if index < len(self.stages) else self.OUTPUT
+                depth = queue_.qsize()
+                with self._lock:
+                    if depth > self._max_depth[name]:
+                        self._max_depth[name] = depth
+            return True
+        return False
+
+    def _count(self, name: str, processed: int, busy: float) -> None:
+        """Adds to the statistics of a stage."""
+        with self._lock:
+            self._processed[name] += processed
+            self._busy[name] += busy
+
+    def _fail(self, exc_info: BaseException) -> None:
+        """Stops the pipeline after an exception in a stage."""
+        with self._lock:
+            if self._error is None:
+                self._error = exc_info
+        self._stop.set()
+
+
+def _apply(function: Callable[[Any], Any], items: list[Any]) -> list[Any]:
+    """Returns the results of `function` for `items`."""
+    return [function(item) for item in items]
+
+
+def _apply_ordered(
+    function: Callable[[Any], Any], items: list[tuple[int, Any]]
+) -> list[tuple[int, Any]]:
+    """
+    Returns the results of `function` for `items` (tuples of sequence
+    number and item) with their sequence numbers; dropped items (None)
+    are passed on.
+    """
+    return [
+        (sequence, None if item is None else function(item))
+        for sequence, item in items
+    ]
@@ -0,0 +1,430 @@
+"""
+This module contains a persistent (SQLite-based) index of the state of
+harvested records that enables the incremental conversion and mapping
+of repositories (only new, changed, or deleted records are mapped).
+"""
+
+from typing import Any, Optional, Iterable, Iterator
+from collections.abc import Mapping
+from dataclasses import dataclass, replace
+from pathlib import Path
+from hashlib import blake2b
+import json
+import sqlite3
+
+from dcm_common.util import NestedDict
+
+from dcm_metadata_mapper.mapper_interface import MapperInterface
+from lzvnrw_converter.compact import thaw
+
+
+# columns of a RecordState in the database
+_COLUMNS = (
+    "identifier, datestamp, content_hash, deleted, metadata, "
+    + "mapper_version, projection"
+)
+
+
+@dataclass(frozen=True)
+class RecordState:
+    """
+    State of a record in the RecordStateIndex.
+
+    Keyword arguments:
+    identifier -- OAI-identifier of the record
+    datestamp -- datestamp of the record header
+    content_hash -- hash of the record (see record_hash)
+    deleted -- whether the record header has the status "deleted"
+    metadata -- last mapped metadata (see
+                MapperInterface.get_all_metadata) (default None)
+    mapper_version -- MAPPER_TAG and specversion of the mapper that
+                      produced `metadata` (see mapper_version)
+                      (default None)
+    projection -- paths of the (projected) conversion from which
+                  `content_hash` was computed (see projection); None for
+                  a full conversion (default None)
+    """
+    identifier: str
+    datestamp: Optional[str]
+    content_hash: Optional[str]
+    deleted: bool
+    metadata: Optional[dict[str, Any]] = None
+    mapper_version: Optional[str] = None
+    projection: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class RecordUpdate:
+    """
+    Mapped metadata of a new, changed, or deleted record.
+
+    Keyword arguments:
+    identifier -- OAI-identifier of the record
+    status -- one of "new", "changed", or "deleted"
+    metadata -- mapped metadata (see MapperInterface.get_all_metadata)
+    """
+    identifier: str
+    status: str
+    metadata: Optional[dict[str, Any]]
+
+
+def record_hash(record: NestedDict) -> str:
+    """
+    Returns the content hash of a converted record (see
+    OAIPMHMetadataConverter.get_dict).
+
+    The hash is computed from the record-element only, i.e. it does not
+    depend on the response envelope (like the responseDate) and is
+    identical for a record from a GetRecord- and a ListRecords-response.
+    It does, however, depend on the paths of a projected conversion
+    (see projection), i.e. hashes are only comparable for identical
+    projections. Compact records (see lzvnrw_converter.compact) have
+    the hash of the corresponding dictionaries.
+    """
+    return blake2b(
+        json.dumps(
+            thaw(record), ensure_ascii=False, separators=(",", ":"), default=str
+        ).encode("utf-8"),
+        digest_size=16
+    ).hexdigest()
+
+
+def mapper_version(mapper: MapperInterface) -> str:
+    """
+    Returns a string that identifies the MAPPER_TAG and specversion of
+    `mapper` (stored with the mapped metadata in the RecordStateIndex).
+    """
+    return json.dumps([mapper.MAPPER_TAG, list(mapper.get_specversion())])
+
+
+def projection(paths: Optional[Iterable[Any]]) -> Optional[str]:
+    """
+    Returns a string that identifies the paths of a projected conversion
+    (independent of their order) or None for a full conversion.
+
+    Keyword arguments:
+    paths -- paths of the conversion (see
+             OAIPMHMetadataConverter.get_dict)
+    """
+    if paths is None:
+        return None
+    return json.dumps(
+        sorted({json.dumps(list(path), default=str) for path in paths})
+    )
+
+
+def record_header(
+    record: NestedDict
+) -> tuple[Optional[str], Optional[str], bool]:
+    """
+    Returns a tuple of identifier, datestamp, and deleted-status from
+    the header of a converted record.
+    """
+    header = record.get("header") if isinstance(record, Mapping) else None
+    if not isinstance(header, Mapping):
+        return None, None, False
+    return (
+        _text(header.get("identifier")),
+        _text(header.get("datestamp")),
+        header.get("@status") == "deleted",
+    )
+
+
+class RecordStateIndex:
+    """
+    Persistent index of record states keyed by MAPPER_TAG and
+    OAI-identifier.
+
+    Every state records the mapper version (MAPPER_TAG and specversion)
+    of its metadata and the projection of its content hash; records
+    with a different mapper version or projection are mapped again
+    (see update_record).
+
+    Changes are written in transactions which are committed by
+    `commit` (and when leaving the context manager), e.g.
+    with RecordStateIndex("state.sqlite") as index:
+        for update in index.update_records(records, mapper):
+            ...
+
+    Keyword arguments:
+    path -- path of the SQLite-database (created if missing)
+            (default ":memory:")
+    """
+
+    def __init__(self, path: str | Path = ":memory:") -> None:
+        self.path = str(path)
+        self._connection = sqlite3.connect(self.path)
+        if self.path != ":memory:":
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            """CREATE TABLE IF NOT EXISTS records (
+                mapper_tag TEXT NOT NULL,
+                identifier TEXT NOT NULL,
+                datestamp TEXT,
+                content_hash TEXT,
+                deleted INTEGER NOT NULL,
+                metadata TEXT,
+                mapper_version TEXT,
+                projection TEXT,
+                PRIMARY KEY (mapper_tag, identifier)
+            )"""
+        )
+        # migrate databases of earlier versions
+        columns = {
+            row[1] for row in
+            self._connection.execute("PRAGMA table_info(records)")
+        }
+        for column in ("mapper_version", "projection"):
+            if column not in columns:
+                self._connection.execute(
+                    f"ALTER TABLE records ADD COLUMN {column} TEXT"
+                )
+        self._connection.commit()
+
+    def __enter__(self) -> "RecordStateIndex":
+        return self
+
+    def __exit__(self, exc_type, *_) -> None:
+        if exc_type is None:
+            self.commit()
+        self.close()
+
+    def commit(self) -> None:
+        """Commit pending changes."""
+        self._connection.commit()
+
+    def close(self) -> None:
+        """Close the database (pending changes are discarded)."""
+        self._connection.close()
+
+    def get(self, mapper_tag: str, identifier: str) -> Optional[RecordState]:
+        """
+        Returns the RecordState of a record or None if unknown.
+
+        Keyword arguments:
+        mapper_tag -- MAPPER_TAG of the mapper
+        identifier -- OAI-identifier of the record
+        """
+        row = self._connection.execute(
+            f"""SELECT {_COLUMNS} FROM records
+            WHERE mapper_tag = ? AND identifier = ?""",
+            (mapper_tag, identifier)
+        ).fetchone()
+        return None if row is None else _state(row)
+
+    def put(self, mapper_tag: str, state: RecordState) -> None:
+        """
+        Insert or replace the state of a record.
+
+        Keyword arguments:
+        mapper_tag -- MAPPER_TAG of the mapper
+        state -- RecordState of the record
+        """
+        self._connection.execute(
+            f"""INSERT OR REPLACE INTO records (mapper_tag, {_COLUMNS})
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+            (
+                mapper_tag,
+                state.identifier,
+                state.datestamp,
+                state.content_hash,
+                int(state.deleted),
+                None if state.metadata is None else _dumps(state.metadata),
+                state.mapper_version,
+                state.projection,
+            )
+        )
+
+    def states(self, mapper_tag: str) -> Iterator[RecordState]:
+        """
+        Returns iterator of the RecordStates of a mapper (ordered by
+        identifier).
+
+        Keyword arguments:
+        mapper_tag -- MAPPER_TAG of the mapper
+        """
+        yield from map(
+            _state,
+            self._connection.execute(
+                f"""SELECT {_COLUMNS} FROM records WHERE mapper_tag = ?
+                ORDER BY identifier""",
+                (mapper_tag,)
+            )
+        )
+
+    def last_datestamp(
+        self, mapper_tag: str, mapper: Optional[MapperInterface] = None
+    ) -> Optional[str]:
+        """
+        Returns the latest datestamp of the records of a mapper (e.g. as
+        `from_date` of the next incremental harvest) or None.
+
+        Keyword arguments:
+        mapper_tag -- MAPPER_TAG of the mapper
+        mapper -- if given, None is returned if any record was mapped
+                  by another mapper version (see mapper_version), i.e.
+                  all records have to be harvested again (default None)
+        """
+        if mapper is not None and self._connection.execute(
+            """SELECT 1 FROM records WHERE mapper_tag = ?
+            AND mapper_version IS NOT ? LIMIT 1""",
+            (mapper_tag, mapper_version(mapper))
+        ).fetchone() is not None:
+            return None
+        return self._connection.execute(
+            "SELECT MAX(datestamp) FROM records WHERE mapper_tag = ?",
+            (mapper_tag,)
+        ).fetchone()[0]
+
+    def is_current(
+        self,
+        mapper_tag: str,
+        identifier: str,
+        datestamp: Optional[str],
+        deleted: bool = False,
+        mapper: Optional[MapperInterface] = None
+    ) -> bool:
+        """
+        Returns True if a record with the given header is known with
+        the same datestamp and deleted-status (i.e. it does not have to
+        be requested and converted again).
+
+        Keyword arguments:
+        mapper_tag -- MAPPER_TAG of the mapper
+        identifier -- OAI-identifier of the record
+        datestamp -- datestamp of the record header
+        deleted -- deleted-status of the record header (default False)
+        mapper -- if given, the record also has to be mapped by the same
+                  mapper version (see mapper_version) (default None)
+        """
+        if datestamp is None:
+            return False
+        state = self.get(mapper_tag, identifier)
+        return state is not None and state.datestamp == datestamp \
+            and state.deleted == deleted \
+            and (
+                mapper is None
+                or state.mapper_version == mapper_version(mapper)
+            )
+
+    def update_record(
+        self,
+        record: NestedDict,
+        mapper: MapperInterface,
+        mapper_tag: Optional[str] = None,
+        paths: Optional[Iterable[Any]] = None
+    ) -> Optional[RecordUpdate]:
+        """
+        Returns the RecordUpdate for a new, changed, or deleted record
+        and updates the index accordingly (the change is not committed).
+        Returns None for an unchanged record (identical content hash,
+        see record_hash, projection, and mapper version) which is not
+        mapped. A record that is known with another projection or
+        mapper version is mapped again and returned as changed only if
+        its metadata differs. Deleted records are returned once (mapped
+        like any other record, i.e. with the metadata that is available
+        from their header).
+
+        Keyword arguments:
+        record -- converted record (see
+                  OAIPMHMetadataConverter.get_dict)
+        mapper -- mapper-instance
+        mapper_tag -- key of the mapper in the index (default None;
+                      uses mapper.MAPPER_TAG)
+        paths -- paths of a projected conversion of `record` (see
+                 OAIPMHMetadataConverter.get_dict) (default None)
+        """
+        mapper_tag = mapper_tag or mapper.MAPPER_TAG
+        identifier, datestamp, deleted = record_header(record)
+        if identifier is None:
+            raise ValueError("Record without identifier in header.")
+        state = RecordState(
+            identifier,
+            datestamp,
+            record_hash(record),
+            deleted,
+            mapper_version=mapper_version(mapper),
+            projection=projection(paths),
+        )
+        previous = self.get(mapper_tag, identifier)
+        # whether the record has to be compared by its metadata
+        compare = False
+        if previous is not None and previous.deleted == deleted:
+            if previous.projection != state.projection:
+                compare = True
+            elif previous.content_hash == state.content_hash:
+                if previous.mapper_version == state.mapper_version:
+                    return None
+                compare = True
+        metadata = mapper.get_all_metadata(record)
+        self.put(mapper_tag, replace(state, metadata=metadata))
+        if compare and _dumps(metadata) == _dumps(previous.metadata):
+            return None
+        if deleted:
+            return RecordUpdate(identifier, "deleted", metadata)
+        if previous is None:
+            return RecordUpdate(identifier, "new", metadata)
+        return RecordUpdate(identifier, "changed", metadata)
+
+    def update_records(
+        self,
+        records: Iterable[NestedDict],
+        mapper: MapperInterface,
+        mapper_tag: Optional[str] = None,
+        batch_size: int = 1000,
+        paths: Optional[Iterable[Any]] = None
+    ) -> Iterator[RecordUpdate]:
+        """
+        Returns iterator of RecordUpdates for the new, changed, and
+        deleted records in `records` (see update_record). Changes are
+        committed every `batch_size` records and after the iteration.
+
+        Keyword arguments:
+        records -- iterable of converted records (see
+                   OAIPMHMetadataConverter.get_dict/iter_dicts)
+        mapper -- mapper-instance
+        mapper_tag -- key of the mapper in the index (default None;
+                      uses mapper.MAPPER_TAG)
+        batch_size -- number of records per transaction (default 1000)
+        paths -- paths of a projected conversion of `records` (see
+                 OAIPMHMetadataConverter.get_dict) (default None)
+        """
+        if paths is not None:
+            paths = list(paths)
+        for count, record in enumerate(records, start=1):
+            update = self.update_record(record, mapper, mapper_tag, paths)
+            if count % batch_size == 0:
+                self.commit()
+            if update is not None:
+                yield update
+        self.commit()
+
+
+def _state(row: tuple) -> RecordState:
+    """Returns the RecordState of a database row."""
+    (
+        identifier, datestamp, content_hash, deleted, metadata,
+        mapper_version_, projection_
+    ) = row
+    return RecordState(
+        identifier,
+        datestamp,
+        content_hash,
+        bool(deleted),
+        None if metadata is None else json.loads(metadata),
+        mapper_version_,
+        projection_,
+    )
+
+
+def _dumps(metadata: Optional[dict[str, Any]]) -> str:
+    """Returns the JSON-representation of mapped metadata."""
+    return json.dumps(thaw(metadata), ensure_ascii=False)
+
+
+def _text(value: Any) -> Optional[str]:
+    """Returns the text of a converted element."""
+    if isinstance(value, Mapping):
+        value = value.get("#text")
+    return None if value is None else str(value).strip()
@@ -0,0 +1,246 @@
+"""
+Test suite for the bulk-conversion and -mapping pipeline.
+"""
+from pathlib import Path
+import gzip
+
+import pytest
+from lzvnrw_converter.oaipmh_converter import OAIPMHMetadataConverter
+from lzvnrw_mapper.miami import MiamiMetadataMapper
+from dcm_metadata_pipeline.bulk import \
+    collect_paths, get_mapper, map_files, map_dump, map_files_staged, \
+    staged_pipeline
+
+
+RECORD = """<OAI-PMH>
+    <GetRecord>
+        <record>
+            <header>
+                <identifier>oai:wwu.de:{}</identifier>
+            </header>
+            <metadata>
+                <oai_dc:dc>
+                    <dc:title>This is a test</dc:title>
+                    <dc:creator>Mustermann, M.</dc:creator>
+                    <dc:identifier>urn:nbn:de:hbz:x-xxxxxxxxxxx</dc:identifier>
+                    <dc:identifier>
+                        https://repositorium.uni-muenster.de/transfer/miami/x.pdf
+                    </dc:identifier>
+                </oai_dc:dc>
+            </metadata>
+        </record>
+    </GetRecord>
+</OAI-PMH>
+"""
+
+
+@pytest.fixture(name="record_dir")
+def get_record_dir(tmp_path):
+    """Returns a directory with record-files 0.xml, ..., 9.xml."""
+    (tmp_path / "sub").mkdir()
+    for i in range(10):
+        (tmp_path / ("sub" if i % 2 else "") / f"{i}.xml").write_text(
+            RECORD.format(i), encoding="utf-8"
+        )
+    (tmp_path / "invalid.xml").write_text("<OAI-PMH>", encoding="utf-8")
+    (tmp_path / "other.txt").write_text("", encoding="utf-8")
+    return tmp_path
+
+
+def test_collect_paths(record_dir):
+    """Test collection of paths from directories, files, and globs."""
+    assert len(collect_paths(record_dir)) == 11
+    assert collect_paths(
+        [record_dir / "0.xml", str(record_dir / "sub" / "*.xml")]
+    ) == [record_dir / "0.xml"] + [
+        record_dir / "sub" / f"{i}.xml" for i in (1, 3, 5, 7, 9)
+    ]
+    unmatched = []
+    assert collect_paths(
+        [
+            record_dir / "missing.xml",
+            str(record_dir / "*.json"),
+            record_dir / "0.xml",
+        ],
+        unmatched=unmatched
+    ) == [record_dir / "0.xml"]
+    assert unmatched == [
+        str(record_dir / "missing.xml"), str(record_dir / "*.json")
+    ]
+
+
+def test_get_mapper():
+    """Test the lookup of mappers by tag."""
+    assert isinstance(get_mapper("Miami Metadata Mapper"), MiamiMetadataMapper)
+    with pytest.raises(ValueError):
+        get_mapper("Unknown Mapper")
+
+
+@pytest.mark.parametrize(
+    ("ordered", "projected"), [(True, False), (False, False), (True, True)]
+)
+def test_map_files(record_dir, ordered, projected):
+    """
+    Assert that the results of the pipeline match those of a direct
+    conversion and mapping.
+    """
+    paths = collect_paths(record_dir)
+    mapper = MiamiMetadataMapper()
+    converter = OAIPMHMetadataConverter()
+
+    results = list(
+        map_files(
+            paths, "Miami Metadata Mapper", workers=2, chunksize=3,
+            ordered=ordered, projected=projected
+        )
+    )
+
+    if ordered:
+        assert [result.path for result in results] == [str(p) for p in paths]
+    assert sorted(result.path for result in results) \
+        == sorted(str(p) for p in paths)
+    for result in results:
+        if result.path.endswith("invalid.xml"):
+            assert result.metadata is None
+            assert result.error is not None
+            continue
+        assert result.error is None
+        assert result.metadata == mapper.get_all_metadata(
+            converter.get_dict(Path(result.path).read_text(encoding="utf-8"))
+        )
+
+
+def test_map_files_cache(record_dir, tmp_path_factory):
+    """Test map_files with a shared MappingCache."""
+    cache_dir = tmp_path_factory.mktemp("cache")
+    paths = collect_paths(record_dir)
+
+    results = list(
+        map_files(
+            paths, "Miami Metadata Mapper", workers=2, chunksize=3,
+            cache_dir=cache_dir
+        )
+    )
+    # invalid.xml is not cached
+    assert len(list(cache_dir.glob("*/*.json"))) == 10
+    assert list(
+        map_files(
+            paths, "Miami Metadata Mapper", workers=2, chunksize=3,
+            cache_dir=cache_dir
+        )
+    ) == results
+
+
+@pytest.mark.parametrize(
+    ("ordered", "projected"), [(True, False), (False, True)]
+)
+def test_map_dump(tmp_path, ordered, projected):
+    """
+    Assert that the results of map_dump match those of a direct
+    conversion and mapping (per record of the dump).
+    """
+    records = [
+        RECORD.format(i).replace(
+            "<dc:title>", "<dc:title><invalid>" if i == 7 else "<dc:title>"
+        )
+        for i in range(20)
+    ]
+    dump = tmp_path / "dump.xml"
+    dump.write_text("".join(records), encoding="utf-8")
+    mapper = MiamiMetadataMapper()
+    converter = OAIPMHMetadataConverter()
+
+    results = list(
+        map_dump(
+            dump, "Miami Metadata Mapper", workers=2, range_size=1000,
+            ordered=ordered, projected=projected
+        )
+    )
+
+    assert len(results) == 20
+    offsets = [result.offset for result in results]
+    if ordered:
+        assert offsets == sorted(offsets)
+    data = dump.read_bytes()
+    for result in results:
+        assert result.path == str(dump)
+        assert data[result.offset:].startswith(b"<record>")
+        index = int(
+            data[result.offset:].split(b"oai:wwu.de:", 1)[1].split(b"<")[0]
+        )
+        if index == 7:
+            assert result.metadata is None
+            assert result.error is not None
+            continue
+        assert result.error is None
+        assert result.metadata == mapper.get_all_metadata(
+            converter.get_dict(records[index])
+        )
+
+
+def test_map_dump_truncated(tmp_path):
+    """
+    Assert that an incomplete last record is returned as error while
+    the records before it (also in the same range) are kept.
+    """
+    dump = tmp_path / "dump.xml"
+    data = "".join(RECORD.format(i) for i in range(5))
+    dump.write_text(data[:data.rindex("</record>")], encoding="utf-8")
+
+    results = list(map_dump(dump, "miami", workers=0))
+
+    assert len(results) == 5
+    assert all(result.error is None for result in results[:4])
+    assert results[4].metadata is None
+    assert results[4].error.startswith("IncompleteRecordError")
+    assert results[4].offset == dump.read_bytes().rindex(b"<record>")
+
+
+def test_map_files_compressed(record_dir):
+    """Test map_files with gzip-compressed files."""
+    for i in (0, 2, 4):
+        (record_dir / f"{i}.xml.gz").write_bytes(
+            gzip.compress((record_dir / f"{i}.xml").read_bytes())
+        )
+    paths = collect_paths(record_dir)
+    assert len(paths) == 14
+
+    results = {
+        Path(result.path).name: result
+        for result in map_files(
+            paths, "Miami Metadata Mapper", workers=2, chunksize=3
+        )
+    }
+    for i in (0, 2, 4):
+        assert results[f"{i}.xml.gz"].error is None
+        assert results[f"{i}.xml.gz"].metadata \
+            == results[f"{i}.xml"].metadata
+
+
+@pytest.mark.parametrize("projected", [False, True])
+def test_map_files_staged(record_dir, projected):
+    """
+    Assert that the results of the staged pipeline match those of
+    map_files.
+    """
+    paths = collect_paths(record_dir) + [record_dir / "missing.xml"]
+    pipeline = staged_pipeline(
+        "miami", read_workers=2, convert_workers=2, map_workers=1,
+        batch_size=2, queue_size=4, projected=projected
+    )
+
+    results = list(map_files_staged(paths, "miami", pipeline=pipeline))
+
+    expected = list(
+        map_files(paths, "miami", workers=0, projected=projected)
+    )
+    assert results == expected
+    assert sorted(
+        map_files_staged(paths, "miami", pipeline=pipeline, ordered=False),
+        key=lambda result: result.path
+    ) == sorted(expected, key=lambda result: result.path)
+    assert sum(result.error is not None for result in results) == 2
+    stats = {stage.name: stage for stage in pipeline.stats()}
+    assert stats["read"].processed == 12
+    assert stats["convert"].processed == 12
+    assert stats["output"].processed == 12
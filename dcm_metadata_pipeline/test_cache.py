@@ -0,0 +1,156 @@
+"""
+Test suite for the content-addressed mapping cache.
+"""
+import os
+
+import pytest
+from lzvnrw_converter.compact import freeze
+from lzvnrw_converter.oaipmh_converter import OAIPMHMetadataConverter
+from lzvnrw_mapper.miami import MiamiMetadataMapper
+from lzvnrw_mapper.hbz_opus import HbzOpusMetadataMapper
+from dcm_metadata_pipeline.cache import MappingCache, cache_key
+
+
+RECORD = """<OAI-PMH>
+    <GetRecord>
+        <record>
+            <header>
+                <identifier>oai:wwu.de:{}</identifier>
+            </header>
+            <metadata>
+                <oai_dc:dc>
+                    <dc:title>This is a test</dc:title>
+                    <dc:creator>Mustermann, M.</dc:creator>
+                </oai_dc:dc>
+            </metadata>
+        </record>
+    </GetRecord>
+</OAI-PMH>
+"""
+
+
+@pytest.fixture(name="mapper")
+def get_mapper():
+    """Returns a mapper-instance."""
+    return MiamiMetadataMapper()
+
+
+@pytest.fixture(name="converter")
+def get_converter():
+    """Returns a converter-instance."""
+    return OAIPMHMetadataConverter()
+
+
+def test_cache_key(mapper, converter):
+    """Test that cache_key depends on content, mapper, and versions."""
+    key = cache_key(RECORD.format(0), mapper, converter)
+
+    assert key == cache_key(
+        RECORD.format(0).encode("utf-8"), mapper, converter
+    )
+    assert key != cache_key(RECORD.format(1), mapper, converter)
+    assert key != cache_key(
+        RECORD.format(0), HbzOpusMetadataMapper(), converter
+    )
+
+    class NewConverter(OAIPMHMetadataConverter):
+        """Converter with a new specification version."""
+        _SPECVERSION = (9, 9, 9, "")
+
+    assert key != cache_key(RECORD.format(0), mapper, NewConverter())
+
+
+def test_get_all_metadata(mapper, converter):
+    """Test get_all_metadata with the in-memory tier."""
+    cache = MappingCache(maxsize=2)
+    expected = mapper.get_all_metadata(converter.get_dict(RECORD.format(0)))
+
+    assert cache.get_all_metadata(RECORD.format(0), mapper, converter) \
+        == expected
+    assert (cache.hits, cache.misses) == (0, 1)
+    result = cache.get_all_metadata(RECORD.format(0), mapper, converter)
+    assert result == expected
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # returned values are copies
+    result["dc-title"] = None
+    assert cache.get_all_metadata(RECORD.format(0), mapper, converter) \
+        == expected
+
+    # projected conversion yields the same result
+    assert cache.get_all_metadata(
+        RECORD.format(1), mapper, converter, paths=mapper.SOURCE_PATHS
+    ) == mapper.get_all_metadata(converter.get_dict(RECORD.format(1)))
+
+
+def test_lru_eviction():
+    """Test eviction of the least recently used entries from memory."""
+    cache = MappingCache(maxsize=2)
+    cache.put("a", {"v": 1})
+    cache.put("b", {"v": 2})
+    assert cache.get("a") == {"v": 1}
+    cache.put("c", {"v": 3})
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == {"v": 1}
+    assert cache.get("c") == {"v": 3}
+
+
+def test_disk_tier(tmp_path):
+    """Test the on-disk tier and its size-based eviction."""
+    value = {"v": "x" * 100}
+    size = len('{"v": ""}') + 100
+    cache = MappingCache(maxsize=1, directory=tmp_path, max_disk_size=3 * size)
+    for key in ("aa", "ab", "ba"):
+        cache.put(key, value)
+    assert cache.disk_size == 3 * size
+
+    # read from disk (evicted from memory)
+    assert cache.get("aa") == value
+    cache.put("bb", value)
+    assert cache.disk_size == 3 * size
+    assert not (tmp_path / "ab" / "ab.json").exists()
+    assert cache.get("ab") is None
+
+    # a new instance uses the existing files (ordered by mtime)
+    for mtime, key in enumerate(("bb", "ba", "aa")):
+        os.utime(tmp_path / key[:2] / f"{key}.json", (mtime, mtime))
+    cache = MappingCache(directory=tmp_path, max_disk_size=2 * size)
+    assert cache.disk_size == 2 * size
+    assert cache.get("bb") is None
+    assert cache.get("aa") == value
+
+    cache.clear()
+    assert cache.disk_size == 0
+    assert list(tmp_path.glob("*/*.json")) == []
+
+    # compact values are written as dictionaries
+    compact = freeze({"v": [{"#text": "x"}]})
+    cache.put("ca", compact)
+    assert MappingCache(directory=tmp_path).get("ca") \
+        == {"v": [{"#text": "x"}]}
+
+
+def test_disk_tier_shared(tmp_path):
+    """
+    Test that the size of a shared on-disk tier includes the files of
+    other instances (e.g. other processes).
+    """
+    value = {"v": "x" * 100}
+    size = len('{"v": ""}') + 100
+    caches = [
+        MappingCache(maxsize=1, directory=tmp_path, max_disk_size=4 * size)
+        for _ in range(2)
+    ]
+    for index in range(8):
+        caches[index % 2].put(f"{index:02d}", value)
+        assert len(list(tmp_path.glob("*/*.json"))) <= 4
+    assert caches[1].disk_size == 4 * size
+    assert sorted(path.stem for path in tmp_path.glob("*/*.json")) == [
+        "04", "05", "06", "07"
+    ]
+
+    caches[0].clear()
+    assert caches[0].disk_size == 0
+    assert list(tmp_path.glob("*/*.json")) == []
@@ -0,0 +1,319 @@
+"""
+Test suite for the command line interface `dcm-map`.
+"""
+from io import BytesIO, TextIOWrapper
+import gzip
+import json
+import sys
+
+import pytest
+from lzvnrw_converter.oaipmh_converter import OAIPMHMetadataConverter
+from lzvnrw_mapper.miami import MiamiMetadataMapper
+from dcm_metadata_pipeline.cli import main
+from dcm_metadata_pipeline.encoders import MsgpackEncoder
+from dcm_metadata_pipeline.record_store import MANIFEST, RecordStore
+
+
+RECORD = """
+        <record>
+            <header>
+                <identifier>oai:wwu.de:{}</identifier>
+            </header>
+            <metadata>
+                <oai_dc:dc>
+                    <dc:title>Überprüfung</dc:title>
+                    <dc:identifier>urn:nbn:de:hbz:x-xxxxxxxxxxx</dc:identifier>
+                </oai_dc:dc>
+            </metadata>
+        </record>"""
+GET_RECORD = "<OAI-PMH><GetRecord>{}</GetRecord></OAI-PMH>\n"
+LIST_RECORDS = "<OAI-PMH><ListRecords>{}</ListRecords></OAI-PMH>\n"
+
+
+def expected_metadata(*indices: int) -> list[dict]:
+    """Returns the mapped metadata of the records with `indices`."""
+    mapper = MiamiMetadataMapper()
+    converter = OAIPMHMetadataConverter()
+    return [
+        mapper.get_all_metadata(
+            converter.get_dict(GET_RECORD.format(RECORD.format(i)))
+        )
+        for i in indices
+    ]
+
+
+def read_ndjson(text: str) -> list[dict]:
+    """Returns the objects of newline-delimited JSON."""
+    return [json.loads(line) for line in text.splitlines()]
+
+
+@pytest.fixture(name="dump")
+def get_dump(tmp_path):
+    """Returns the path of a dump with two ListRecords-pages."""
+    path = tmp_path / "dump.xml"
+    path.write_text(
+        LIST_RECORDS.format("".join(RECORD.format(i) for i in range(5)))
+        + LIST_RECORDS.format(
+            "".join(RECORD.format(i) for i in range(5, 10))
+        ),
+        encoding="utf-8"
+    )
+    return path
+
+
+@pytest.mark.parametrize("workers", ["0", "2"])
+def test_files(tmp_path, capsys, workers):
+    """Test mapping of GetRecord-files into stdout."""
+    (tmp_path / "records").mkdir()
+    for i in range(5):
+        (tmp_path / "records" / f"{i}.xml").write_text(
+            GET_RECORD.format(RECORD.format(i)), encoding="utf-8"
+        )
+    (tmp_path / "records" / "5.xml.gz").write_bytes(
+        gzip.compress(GET_RECORD.format(RECORD.format(5)).encode("utf-8"))
+    )
+
+    main(["-m", "miami", "-w", workers, str(tmp_path / "records")])
+
+    assert read_ndjson(capsys.readouterr().out) == expected_metadata(
+        *range(6)
+    )
+
+
+@pytest.mark.parametrize("unordered", [False, True])
+def test_staged(tmp_path, capsys, unordered):
+    """Test mapping of files in the staged pipeline."""
+    for i in range(6):
+        (tmp_path / f"{i}.xml").write_text(
+            GET_RECORD.format(RECORD.format(i)), encoding="utf-8"
+        )
+
+    main(
+        [
+            "-m", "miami", "--staged", "-w", "2", "--read-workers", "2",
+            "--stats", str(tmp_path)
+        ] + (["--unordered"] if unordered else [])
+    )
+
+    captured = capsys.readouterr()
+    if unordered:
+        assert sorted(
+            read_ndjson(captured.out), key=str
+        ) == sorted(expected_metadata(*range(6)), key=str)
+    else:
+        assert read_ndjson(captured.out) == expected_metadata(*range(6))
+    assert "pipeline stages" in captured.err
+    for stage in ("read", "convert", "map", "output"):
+        assert f"  {stage} " in captured.err
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_dump(dump, tmp_path, capsys, compress):
+    """Test mapping of dumps into a file with statistics."""
+    if compress:
+        dump.with_suffix(".xml.gz").write_bytes(
+            gzip.compress(dump.read_bytes())
+        )
+        dump = dump.with_suffix(".xml.gz")
+    output = tmp_path / "metadata.ndjson"
+
+    main(
+        [
+            "-m", "Miami Metadata Mapper", "--dump", str(dump),
+            "-o", str(output), "-w", "2", "--batch-size", "3", "--stats",
+            "--with-source"
+        ]
+    )
+
+    objects = read_ndjson(output.read_text(encoding="utf-8"))
+    assert [obj["metadata"] for obj in objects] \
+        == expected_metadata(*range(10))
+    assert {obj["path"] for obj in objects} == {str(dump)}
+    assert all(obj["offset"] is not None for obj in objects)
+    stderr = capsys.readouterr().err
+    assert "records: 10 (errors: 0)" in stderr
+    assert "records/s" in stderr
+    assert "convert" in stderr and "map" in stderr and "write" in stderr
+
+
+def test_stdin(dump, capsys, monkeypatch):
+    """Test mapping of a (compressed) dump from stdin."""
+    monkeypatch.setattr(
+        sys, "stdin",
+        TextIOWrapper(BytesIO(gzip.compress(dump.read_bytes())))
+    )
+
+    main(["-m", "miami", "-w", "0", "--projected"])
+
+    assert read_ndjson(capsys.readouterr().out) == expected_metadata(
+        *range(10)
+    )
+
+
+@pytest.mark.parametrize("source", ["file", "gzip", "stdin"])
+def test_truncated(dump, tmp_path, capsys, monkeypatch, source):
+    """
+    Test that an incomplete last record of a dump is reported as error
+    while the complete records are written.
+    """
+    data = dump.read_bytes()
+    data = data[:data.rindex(b"</record>")]
+    path = tmp_path / "truncated.xml"
+    if source == "gzip":
+        path = path.with_suffix(".xml.gz")
+        data = gzip.compress(data)
+    path.write_bytes(data)
+    if source == "stdin":
+        monkeypatch.setattr(sys, "stdin", TextIOWrapper(BytesIO(data)))
+        argv = ["-m", "miami", "-w", "0"]
+    else:
+        argv = ["-m", "miami", "-w", "0", "--dump", str(path)]
+
+    with pytest.raises(SystemExit) as exc_info:
+        main(argv)
+
+    assert exc_info.value.code == 1
+    captured = capsys.readouterr()
+    assert read_ndjson(captured.out) == expected_metadata(*range(9))
+    assert "IncompleteRecordError: Incomplete record at byte" \
+        in captured.err
+
+
+def test_truncated_compression(dump, tmp_path, capsys):
+    """Test that a truncated compressed dump is reported as error."""
+    path = tmp_path / "truncated.xml.gz"
+    path.write_bytes(gzip.compress(dump.read_bytes())[:-4])
+
+    with pytest.raises(SystemExit) as exc_info:
+        main(["-m", "miami", "-w", "0", "--dump", str(path)])
+
+    assert exc_info.value.code == 1
+    captured = capsys.readouterr()
+    assert read_ndjson(captured.out) == expected_metadata(*range(10))
+    assert "EOFError" in captured.err
+
+
+def test_corrupt_compression(dump, capsys, monkeypatch):
+    """Test that a corrupt compressed stream is reported as error."""
+    data = bytearray(gzip.compress(dump.read_bytes()))
+    data[len(data) // 2:len(data) // 2 + 8] = b"\xff" * 8
+    monkeypatch.setattr(sys, "stdin", TextIOWrapper(BytesIO(bytes(data))))
+
+    with pytest.raises(SystemExit) as exc_info:
+        main(["-m", "miami", "-w", "0"])
+
+    assert exc_info.value.code == 1
+    assert "Corrupt compressed input (gzip)" in capsys.readouterr().err
+
+
+def test_errors(tmp_path, capsys):
+    """Test invalid records, unknown mappers, and --list-mappers."""
+    (tmp_path / "0.xml").write_text(
+        GET_RECORD.format(RECORD.format(0)), encoding="utf-8"
+    )
+    (tmp_path / "1.xml").write_text("<OAI-PMH>", encoding="utf-8")
+
+    with pytest.raises(SystemExit) as exc_info:
+        main(["-m", "miami", "-w", "0", str(tmp_path)])
+    assert exc_info.value.code == 1
+    captured = capsys.readouterr()
+    assert read_ndjson(captured.out) == expected_metadata(0)
+    assert "1.xml" in captured.err
+
+    with pytest.raises(SystemExit) as exc_info:
+        main(["-m", "unknown", str(tmp_path)])
+    assert exc_info.value.code == 2
+
+    with pytest.raises(SystemExit) as exc_info:
+        main(["-m", "miami", "--engine", "unknown", str(tmp_path)])
+    assert exc_info.value.code == 2
+
+    main(["--list-mappers"])
+    assert "miami" in capsys.readouterr().out.splitlines()
+
+
+def test_format(dump, tmp_path):
+    """Test the output format msgpack."""
+    pytest.importorskip("msgpack")
+    output = tmp_path / "metadata.msgpack"
+
+    main(
+        [
+            "-m", "miami", "--dump", str(dump), "-o", str(output),
+            "-w", "0", "-f", "msgpack"
+        ]
+    )
+
+    assert list(
+        MsgpackEncoder().decode(output.read_bytes())
+    ) == expected_metadata(*range(10))
+
+
+def test_store(tmp_path, capsys):
+    """Test mapping of the records of a record store."""
+    pytest.importorskip("msgpack")
+    store = tmp_path / "records.store"
+    with RecordStore(store) as record_store:
+        record_store.put_all(
+            OAIPMHMetadataConverter().iter_dicts(
+                LIST_RECORDS.format(
+                    "".join(RECORD.format(i) for i in range(10))
+                )
+            )
+        )
+
+    main(["-m", "miami", "--store", str(store), "-w", "0"])
+
+    assert read_ndjson(capsys.readouterr().out) == expected_metadata(
+        *range(10)
+    )
+
+
+def test_store_errors(tmp_path, capsys):
+    """Test missing and stale record stores."""
+    pytest.importorskip("msgpack")
+    missing = tmp_path / "missing.store"
+    with pytest.raises(SystemExit) as exc_info:
+        main(["-m", "miami", "--store", str(missing), "-w", "0"])
+    assert exc_info.value.code == 1
+    assert "FileNotFoundError" in capsys.readouterr().err
+    assert not missing.exists()
+
+    store = tmp_path / "records.store"
+    with RecordStore(store) as record_store:
+        record_store.put_all(
+            OAIPMHMetadataConverter().iter_dicts(
+                LIST_RECORDS.format(RECORD.format(0))
+            )
+        )
+    manifest = json.loads((store / MANIFEST).read_text(encoding="utf-8"))
+    manifest["specversion"] = [0, 0, 0, ""]
+    (store / MANIFEST).write_text(json.dumps(manifest), encoding="utf-8")
+    with pytest.raises(SystemExit) as exc_info:
+        main(["-m", "miami", "--store", str(store), "-w", "0"])
+    assert exc_info.value.code == 1
+    captured = capsys.readouterr()
+    assert captured.out == ""
+    assert "ValueError" in captured.err
+
+
+@pytest.mark.parametrize("staged", [False, True])
+def test_unmatched(tmp_path, capsys, staged):
+    """Test sources that match no file."""
+    (tmp_path / "0.xml").write_text(
+        GET_RECORD.format(RECORD.format(0)), encoding="utf-8"
+    )
+
+    with pytest.raises(SystemExit) as exc_info:
+        main(
+            ["-m", "miami", "-w", "0"] + (["--staged"] if staged else [])
+            + [
+                str(tmp_path / "missing.xml"), str(tmp_path / "0.xml"),
+                str(tmp_path / "nomatch*.xml")
+            ]
+        )
+    assert exc_info.value.code == 1
+    captured = capsys.readouterr()
+    assert read_ndjson(captured.out) == expected_metadata(0)
+    assert "missing.xml" in captured.err
+    assert "nomatch*.xml" in captured.err
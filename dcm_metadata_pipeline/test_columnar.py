@@ -0,0 +1,147 @@
+"""
+Test suite for the columnar batch-mapping.
+"""
+import pytest
+from lzvnrw_converter.compact import freeze
+from lzvnrw_converter.oaipmh_converter import OAIPMHMetadataConverter
+from lzvnrw_mapper.miami import MiamiMetadataMapper
+from dcm_metadata_mapper.mapper_factory import generate_metadata_mapper_class
+from dcm_metadata_pipeline.columnar import ColumnarMapper
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+LIST_RECORDS = """<OAI-PMH>
+    <ListRecords>
+        {}
+    </ListRecords>
+</OAI-PMH>
+"""
+RECORD = """<record>
+            <header>
+                <identifier>oai:wwu.de:{index}</identifier>
+            </header>
+            <metadata>
+                <oai_dc:dc>
+                    <dc:title xml:lang="de">Title {index}</dc:title>
+                    {creators}
+                    <dc:identifier>
+                        https://repositorium.uni-muenster.de/transfer/miami/{index}.pdf
+                    </dc:identifier>
+                </oai_dc:dc>
+            </metadata>
+        </record>"""
+DELETED_RECORD = """<record>
+            <header status="deleted">
+                <identifier>oai:wwu.de:{index}</identifier>
+            </header>
+        </record>"""
+
+
+@pytest.fixture(name="records")
+def get_records():
+    """Returns a list of converted records."""
+    return list(
+        OAIPMHMetadataConverter().iter_dicts(
+            LIST_RECORDS.format(
+                "".join(
+                    DELETED_RECORD.format(index=index) if index % 4 == 3
+                    else RECORD.format(
+                        index=index,
+                        creators="".join(
+                            f"<dc:creator>Creator {i}</dc:creator>"
+                            for i in range(index % 3)
+                        )
+                    )
+                    for index in range(10)
+                )
+            )
+        )
+    )
+
+
+def test_to_table(records):
+    """Test the table of mapped records."""
+    mapper = MiamiMetadataMapper()
+    table = ColumnarMapper(mapper).to_table(records)
+
+    assert table.num_rows == 10
+    assert table.column_names == list(mapper.get_all_metadata(records[0]))
+    assert table.schema.field("dc-creator").type == pa.list_(pa.string())
+    assert table.schema.field("external-identifier").type == pa.string()
+
+    rows = table.to_pylist()
+    assert rows[0]["dc-creator"] is None
+    assert rows[1]["dc-creator"] == ["Creator 0"]
+    assert rows[2]["dc-creator"] == ["Creator 0", "Creator 1"]
+    assert rows[2]["dc-title"] == ["Title 2"]
+    assert rows[2]["transfer-urls"] == [
+        "https://repositorium.uni-muenster.de/transfer/miami/2.pdf"
+    ]
+    assert rows[3]["external-identifier"] == "3"
+    assert rows[3]["dc-title"] is None
+    assert rows[3]["source-organization"] \
+        == mapper.get_all_metadata(records[3])["source-organization"]
+
+
+def test_empty_table():
+    """Test the table of an empty iterable of records."""
+    table = ColumnarMapper(MiamiMetadataMapper()).to_table([])
+    assert table.num_rows == 0
+    assert "dc-creator" in table.column_names
+
+
+def test_keys_and_list_keys(records):
+    """Test selection of columns and list-columns."""
+    table = ColumnarMapper(
+        MiamiMetadataMapper(),
+        list_keys=["DC-Title"],
+        keys=["External-Identifier", "dc-title"],
+    ).to_table(records)
+
+    assert table.column_names == ["external-identifier", "dc-title"]
+    assert table.column("dc-title").to_pylist()[0] == ["Title 0"]
+
+    with pytest.raises(ValueError):
+        ColumnarMapper(
+            MiamiMetadataMapper(), list_keys=[], keys=["dc-creator"]
+        ).to_table(records)
+
+
+def test_nonlinear_values():
+    """Test conversion of values that are no strings."""
+    mapper = generate_metadata_mapper_class(
+        "Columnar Mapper",
+        (0, 0, 0, ""),
+        {"a": {"path": ["a"]}},
+        {"b": lambda source_metadata: len(source_metadata)},
+    )()
+    table = ColumnarMapper(mapper, list_keys=["a"]).to_table(
+        [{"a": [{"x": 1}, None]}]
+    )
+    assert table.to_pylist() == [{"a": ['{"x": 1}', None], "b": "1"}]
+
+    # compact records (tuples and CompactNodes)
+    table = ColumnarMapper(mapper, list_keys=["a"]).to_table(
+        [freeze({"a": [{"x": [1, 2]}, {"#text": "y"}]})]
+    )
+    assert table.to_pylist() == [
+        {"a": ['{"x": [1, 2]}', "y"], "b": "1"}
+    ]
+
+
+def test_write_parquet(tmp_path, records):
+    """Test writing a Parquet-file in row groups."""
+    columnar = ColumnarMapper(MiamiMetadataMapper())
+
+    assert columnar.write_parquet(
+        records, tmp_path / "records.parquet", row_group_size=4
+    ) == 10
+
+    file = pq.ParquetFile(tmp_path / "records.parquet")
+    assert file.metadata.num_row_groups == 3
+    assert file.read().equals(columnar.to_table(records))
+
+    assert columnar.write_parquet([], tmp_path / "empty.parquet") == 0
+    assert pq.read_table(tmp_path / "empty.parquet").num_rows == 0
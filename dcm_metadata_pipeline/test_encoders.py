@@ -0,0 +1,110 @@
+"""
+Test suite for the encoders of mapped metadata.
+"""
+from io import BytesIO
+
+import pytest
+from lzvnrw_converter.compact import freeze
+from dcm_metadata_pipeline.encoders import \
+    ENCODERS, Encoder, JSONEncoder, OrjsonEncoder, RecordWriter, \
+    get_encoder
+
+
+RECORDS = [
+    {
+        "external-identifier": str(i),
+        "dc-title": {"@xml:lang": "de", "#text": f"Überprüfung {i}"},
+        "dc-creator": ["Mustermann, M.", "Musterfrau, M."],
+        "dc-rights": None,
+        "transfer-urls": [],
+    }
+    for i in range(100)
+]
+
+
+def require(name: str) -> None:
+    """
+    Skips the test if the optional package of the encoder `name` (named
+    like the encoder) is missing.
+    """
+    if name != JSONEncoder.NAME:
+        pytest.importorskip(name)
+
+
+class CountingOutput(BytesIO):
+    """BytesIO that counts write-calls."""
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, b):
+        self.writes += 1
+        return super().write(b)
+
+
+@pytest.mark.parametrize("name", list(ENCODERS))
+def test_roundtrip(name):
+    """Test encoding and decoding of records with every encoder."""
+    require(name)
+    encoder = get_encoder(name)
+    data = b"".join(encoder.encode(record) for record in RECORDS)
+    assert list(encoder.decode(data)) == RECORDS
+    # compact records are encoded like dictionaries
+    assert encoder.encode(freeze(RECORDS[0])) == encoder.encode(RECORDS[0])
+    with pytest.raises(TypeError):
+        encoder.encode({"key": object()})
+
+
+def test_json_encoders_identical():
+    """Assert that json and orjson produce identical output."""
+    require("orjson")
+    for record in RECORDS:
+        assert JSONEncoder().encode(record) == OrjsonEncoder().encode(record)
+
+
+def test_get_encoder():
+    """Test the lookup of encoders."""
+    try:
+        import orjson  # pylint: disable=import-outside-toplevel, unused-import
+    except ImportError:
+        assert type(get_encoder()) is JSONEncoder
+    else:
+        assert isinstance(get_encoder(), OrjsonEncoder)
+    assert isinstance(get_encoder("json"), JSONEncoder)
+    with pytest.raises(ValueError):
+        get_encoder("unknown")
+
+
+def test_encoder_abstract():
+    """Test that encoders have to implement encode and decode."""
+
+    class IncompleteEncoder(Encoder):
+        """Encoder without decode."""
+        def encode(self, record):
+            return b""
+
+    with pytest.raises(TypeError):
+        Encoder()  # pylint: disable=abstract-class-instantiated
+    with pytest.raises(TypeError):
+        IncompleteEncoder()  # pylint: disable=abstract-class-instantiated
+
+
+@pytest.mark.parametrize("name", list(ENCODERS))
+def test_record_writer(name):
+    """Test batched writes of the RecordWriter."""
+    require(name)
+    output = CountingOutput()
+    size = len(get_encoder(name).encode(RECORDS[0]))
+    with RecordWriter(output, name, buffer_size=10 * size) as writer:
+        writer.write_all(RECORDS)
+        assert writer.records == 100
+        # every write-call contains multiple (about 10) records
+        assert 0 < output.writes < 20
+    assert list(get_encoder(name).decode(output.getvalue())) == RECORDS
+
+    # records larger than the buffer are written directly
+    output = CountingOutput()
+    with RecordWriter(output, name, buffer_size=size // 2) as writer:
+        writer.write_all(RECORDS[:3])
+    assert output.writes == 3
+    assert list(get_encoder(name).decode(output.getvalue())) == RECORDS[:3]
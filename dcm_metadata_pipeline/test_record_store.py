@@ -0,0 +1,189 @@
+"""
+Test suite for the record store.
+"""
+import json
+
+import pytest
+from lzvnrw_converter.oaipmh_converter import OAIPMHMetadataConverter
+from lzvnrw_mapper.miami import MiamiMetadataMapper
+from dcm_metadata_pipeline.bulk import map_store
+from dcm_metadata_pipeline.record_store import \
+    MANIFEST, RecordStore, read_chunk
+
+pytest.importorskip("msgpack")
+
+
+LIST_RECORDS = """<OAI-PMH>
+    <ListRecords>
+        {}
+    </ListRecords>
+</OAI-PMH>
+"""
+RECORD = """<record>
+            <header>
+                <identifier>oai:wwu.de:{index}</identifier>
+            </header>
+            <metadata>
+                <oai_dc:dc>
+                    <dc:title>{title}</dc:title>
+                    <dc:creator>Mustermann, M.</dc:creator>
+                </oai_dc:dc>
+            </metadata>
+        </record>"""
+
+
+def get_records(number: int, title: str = "a") -> list[dict]:
+    """Returns `number` converted records."""
+    return list(
+        OAIPMHMetadataConverter().iter_dicts(
+            LIST_RECORDS.format(
+                "".join(
+                    RECORD.format(index=i, title=title)
+                    for i in range(number)
+                )
+            )
+        )
+    )
+
+
+@pytest.fixture(name="records")
+def get_records_fixture():
+    """Returns a list of converted records."""
+    return get_records(10)
+
+
+def test_put_get(tmp_path, records):
+    """Test storing and loading records."""
+    with RecordStore(tmp_path) as store:
+        store.put_all(records)
+        assert len(store) == 10
+        assert "oai:wwu.de:3" in store
+        assert store.get("oai:wwu.de:3") == records[3]
+        assert store.get("unknown") is None
+    assert (tmp_path / MANIFEST).is_file()
+
+    with RecordStore(tmp_path) as store:
+        assert store.identifiers() == [f"oai:wwu.de:{i}" for i in range(10)]
+        assert list(store) == [
+            (f"oai:wwu.de:{i}", record) for i, record in enumerate(records)
+        ]
+
+
+def test_put_identifier(tmp_path):
+    """Test storing records with explicit or missing identifiers."""
+    with RecordStore(tmp_path) as store:
+        store.put({"a": "b"}, identifier="id")
+        assert store.get("id") == {"a": "b"}
+        with pytest.raises(ValueError):
+            store.put({"a": "b"})
+
+
+def test_supersede_delete(tmp_path, records):
+    """Test that records are superseded by later versions."""
+    with RecordStore(tmp_path) as store:
+        store.put_all(records)
+        store.put_all(get_records(2, "b"))
+        store.delete("oai:wwu.de:5")
+        store.delete("unknown")
+
+    with RecordStore(tmp_path) as store:
+        assert len(store) == 9
+        assert "oai:wwu.de:5" not in store
+        assert store.get("oai:wwu.de:0") == get_records(1, "b")[0]
+        stored = dict(store)
+        assert len(stored) == 9
+        assert stored["oai:wwu.de:1"]["metadata"]["oai_dc:dc"][
+            "dc:title"
+        ] == "b"
+        # superseded versions remain in the chunk
+        path, offsets = store.chunks()[0]
+        assert len(list(read_chunk(path))) == 12
+        assert len(offsets) == 9
+
+
+def test_chunks(tmp_path, records):
+    """Test splitting of the store into multiple chunk-files."""
+    with RecordStore(tmp_path, chunk_size=300) as store:
+        store.put_all(records)
+        store.put_all(get_records(1, "b"))
+    assert len(list(tmp_path.glob("*.msgpack"))) > 2
+
+    with RecordStore(tmp_path) as store:
+        assert len(store.chunks()) > 2
+        assert sum(len(offsets) for _, offsets in store.chunks()) == 10
+        assert dict(store) == {
+            f"oai:wwu.de:{i}": record
+            for i, record in enumerate(get_records(1, "b") + records[1:])
+        }
+
+
+def test_uncommitted(tmp_path, records):
+    """Test that uncommitted records are discarded."""
+    with RecordStore(tmp_path) as store:
+        store.put_all(records[:5])
+    store = RecordStore(tmp_path)
+    store.put_all(records[5:])
+    store._flush()  # pylint: disable=protected-access
+
+    with RecordStore(tmp_path) as store:
+        assert len(store) == 5
+        store.put(records[5])
+    with RecordStore(tmp_path) as store:
+        assert len(store) == 6
+        assert dict(store)["oai:wwu.de:5"] == records[5]
+
+
+def test_specversion(tmp_path, records):
+    """Test handling of stores written by another converter-version."""
+    with RecordStore(tmp_path) as store:
+        store.put_all(records)
+    manifest = json.loads((tmp_path / MANIFEST).read_text(encoding="utf-8"))
+    manifest["specversion"] = [0, 0, 0, ""]
+    (tmp_path / MANIFEST).write_text(json.dumps(manifest), encoding="utf-8")
+
+    with pytest.raises(ValueError):
+        RecordStore(tmp_path)
+    with RecordStore(tmp_path, discard_stale=True) as store:
+        assert len(store) == 0
+        store.put(records[0])
+    with RecordStore(tmp_path) as store:
+        assert len(store) == 1
+
+
+def test_create(tmp_path, records):
+    """Test that reading requires an existing store."""
+    with pytest.raises(FileNotFoundError):
+        RecordStore(tmp_path / "missing", create=False)
+    assert not (tmp_path / "missing").exists()
+    with pytest.raises(FileNotFoundError):
+        list(map_store(tmp_path / "missing", "miami", workers=0))
+    with pytest.raises(FileNotFoundError):
+        RecordStore(tmp_path, create=False)
+
+    with RecordStore(tmp_path) as store:
+        store.put_all(records)
+    with RecordStore(tmp_path, create=False) as store:
+        assert len(store) == 10
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_map_store(tmp_path, records, workers):
+    """
+    Assert that the results of map_store match those of a direct
+    mapping of the records.
+    """
+    with RecordStore(tmp_path, chunk_size=300) as store:
+        store.put_all(records)
+        store.delete("oai:wwu.de:2")
+    mapper = MiamiMetadataMapper()
+
+    results = list(map_store(tmp_path, "miami", workers=workers))
+
+    assert len(results) == 9
+    assert [result.metadata for result in results] == [
+        mapper.get_all_metadata(record)
+        for i, record in enumerate(records)
+        if i != 2
+    ]
+    assert all(result.error is None for result in results)
+    assert all(result.path.endswith(".msgpack") for result in results)
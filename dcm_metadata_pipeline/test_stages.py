@@ -0,0 +1,143 @@
+"""
+Test suite for the staged pipeline.
+"""
+from time import sleep
+
+import pytest
+from dcm_metadata_pipeline.stages import Stage, StagedPipeline
+
+
+def square(value: int) -> int:
+    """Returns the square of `value` (picklable stage-function)."""
+    return value * value
+
+
+def odd(value: int) -> int | None:
+    """Returns `value` if it is odd and None otherwise."""
+    return value if value % 2 else None
+
+
+def slow(value: int) -> int:
+    """Returns `value` (delayed for multiples of 7)."""
+    if value % 7 == 0:
+        sleep(0.02)
+    return value
+
+
+def fail(value: int) -> int:
+    """Raises a ValueError for 13."""
+    if value == 13:
+        raise ValueError("bad value")
+    return value
+
+
+@pytest.mark.parametrize("processes", [False, True])
+def test_run(processes):
+    """Test running items through multiple stages."""
+    pipeline = StagedPipeline(
+        [
+            Stage("odd", odd, 2),
+            Stage("square", square, 3, processes=processes, batch_size=4),
+        ],
+        queue_size=4
+    )
+    assert sorted(pipeline.run(range(100))) == [
+        i * i for i in range(100) if i % 2
+    ]
+    stats = {stage.name: stage for stage in pipeline.stats()}
+    assert list(stats) == ["odd", "square", StagedPipeline.OUTPUT]
+    assert stats["odd"].processed == 100
+    assert stats["square"].processed == 50
+    assert stats["output"].processed == 50
+    assert stats["square"].workers == 3
+    assert all(stage.queue_depth == 0 for stage in stats.values())
+    assert all(
+        stage.max_queue_depth <= stage.queue_size for stage in stats.values()
+    )
+    assert stats["odd"].throughput > 0
+
+
+@pytest.mark.parametrize("processes", [False, True])
+def test_run_ordered(processes):
+    """Test that results are returned in the order of the source."""
+    pipeline = StagedPipeline(
+        [
+            Stage("odd", odd, 3),
+            Stage("slow", slow, 4, processes=processes, batch_size=2),
+        ],
+        queue_size=2
+    )
+    assert list(pipeline.run(range(100))) == [
+        i for i in range(100) if i % 2
+    ]
+    assert pipeline.stats()[1].processed == 50
+
+    # order of completion
+    results = list(pipeline.run(range(100), ordered=False))
+    assert sorted(results) == [i for i in range(100) if i % 2]
+    assert results != sorted(results)
+
+
+def test_backpressure():
+    """
+    Assert that a slow consumer blocks the pipeline instead of letting
+    items accumulate.
+    """
+    produced = []
+
+    def source():
+        for i in range(1000):
+            produced.append(i)
+            yield i
+
+    pipeline = StagedPipeline(
+        [Stage("a", square), Stage("b", square, batch_size=2)],
+        queue_size=2
+    )
+    results = pipeline.run(source())
+    for _ in range(5):
+        next(results)
+        sleep(0.05)
+    # queues (3 x 2 items), items in the workers (1 + 2), and the item
+    # blocked in the feeder
+    assert len(produced) <= 5 + 3 * 2 + 3 + 1
+    assert pipeline.stats()[-1].max_queue_depth <= 2
+    results.close()
+    assert len(produced) < 1000
+
+
+def test_error():
+    """Test that exceptions of stages are re-raised by run."""
+    pipeline = StagedPipeline([Stage("fail", fail, 2)])
+    with pytest.raises(ValueError, match="bad value"):
+        list(pipeline.run(range(100)))
+
+
+def test_source_error():
+    """Test that exceptions of the source are re-raised by run."""
+    def source():
+        yield 1
+        raise KeyError("source")
+
+    with pytest.raises(KeyError):
+        list(StagedPipeline([Stage("square", square)]).run(source()))
+
+
+def test_invalid_stages():
+    """Test validation of the stages."""
+    with pytest.raises(ValueError):
+        StagedPipeline([])
+    with pytest.raises(ValueError):
+        StagedPipeline([Stage("a", square), Stage("a", square)])
+    with pytest.raises(ValueError):
+        StagedPipeline([Stage(StagedPipeline.OUTPUT, square)])
+    with pytest.raises(ValueError):
+        StagedPipeline([Stage("a", square, workers=0)])
+
+
+def test_rerun():
+    """Test that pipelines can be run repeatedly."""
+    pipeline = StagedPipeline([Stage("square", square, 2)])
+    assert sorted(pipeline.run(range(10))) == [i * i for i in range(10)]
+    assert sorted(pipeline.run(range(5))) == [i * i for i in range(5)]
+    assert pipeline.stats()[0].processed == 5
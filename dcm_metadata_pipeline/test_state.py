@@ -0,0 +1,273 @@
+"""
+Test suite for the record state index.
+"""
+import sqlite3
+
+import pytest
+from lzvnrw_converter.compact import freeze
+from lzvnrw_converter.oaipmh_converter import OAIPMHMetadataConverter
+from lzvnrw_mapper.miami import MiamiMetadataMapper
+from dcm_metadata_pipeline.state import \
+    RecordState, RecordStateIndex, record_hash, record_header, \
+    mapper_version, projection
+
+
+LIST_RECORDS = """<OAI-PMH>
+    <ListRecords>
+        {}
+    </ListRecords>
+</OAI-PMH>
+"""
+RECORD = """<record>
+            <header>
+                <identifier>oai:wwu.de:{index}</identifier>
+                <datestamp>{datestamp}</datestamp>
+            </header>
+            <metadata>
+                <oai_dc:dc>
+                    <dc:title>{title}</dc:title>
+                </oai_dc:dc>
+            </metadata>
+        </record>"""
+DELETED_RECORD = """<record>
+            <header status="deleted">
+                <identifier>oai:wwu.de:{index}</identifier>
+                <datestamp>{datestamp}</datestamp>
+            </header>
+        </record>"""
+
+
+def get_records(*records: str) -> list[dict]:
+    """Returns the converted records of a ListRecords-response."""
+    return list(
+        OAIPMHMetadataConverter().iter_dicts(
+            LIST_RECORDS.format("".join(records))
+        )
+    )
+
+
+@pytest.fixture(name="mapper")
+def get_mapper():
+    """Returns a mapper-instance."""
+    return MiamiMetadataMapper()
+
+
+def test_record_header():
+    """Test record_header."""
+    assert record_header(
+        get_records(RECORD.format(index=0, datestamp="2024", title="a"))[0]
+    ) == ("oai:wwu.de:0", "2024", False)
+    assert record_header(
+        get_records(DELETED_RECORD.format(index=0, datestamp="2024"))[0]
+    ) == ("oai:wwu.de:0", "2024", True)
+    assert record_header({}) == (None, None, False)
+    # compact records
+    assert record_header(
+        freeze(
+            get_records(DELETED_RECORD.format(index=0, datestamp="2024"))[0]
+        )
+    ) == ("oai:wwu.de:0", "2024", True)
+
+
+def test_record_hash():
+    """Test that record_hash depends on the content only."""
+    record = RECORD.format(index=0, datestamp="2024", title="a")
+    assert record_hash(get_records(record)[0]) \
+        == record_hash(
+            OAIPMHMetadataConverter().get_dict(
+                f"<OAI-PMH><GetRecord>{record}</GetRecord></OAI-PMH>"
+            )
+        )
+    assert record_hash(get_records(record)[0]) != record_hash(
+        get_records(RECORD.format(index=0, datestamp="2024", title="b"))[0]
+    )
+    assert record_hash(freeze(get_records(record)[0])) \
+        == record_hash(get_records(record)[0])
+
+
+def test_update_records(mapper):
+    """Test the detection of new, changed, and deleted records."""
+    index = RecordStateIndex()
+
+    updates = list(
+        index.update_records(
+            get_records(
+                RECORD.format(index=0, datestamp="2024-01", title="a"),
+                RECORD.format(index=1, datestamp="2024-01", title="b"),
+                DELETED_RECORD.format(index=2, datestamp="2024-01"),
+            ),
+            mapper
+        )
+    )
+    assert [(u.identifier, u.status) for u in updates] == [
+        ("oai:wwu.de:0", "new"),
+        ("oai:wwu.de:1", "new"),
+        ("oai:wwu.de:2", "deleted"),
+    ]
+    assert updates[0].metadata["dc-title"] == "a"
+    # deleted records are mapped like in test_mapper_factory
+    assert updates[2].metadata["external-identifier"] == "2"
+    assert updates[2].metadata["dc-title"] is None
+
+    updates = list(
+        index.update_records(
+            get_records(
+                RECORD.format(index=0, datestamp="2024-01", title="a"),
+                RECORD.format(index=1, datestamp="2024-02", title="c"),
+                DELETED_RECORD.format(index=2, datestamp="2024-01"),
+                DELETED_RECORD.format(index=0, datestamp="2024-03"),
+            ),
+            mapper,
+            batch_size=2
+        )
+    )
+    assert [(u.identifier, u.status) for u in updates] == [
+        ("oai:wwu.de:1", "changed"),
+        ("oai:wwu.de:0", "deleted"),
+    ]
+    assert index.get(mapper.MAPPER_TAG, "oai:wwu.de:1") \
+        .metadata["dc-title"] == "c"
+    assert index.last_datestamp(mapper.MAPPER_TAG) == "2024-03"
+    assert index.last_datestamp("other") is None
+    assert [s.deleted for s in index.states(mapper.MAPPER_TAG)] \
+        == [True, False, True]
+
+
+def test_update_records_without_identifier(mapper):
+    """Test update_record for a record without identifier."""
+    with pytest.raises(ValueError):
+        RecordStateIndex().update_record({"header": None}, mapper)
+
+
+def test_is_current():
+    """Test is_current."""
+    index = RecordStateIndex()
+    index.put("tag", RecordState("a", "2024", "hash", False))
+
+    assert index.is_current("tag", "a", "2024")
+    assert not index.is_current("tag", "a", "2024", deleted=True)
+    assert not index.is_current("tag", "a", "2025")
+    assert not index.is_current("tag", "a", None)
+    assert not index.is_current("other", "a", "2024")
+    assert not index.is_current("tag", "b", "2024")
+
+
+def test_persistence(tmp_path, mapper):
+    """Test that the index persists between instances."""
+    records = get_records(
+        RECORD.format(index=0, datestamp="2024", title="a")
+    )
+    with RecordStateIndex(tmp_path / "state.sqlite") as index:
+        assert len(list(index.update_records(records, mapper))) == 1
+
+    with RecordStateIndex(tmp_path / "state.sqlite") as index:
+        assert list(index.update_records(records, mapper)) == []
+        assert index.get(mapper.MAPPER_TAG, "oai:wwu.de:0") == RecordState(
+            "oai:wwu.de:0",
+            "2024",
+            record_hash(records[0]),
+            False,
+            mapper.get_all_metadata(records[0]),
+            mapper_version(mapper),
+        )
+
+
+def test_projection(mapper):
+    """
+    Test that switching between projected and full conversion does not
+    report unchanged records.
+    """
+    record = RECORD.format(index=0, datestamp="2024", title="a")
+    paths = mapper.SOURCE_PATHS + (("header",),)
+    projected = list(
+        OAIPMHMetadataConverter().iter_dicts(
+            LIST_RECORDS.format(record), paths=paths
+        )
+    )
+    assert projection(paths) == projection(reversed(paths))
+    assert projection(None) is None
+
+    index = RecordStateIndex()
+    assert len(list(index.update_records(get_records(record), mapper))) == 1
+    assert list(index.update_records(projected, mapper, paths=paths)) == []
+    assert index.get(mapper.MAPPER_TAG, "oai:wwu.de:0").projection \
+        == projection(paths)
+    assert list(index.update_records(projected, mapper, paths=paths)) == []
+    assert list(index.update_records(get_records(record), mapper)) == []
+
+    # changed content is still detected
+    changed = get_records(RECORD.format(index=0, datestamp="2025", title="b"))
+    assert [u.status for u in index.update_records(changed, mapper)] \
+        == ["changed"]
+
+
+def test_mapper_version(mapper):
+    """Test that records of another mapper version are mapped again."""
+
+    class Mapper(MiamiMetadataMapper):
+        """Mapper with another specversion."""
+        _SPECVERSION = (9, 9, 9, "")
+
+    class TitleMapper(MiamiMetadataMapper):
+        """Mapper with another specversion and mapping of the title."""
+        _SPECVERSION = (9, 9, 10, "")
+
+        def get_all_metadata(self, source_metadata):
+            metadata = super().get_all_metadata(source_metadata)
+            metadata["dc-title"] = "new"
+            return metadata
+
+    records = get_records(RECORD.format(index=0, datestamp="2024", title="a"))
+    index = RecordStateIndex()
+    assert len(list(index.update_records(records, mapper))) == 1
+    assert index.is_current(mapper.MAPPER_TAG, "oai:wwu.de:0", "2024")
+    assert index.is_current(
+        mapper.MAPPER_TAG, "oai:wwu.de:0", "2024", mapper=mapper
+    )
+    assert not index.is_current(
+        mapper.MAPPER_TAG, "oai:wwu.de:0", "2024", mapper=Mapper()
+    )
+    assert index.last_datestamp(mapper.MAPPER_TAG, mapper) == "2024"
+    assert index.last_datestamp(mapper.MAPPER_TAG, Mapper()) is None
+
+    # another version with identical metadata is not reported
+    assert list(index.update_records(records, Mapper())) == []
+    assert index.get(mapper.MAPPER_TAG, "oai:wwu.de:0").mapper_version \
+        == mapper_version(Mapper())
+
+    updates = list(index.update_records(records, TitleMapper()))
+    assert [(u.status, u.metadata["dc-title"]) for u in updates] \
+        == [("changed", "new")]
+    assert index.get(mapper.MAPPER_TAG, "oai:wwu.de:0") \
+        .metadata["dc-title"] == "new"
+    assert list(index.update_records(records, TitleMapper())) == []
+
+
+def test_migration(tmp_path, mapper):
+    """Test opening a database without mapper version and projection."""
+    path = tmp_path / "state.sqlite"
+    connection = sqlite3.connect(path)
+    connection.execute(
+        """CREATE TABLE records (
+            mapper_tag TEXT NOT NULL,
+            identifier TEXT NOT NULL,
+            datestamp TEXT,
+            content_hash TEXT,
+            deleted INTEGER NOT NULL,
+            metadata TEXT,
+            PRIMARY KEY (mapper_tag, identifier)
+        )"""
+    )
+    connection.execute(
+        "INSERT INTO records VALUES (?, 'a', '2024', 'hash', 0, NULL)",
+        (mapper.MAPPER_TAG,)
+    )
+    connection.commit()
+    connection.close()
+
+    with RecordStateIndex(path) as index:
+        assert index.get(mapper.MAPPER_TAG, "a") \
+            == RecordState("a", "2024", "hash", False)
+        assert not index.is_current(
+            mapper.MAPPER_TAG, "a", "2024", mapper=mapper
+        )
@@ -0,0 +1,105 @@
+"""
+Compact, read-only representation of converted records.
+
+Compared to the dictionaries of the XML-engines, compact records
+* store the children of an element in a `__slots__`-based node with a
+  tuple of values,
+* share the (interned) element-names and their index between all nodes
+  with the same names (e.g. all headers of all records), and
+* represent repeated elements as tuples instead of lists.
+
+Compact records support the read-only access of the mappers (item
+access, `in`, `get`, iteration; see collections.abc.Mapping) and
+compare equal to the corresponding dictionaries (except for tuples of
+repeated elements, see thaw).
+"""
+
+from typing import Any
+from collections.abc import Mapping
+import sys
+
+
+# maximum number of shared name-indices (further indices are not
+# shared but created per node)
+MAX_SHARED_INDICES = 4096
+_indices: dict[tuple[str, ...], dict[str, int]] = {}
+
+
+class CompactNode(Mapping):
+    """
+    Read-only mapping of element-names to values (see module
+    docstring).
+
+    Keyword arguments:
+    index -- (shared) dictionary of names and positions in `values`
+    values -- tuple of values
+    """
+
+    __slots__ = ("_index", "_values")
+
+    def __init__(self, index: dict[str, int], values: tuple) -> None:
+        self._index = index
+        self._values = values
+
+    def __getitem__(self, key: str) -> Any:
+        return self._values[self._index[key]]
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self._index
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __repr__(self) -> str:
+        return f"CompactNode({dict(self)!r})"
+
+    def __reduce__(self):
+        return freeze, (thaw(self),)
+
+
+def freeze(value: Any) -> Any:
+    """
+    Returns the compact representation of a converted record (or any
+    value therein; see module docstring).
+
+    Keyword arguments:
+    value -- converted record (see OAIPMHMetadataConverter.get_dict)
+    """
+    if value.__class__ is dict or isinstance(value, Mapping):
+        return CompactNode(
+            _get_index(tuple(value)),
+            tuple(freeze(item) for item in value.values())
+        )
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value: Any) -> Any:
+    """
+    Returns the dictionary-representation of a compact record (or any
+    value therein, e.g. a mapped value), i.e. the inverse of freeze.
+
+    Keyword arguments:
+    value -- compact record or value
+    """
+    if isinstance(value, Mapping):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [thaw(item) for item in value]
+    return value
+
+
+def _get_index(names: tuple[str, ...]) -> dict[str, int]:
+    """Returns the shared index for the given element-names."""
+    index = _indices.get(names)
+    if index is None:
+        names = tuple(sys.intern(name) for name in names)
+        index = {name: i for i, name in enumerate(names)}
+        if len(_indices) < MAX_SHARED_INDICES:
+            index = _indices.setdefault(names, index)
+    return index
+
@@ -0,0 +1,158 @@
+"""
+Transparent streaming decompression of gzip- and zstd-compressed input
+for the converter. The compression is detected by the magic number at
+the start of the input (XML-documents cannot start with these bytes).
+
+Decompression of zstd requires the package zstandard (install with
+'pip install dcm-metadata-mapper[zstd]').
+"""
+
+from typing import Any, Optional, Iterable, Iterator, IO
+import gzip
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# errors of the decompression-objects (corrupt input)
+DECOMPRESSION_ERRORS = (zlib.error,) + (
+    (zstandard.ZstdError,) if zstandard is not None else ()
+)
+
+
+# magic numbers of the supported compressions
+MAGIC_NUMBERS = {
+    "gzip": b"\x1f\x8b",
+    "zstd": b"\x28\xb5\x2f\xfd",
+}
+# file name-suffixes of the supported compressions
+SUFFIXES = {
+    ".gz": "gzip",
+    ".zst": "zstd",
+}
+
+
+def detect_compression(
+    head: bytes | bytearray | memoryview
+) -> Optional[str]:
+    """
+    Returns the name of the compression ("gzip" or "zstd") of data
+    starting with `head` or None if the data is not compressed.
+
+    Keyword arguments:
+    head -- first bytes of the data (at least four bytes if available)
+    """
+    for compression, magic_number in MAGIC_NUMBERS.items():
+        if bytes(head[:len(magic_number)]) == magic_number:
+            return compression
+    return None
+
+
+def open_compressed(fileobj: IO[bytes], compression: str) -> IO[bytes]:
+    """
+    Returns a binary file-object that decompresses `fileobj` while it
+    is read (concatenated gzip-members or zstd-frames are decompressed
+    as one stream).
+
+    Keyword arguments:
+    fileobj -- compressed binary file-object
+    compression -- name of the compression ("gzip" or "zstd")
+    """
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=fileobj, mode="rb")
+    if compression == "zstd":
+        return _zstd().ZstdDecompressor().stream_reader(
+            fileobj, read_across_frames=True
+        )
+    raise ValueError(f"Unknown compression '{compression}'.")
+
+
+def decompress_chunks(
+    chunks: Iterable[str | bytes],
+    compression: Optional[str] = "auto"
+) -> Iterator[str | bytes]:
+    """
+    Returns iterator over the decompressed chunks of a compressed stream
+    of `chunks`; the data is decompressed incrementally, i.e. only the
+    current chunk is held in memory. String-chunks and uncompressed
+    data are passed through. Raises EOFError for truncated and
+    ValueError for corrupt input.
+
+    Keyword arguments:
+    chunks -- iterable of chunks
+    compression -- name of the compression ("gzip" or "zstd"), "auto"
+                   to detect the compression, or None to pass all
+                   chunks through (default "auto")
+    """
+    if compression is None:
+        yield from chunks
+        return
+    chunks = iter(chunks)
+    # collect enough bytes to detect the compression
+    head = b""
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            if head:
+                yield head
+            yield chunk
+            yield from chunks
+            return
+        head += chunk
+        if len(head) >= 4:
+            break
+    if compression == "auto":
+        compression = detect_compression(head)
+        if compression is None:
+            if head:
+                yield head
+            yield from chunks
+            return
+
+    decompressor = _decompressor(compression)
+    for chunk in _prepend(head, chunks):
+        while chunk:
+            if decompressor.eof:
+                # next gzip-member or zstd-frame
+                decompressor = _decompressor(compression)
+            try:
+                data = decompressor.decompress(chunk)
+            except DECOMPRESSION_ERRORS as exc_info:
+                raise ValueError(
+                    f"Corrupt compressed input ({compression}): {exc_info}"
+                ) from exc_info
+            if data:
+                yield data
+            chunk = decompressor.unused_data if decompressor.eof else b""
+    if not decompressor.eof and head:
+        raise EOFError(
+            f"Compressed input ({compression}) ended before the "
+            + "end-of-stream marker was reached."
+        )
+
+
+def _decompressor(compression: str) -> Any:
+    """Returns a new decompression-object for `compression`."""
+    if compression == "gzip":
+        return zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+    if compression == "zstd":
+        return _zstd().ZstdDecompressor().decompressobj()
+    raise ValueError(f"Unknown compression '{compression}'.")
+
+
+def _zstd() -> Any:
+    """Returns the module zstandard (if installed)."""
+    if zstandard is None:
+        raise ImportError(
+            "Decompression of zstd requires the package 'zstandard' "
+            + "(install with 'pip install dcm-metadata-mapper[zstd]')."
+        )
+    return zstandard
+
+
+def _prepend(first: Any, iterator: Iterator[Any]) -> Iterator[Any]:
+    """Returns iterator that yields `first` before `iterator`."""
+    yield first
+    yield from iterator
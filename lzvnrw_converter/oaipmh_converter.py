@@ -3,23 +3,139 @@ Implementation of the metadata converter-interface for
 OAI-PMH repositories.
 """
 
-import xmltodict
+from typing import Any, Optional, Iterable, Sequence, IO
+from io import BytesIO
+
 from dcm_common.util import NestedDict
 
 from dcm_metadata_converter.converter_interface import ConverterInterface
+from lzvnrw_converter.oaipmh_stream import \
+    OAIPMHRecordIterator, record_projection
+from lzvnrw_converter.xml_engine import get_engine
+from lzvnrw_converter.compact import CompactNode, freeze
+from lzvnrw_converter.compression import \
+    detect_compression, open_compressed
+
+
+# path of the record in a GetRecord-response
+RECORD_PATH = ("OAI-PMH", "GetRecord", "record")
 
 
 class OAIPMHMetadataConverter(ConverterInterface):
     """
     Implementation of the source metadata to dict-converter based on the
     ConverterInterface.
+
+    Keyword arguments:
+    engine -- name of the XML-engine (see xml_engine.ENGINES); all
+              engines produce identical dictionaries, "lxml" is faster
+              but requires the package lxml (falls back to "xmltodict"
+              if not installed) (default "xmltodict")
+    instrumentation -- if given, the conversion of documents (get_dict)
+                       and records (iter_dicts) is recorded; any object
+                       with a method `wrap(operation, key, function)`
+                       (e.g. an Instrumentation, see
+                       dcm_metadata_mapper.instrumentation)
+                       (default None)
+    compact -- if True, records are returned in their compact,
+               read-only representation (see compact.CompactNode; less
+               memory but additional conversion time) (default False)
     """
 
     _SPECVERSION = (0, 3, 1, "")
     CONVERTER_TAG = "OAI-PMH Metadata Converter"
 
-    def get_dict(self, source_metadata: str) -> NestedDict:
-        full_input = xmltodict.parse(source_metadata)
+    def __init__(
+        self,
+        engine: str = "xmltodict",
+        instrumentation: Optional[Any] = None,
+        compact: bool = False
+    ) -> None:
+        self.engine = engine
+        self.instrumentation = instrumentation
+        self.compact = compact
+        self._parse = get_engine(engine)
+        if instrumentation is not None:
+            self.get_dict = instrumentation.wrap(
+                "get_dict", self.CONVERTER_TAG, self.get_dict
+            )
+
+    def get_dict(
+        self,
+        source_metadata: str | bytes,
+        paths: Optional[Iterable[Sequence[Any]]] = None,
+        compression: Optional[str] = "auto"
+    ) -> NestedDict | CompactNode:
+        """
+        Create dictionary of source metadata based on string containing
+        metadata in its source format (e.g. xml).
+
+        Returns dictionary
+
+        Keyword arguments:
+        source_metadata -- source metadata in source format
+        paths -- if given, only the subtrees of the record at these
+                 paths are converted (projected conversion; e.g. the
+                 SOURCE_PATHS of a mapper); the values at these paths
+                 are identical to those of the full conversion
+                 (default None)
+        compression -- compression of bytes-input ("gzip" or "zstd"),
+                       "auto" to detect it by its magic number, or None
+                       for uncompressed input; compressed input is
+                       decompressed while it is parsed (default "auto")
+        """
+        if compression is not None \
+                and isinstance(source_metadata, (bytes, bytearray)):
+            if compression == "auto":
+                compression = detect_compression(source_metadata[:4])
+            if compression is not None:
+                source_metadata = open_compressed(
+                    BytesIO(source_metadata), compression
+                )
+        if paths is None:
+            full_input = self._parse(source_metadata)
+        else:
+            full_input = self._parse(
+                source_metadata,
+                projection=record_projection(RECORD_PATH, paths)
+            )
+
+        record = full_input["OAI-PMH"]["GetRecord"]["record"]
+        if self.compact:
+            return freeze(record)
+        return record
+
+    def iter_dicts(
+        self,
+        source_metadata: str | bytes | IO | Iterable[str | bytes],
+        chunk_size: int = 65536,
+        paths: Optional[Iterable[Sequence[Any]]] = None,
+        compression: Optional[str] = "auto"
+    ) -> OAIPMHRecordIterator:
+        """
+        Create dictionaries of source metadata for all records in an
+        OAI-PMH response (GetRecord, ListRecords, or ListIdentifiers)
+        incrementally.
+
+        Returns an iterator of dictionaries (see OAIPMHRecordIterator);
+        after the iteration, its property `resumption_token` contains
+        the resumption token of the response (if any).
 
-        return full_input["OAI-PMH"]["GetRecord"]["record"]
-    
\ No newline at end of file
+        Keyword arguments:
+        source_metadata -- OAI-PMH response as string, bytes,
+                           file-like object, or iterable of chunks
+                           (bytes can be gzip- or zstd-compressed)
+        chunk_size -- number of bytes read from a file-like object at
+                      once (default 65536)
+        paths -- only convert the subtrees of the records at these
+                 paths (see get_dict) (default None)
+        compression -- compression of the input (see get_dict)
+                       (default "auto")
+        """
+        return OAIPMHRecordIterator(
+            source_metadata, chunk_size, engine=self.engine, paths=paths,
+            instrumentation=self.instrumentation,
+            instrumentation_key=self.CONVERTER_TAG,
+            compact=self.compact,
+            compression=compression
+        )
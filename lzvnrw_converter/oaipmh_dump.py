@@ -0,0 +1,320 @@
+"""
+Memory-mapped reader for (concatenated) OAI-PMH dumps, i.e. files that
+contain one or more OAI-PMH responses (e.g. harvested pages appended to
+each other), and a scanner for dumps that are read as a stream (e.g.
+from stdin or compressed files).
+"""
+
+from typing import Any, Optional, Callable, Iterable, Iterator, Sequence
+from pathlib import Path
+import mmap
+import re
+
+from dcm_common.util import NestedDict
+
+from lzvnrw_converter.compact import freeze
+from lzvnrw_converter.compression import detect_compression
+from lzvnrw_converter.oaipmh_stream import record_projection
+from lzvnrw_converter.xml_engine import get_engine
+
+
+# start of a record: a record-element followed by its header (which is
+# required by OAI-PMH; this distinguishes records of the OAI-PMH
+# response from record-elements in the metadata, e.g. MARC21)
+RECORD_START = re.compile(rb"<record(?:\s[^>]*)?>\s*<header[\s/>]")
+# record start- and end-tags
+RECORD_TAG = re.compile(rb"<(/?)record(?:\s[^>]*?)?(/?)>")
+
+
+class IncompleteRecordError(ValueError):
+    """
+    Raised for a record-element without end-tag (e.g. in a truncated
+    dump).
+
+    Keyword arguments:
+    offset -- byte-offset of the record
+    path -- path of the dump-file (default None)
+    """
+
+    def __init__(self, offset: int, path: Optional[str | Path] = None):
+        self.offset = offset
+        self.path = path
+        super().__init__(
+            f"Incomplete record at byte {offset}"
+            + ("" if path is None else f" of '{path}'") + "."
+        )
+
+    def __reduce__(self):
+        return type(self), (self.offset, self.path)
+
+
+class OAIPMHDumpReader:
+    """
+    Reader for the records of an OAI-PMH dump that memory-maps the file,
+    locates the byte-ranges of the records without decoding the file,
+    and converts the records from zero-copy slices of the mapping (same
+    format as OAIPMHMetadataConverter.get_dict).
+
+    The file can be split into byte-ranges (see ranges) that are
+    processed independently (e.g. by parallel workers, each with its own
+    reader); every record belongs to the range which contains its start.
+
+    Use as context manager, e.g.
+    with OAIPMHDumpReader("dump.xml") as reader:
+        for record in reader:
+            ...
+
+    Keyword arguments:
+    path -- path of the dump-file
+    engine -- name of the XML-engine (see xml_engine.ENGINES; the
+              lxml-engine copies every record) (default "xmltodict")
+    paths -- only convert the subtrees of the records at these paths
+             (see OAIPMHMetadataConverter.get_dict) (default None)
+    compact -- if True, records are returned in their compact
+               representation (see compact.CompactNode) (default False)
+    encoding -- encoding of the file (default None; UTF-8)
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        engine: str = "xmltodict",
+        paths: Optional[Iterable[Sequence[Any]]] = None,
+        compact: bool = False,
+        encoding: Optional[str] = None
+    ) -> None:
+        self.path = Path(path)
+        self._convert = record_converter(engine, paths, compact, encoding)
+        with open(self.path, "rb") as file:
+            if self.path.stat().st_size == 0:
+                # empty files cannot be mapped
+                self._mmap = None
+                self._view = memoryview(b"")
+            else:
+                self._mmap = mmap.mmap(
+                    file.fileno(), 0, access=mmap.ACCESS_READ
+                )
+                self._view = memoryview(self._mmap)
+                if compression := detect_compression(self._view[:4]):
+                    self.close()
+                    raise ValueError(
+                        f"Cannot memory-map {compression}-compressed "
+                        + f"dump '{self.path}' (use "
+                        + "OAIPMHMetadataConverter.iter_dicts instead)."
+                    )
+
+    def __enter__(self) -> "OAIPMHDumpReader":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        """Size of the file in bytes."""
+        return len(self._view)
+
+    def __iter__(self) -> Iterator[NestedDict]:
+        return self.records()
+
+    def close(self) -> None:
+        """
+        Close the memory-mapping (slices returned by `slices` must have
+        been released).
+        """
+        self._view.release()
+        if self._mmap is not None:
+            self._mmap.close()
+
+    def ranges(self, parts: int) -> list[tuple[int, int]]:
+        """
+        Returns a list of at most `parts` byte-ranges (start, end) of
+        roughly equal size that cover the entire file; every range
+        starts at a record (except for the first one).
+
+        Keyword arguments:
+        parts -- number of ranges
+        """
+        size = len(self._view)
+        boundaries = [0]
+        for part in range(1, parts):
+            position = self._next_record(size * part // parts)
+            if position > boundaries[-1]:
+                boundaries.append(position)
+        if boundaries[-1] < size or size == 0:
+            boundaries.append(size)
+        return list(zip(boundaries[:-1], boundaries[1:]))
+
+    def slices(
+        self, start: int = 0, end: Optional[int] = None
+    ) -> Iterator[tuple[int, memoryview]]:
+        """
+        Returns iterator of tuples of byte-offset and zero-copy slice of
+        the record-elements that start within [start, end). Raises
+        IncompleteRecordError for a record without end-tag (after the
+        preceding records have been returned).
+
+        Keyword arguments:
+        start -- start of the byte-range (default 0)
+        end -- end of the byte-range (default None; end of file)
+        """
+        end = len(self._view) if end is None else end
+        position = start
+        while True:
+            match = RECORD_START.search(self._mmap_or_view, position, end)
+            if match is None:
+                return
+            record_end = self._record_end(match.start())
+            yield match.start(), self._view[match.start():record_end]
+            position = record_end
+
+    def records(
+        self, start: int = 0, end: Optional[int] = None
+    ) -> Iterator[NestedDict]:
+        """
+        Returns iterator of the converted records that start within
+        [start, end).
+
+        Keyword arguments:
+        start -- start of the byte-range (default 0)
+        end -- end of the byte-range (default None; end of file)
+        """
+        for _, view in self.slices(start, end):
+            try:
+                yield self.convert(view)
+            finally:
+                view.release()
+
+    def convert(self, view: memoryview | bytes) -> NestedDict:
+        """
+        Returns the converted record of a record-element (e.g. a slice
+        returned by `slices`).
+
+        Keyword arguments:
+        view -- raw record-element
+        """
+        return self._convert(view)
+
+    @property
+    def _mmap_or_view(self) -> Any:
+        """Searchable buffer of the file."""
+        return self._view if self._mmap is None else self._mmap
+
+    def _next_record(self, position: int) -> int:
+        """
+        Returns the position of the next record at or after `position`
+        (or the size of the file).
+        """
+        match = RECORD_START.search(self._mmap_or_view, position)
+        return len(self._view) if match is None else match.start()
+
+    def _record_end(self, start: int) -> int:
+        """
+        Returns the position after the end-tag of the record-element at
+        `start` (nested record-elements are skipped).
+        """
+        end = _record_end(self._mmap_or_view, start)
+        if end is None:
+            raise IncompleteRecordError(start, self.path)
+        return end
+
+
+def record_converter(
+    engine: str = "xmltodict",
+    paths: Optional[Iterable[Sequence[Any]]] = None,
+    compact: bool = False,
+    encoding: Optional[str] = None
+) -> Callable[[bytes | memoryview], NestedDict]:
+    """
+    Returns a function that converts a raw record-element (e.g. from
+    OAIPMHDumpReader.slices or scan_records) into a record-dictionary.
+
+    Keyword arguments:
+    engine -- name of the XML-engine (see xml_engine.ENGINES)
+              (default "xmltodict")
+    paths -- only convert the subtrees of the records at these paths
+             (see OAIPMHMetadataConverter.get_dict) (default None)
+    compact -- if True, records are returned in their compact
+               representation (see compact.CompactNode) (default False)
+    encoding -- encoding of the records (default None; UTF-8)
+    """
+    parse = get_engine(engine)
+    projection = None
+    if paths is not None:
+        projection = record_projection(("record",), paths)
+
+    def convert(raw):
+        record = parse(raw, encoding, projection=projection)["record"]
+        return freeze(record) if compact else record
+    return convert
+
+
+def scan_records(
+    chunks: Iterable[bytes]
+) -> Iterator[tuple[int, bytes]]:
+    """
+    Returns iterator of tuples of byte-offset and raw record-element of
+    the records in a (concatenated) OAI-PMH dump that is given as stream
+    of chunks (see OAIPMHDumpReader for files). Only the current chunk
+    and incomplete records are buffered. Raises IncompleteRecordError
+    if the stream ends within a record (after the preceding records have
+    been returned).
+
+    Keyword arguments:
+    chunks -- iterable of (uncompressed) bytes-chunks, e.g. from
+              compression.decompress_chunks
+    """
+    buffer = bytearray()
+    offset = 0  # absolute position of buffer[0]
+    for chunk in _with_end(chunks):
+        final = chunk is None
+        if not final:
+            buffer.extend(chunk)
+        position = 0
+        while True:
+            match = RECORD_START.search(buffer, position)
+            if match is None:
+                break
+            end = _record_end(buffer, match.start())
+            if end is None:
+                break
+            yield offset + match.start(), bytes(buffer[match.start():end])
+            position = end
+        if final:
+            if match is not None:
+                raise IncompleteRecordError(offset + match.start())
+            return
+        # keep an incomplete record or a potential start of a record
+        if match is not None:
+            keep_from = match.start()
+        else:
+            keep_from = buffer.rfind(b"<record", position)
+            if keep_from == -1:
+                keep_from = max(position, len(buffer) - len(b"<record"))
+        del buffer[:keep_from]
+        offset += keep_from
+
+
+def _record_end(buffer: Any, start: int) -> Optional[int]:
+    """
+    Returns the position after the end-tag of the record-element at
+    `start` in `buffer` (nested record-elements are skipped) or None if
+    the record is incomplete.
+    """
+    depth = 0
+    for match in RECORD_TAG.finditer(buffer, start):
+        if match.group(2):
+            # empty element
+            continue
+        if match.group(1):
+            depth -= 1
+            if depth == 0:
+                return match.end()
+        else:
+            depth += 1
+    return None
+
+
+def _with_end(chunks: Iterable[bytes]) -> Iterator[Optional[bytes]]:
+    """Returns iterator over `chunks` followed by None."""
+    yield from chunks
+    yield None
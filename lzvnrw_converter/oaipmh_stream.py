@@ -0,0 +1,292 @@
+"""
+Incremental conversion of OAI-PMH responses (GetRecord, ListRecords,
+ListIdentifiers) into one dictionary per record.
+"""
+
+from typing import Any, Optional, Iterable, Iterator, Sequence, IO
+from dataclasses import dataclass
+from functools import lru_cache
+from xml.parsers import expat
+
+from dcm_common.util import NestedDict
+
+from lzvnrw_converter.compact import freeze
+from lzvnrw_converter.compression import decompress_chunks
+from lzvnrw_converter.xml_engine import \
+    Projection, compile_projection, get_engine
+
+
+# OAI-PMH verbs (element at depth 2) and the names of their items
+# (elements at depth 3) that are yielded as records
+OAIPMH_ITEMS = {
+    "GetRecord": "record",
+    "ListRecords": "record",
+    "ListIdentifiers": "header",
+}
+
+
+@dataclass(frozen=True)
+class ResumptionToken:
+    """
+    Resumption token of an incomplete list-response.
+
+    Keyword arguments:
+    value -- token to be used for the next request; None if the list
+             is complete (empty resumptionToken-element)
+    cursor -- position of the first record of the response in the
+              complete list (default None)
+    complete_list_size -- size of the complete list (default None)
+    expiration_date -- expiration date of the token (default None)
+    """
+    value: Optional[str]
+    cursor: Optional[int] = None
+    complete_list_size: Optional[int] = None
+    expiration_date: Optional[str] = None
+
+
+class OAIPMHRecordIterator:
+    """
+    Iterator over the records of an OAI-PMH response that yields one
+    record-dictionary (same format as OAIPMHMetadataConverter.get_dict)
+    at a time. For ListIdentifiers-responses the headers are yielded as
+    {"header": ...}.
+
+    The response is read in chunks and scanned for the byte-ranges of
+    the individual records which are then converted separately, i.e.
+    the memory footprint is bounded by the size of a single record
+    (and the chunk size) instead of the entire response.
+
+    After the iteration, the properties `resumption_token` and `errors`
+    contain the resumption token (if any) and a list of OAI-PMH errors
+    as (code, message)-tuples.
+
+    Keyword arguments:
+    source -- OAI-PMH response as string, bytes, file-like object, or
+              iterable of string/bytes-chunks; gzip- or zstd-compressed
+              bytes are decompressed incrementally while the records
+              are converted (see compression)
+    chunk_size -- number of bytes read from a file-like object at once
+                  (default 65536)
+    engine -- name of the XML-engine used for the conversion of the
+              individual records (see xml_engine.ENGINES)
+              (default "xmltodict")
+    paths -- only convert the subtrees of the records at these paths
+             (see OAIPMHMetadataConverter.get_dict) (default None)
+    instrumentation -- if given, the conversion of every record is
+                       recorded as operation "iter_dicts"; any object
+                       with a method `wrap(operation, key, function)`
+                       (e.g. an Instrumentation, see
+                       dcm_metadata_mapper.instrumentation)
+                       (default None)
+    instrumentation_key -- key of the recorded operation
+                           (default "OAI-PMH")
+    compact -- if True, records are yielded in their compact
+               representation (see compact.CompactNode) (default False)
+    compression -- compression of `source` ("gzip" or "zstd"), "auto"
+                   to detect it by its magic number, or None for
+                   uncompressed input (default "auto")
+    """
+
+    def __init__(
+        self,
+        source: str | bytes | IO | Iterable[str | bytes],
+        chunk_size: int = 65536,
+        engine: str = "xmltodict",
+        paths: Optional[Iterable[Sequence[Any]]] = None,
+        instrumentation: Optional[Any] = None,
+        instrumentation_key: str = "OAI-PMH",
+        compact: bool = False,
+        compression: Optional[str] = "auto"
+    ) -> None:
+        self.resumption_token: Optional[ResumptionToken] = None
+        self.errors: list[tuple[Optional[str], str]] = []
+        self._parse = get_engine(engine)
+        self._compact = compact
+        if instrumentation is not None:
+            self._parse = instrumentation.wrap(
+                "iter_dicts", instrumentation_key, self._parse
+            )
+        # projections by item-name; records are yielded without and
+        # headers with their root-element
+        self._projections: Optional[dict[str, Optional[Projection]]] = None
+        if paths is not None:
+            self._projections = {
+                "record": record_projection(("record",), paths),
+                "header": record_projection((), paths),
+            }
+        self._records = self._generate(source, chunk_size, compression)
+
+    def __iter__(self) -> Iterator[NestedDict]:
+        return self
+
+    def __next__(self) -> NestedDict:
+        return next(self._records)
+
+    @staticmethod
+    def _chunks(
+        source: str | bytes | IO | Iterable[str | bytes],
+        chunk_size: int
+    ) -> Iterator[str | bytes]:
+        """Returns iterator over the chunks of `source`."""
+        if isinstance(source, (str, bytes, bytearray, memoryview)):
+            yield source
+        elif hasattr(source, "read"):
+            while chunk := source.read(chunk_size):
+                yield chunk
+        else:
+            yield from source
+
+    def _generate(
+        self,
+        source: str | bytes | IO | Iterable[str | bytes],
+        chunk_size: int,
+        compression: Optional[str]
+    ) -> Iterator[NestedDict]:
+        """Generator for the records in `source`."""
+        chunks = decompress_chunks(
+            self._chunks(source, chunk_size), compression
+        )
+        first_chunk = next(chunks, b"")
+        # string-input is converted to utf-8 (like in xmltodict.parse)
+        encoding = "utf-8" if isinstance(first_chunk, str) else None
+
+        parser = expat.ParserCreate(encoding)
+        parser.ordered_attributes = True
+        parser.buffer_text = True
+        # disable entity-expansion (like in xmltodict.parse)
+        parser.DefaultHandler = lambda x: None
+        parser.ExternalEntityRefHandler = lambda *x: 1
+
+        buffer = bytearray()  # bytes of input not yet discarded
+        state: dict[str, Any] = {
+            "offset": 0,  # absolute position of buffer[0]
+            "path": [],  # names of currently open elements
+            "item_start": None,  # absolute position of the current item
+            "last_event": 0,  # absolute position of the last event
+            "text": None,  # character data of captured elements
+            "attributes": None,  # attributes of captured elements
+        }
+        items: list[tuple[str, bytes]] = []  # completed items
+
+        def xml_decl(_, document_encoding, __):
+            nonlocal encoding
+            if encoding is None:
+                encoding = document_encoding
+
+        def start_element(name, attributes):
+            path = state["path"]
+            path.append(name)
+            state["last_event"] = parser.CurrentByteIndex
+            if len(path) == 3 and OAIPMH_ITEMS.get(path[1]) == name:
+                state["item_start"] = parser.CurrentByteIndex
+            elif (len(path) == 3 and name == "resumptionToken") \
+                    or (len(path) == 2 and name == "error"):
+                state["text"] = []
+                state["attributes"] = dict(
+                    zip(attributes[::2], attributes[1::2])
+                )
+
+        def end_element(name):
+            path = state["path"]
+            position = parser.CurrentByteIndex
+            state["last_event"] = position
+            if state["item_start"] is not None and len(path) == 3:
+                # the end tag is entirely contained in the buffer
+                start = state["item_start"] - state["offset"]
+                end = buffer.index(b">", position - state["offset"]) + 1
+                items.append((name, bytes(buffer[start:end])))
+                state["item_start"] = None
+            elif state["text"] is not None:
+                self._capture(
+                    name, "".join(state["text"]), state["attributes"]
+                )
+                state["text"] = None
+                state["attributes"] = None
+            path.pop()
+
+        def character_data(data):
+            if state["text"] is not None:
+                state["text"].append(data)
+
+        parser.XmlDeclHandler = xml_decl
+        parser.StartElementHandler = start_element
+        parser.EndElementHandler = end_element
+        parser.CharacterDataHandler = character_data
+
+        for chunk in _prepend(first_chunk, chunks):
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            buffer.extend(chunk)
+            parser.Parse(chunk, False)
+
+            yield from self._convert(items, encoding)
+            items.clear()
+
+            # discard everything that is not required anymore
+            keep_from = state["item_start"] \
+                if state["item_start"] is not None else state["last_event"]
+            del buffer[:keep_from - state["offset"]]
+            state["offset"] = keep_from
+        parser.Parse(b"", True)
+        yield from self._convert(items, encoding)
+
+    def _convert(
+        self, items: list[tuple[str, bytes]], encoding: Optional[str]
+    ) -> Iterator[NestedDict]:
+        """Converts the raw items into record-dictionaries."""
+        for name, raw in items:
+            if self._projections is None:
+                item = self._parse(raw, encoding)
+            else:
+                item = self._parse(
+                    raw, encoding, projection=self._projections[name]
+                )
+            if name == "record":
+                item = item["record"]
+            yield freeze(item) if self._compact else item
+
+    def _capture(
+        self, name: str, text: str, attributes: dict[str, str]
+    ) -> None:
+        """Processes captured resumptionToken- or error-elements."""
+        if name == "error":
+            self.errors.append((attributes.get("code"), text.strip()))
+            return
+        self.resumption_token = ResumptionToken(
+            value=text.strip() or None,
+            cursor=_int_or_none(attributes.get("cursor")),
+            complete_list_size=_int_or_none(
+                attributes.get("completeListSize")
+            ),
+            expiration_date=attributes.get("expirationDate"),
+        )
+
+
+def record_projection(
+    prefix: tuple[str, ...], paths: Iterable[Sequence[Any]]
+) -> Optional[Projection]:
+    """
+    Returns the projection (see xml_engine.compile_projection) for
+    record-`paths` below `prefix`. Projections are cached by their
+    paths.
+    """
+    return _record_projection(prefix, tuple(tuple(path) for path in paths))
+
+
+@lru_cache(maxsize=256)
+def _record_projection(
+    prefix: tuple[str, ...], paths: tuple[tuple[Any, ...], ...]
+) -> Optional[Projection]:
+    """Cached compile_projection."""
+    return compile_projection(paths, prefix)
+
+
+def _prepend(first: Any, iterator: Iterator[Any]) -> Iterator[Any]:
+    """Returns iterator that yields `first` before `iterator`."""
+    yield first
+    yield from iterator
+
+
+def _int_or_none(value: Optional[str]) -> Optional[int]:
+    """Returns `value` as int or None if not given."""
+    return None if value is None else int(value)
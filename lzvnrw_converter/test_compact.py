@@ -0,0 +1,126 @@
+"""
+Test suite for the compact representation of converted records.
+"""
+import pickle
+
+import pytest
+from lzvnrw_converter.compact import CompactNode, freeze, thaw
+from lzvnrw_converter.oaipmh_converter import OAIPMHMetadataConverter
+from lzvnrw_converter.xml_engine import parse_xmltodict
+from lzvnrw_converter.test_xml_engine import DOCUMENTS
+from lzvnrw_mapper import registry
+
+
+LIST_RECORDS = """<OAI-PMH>
+    <ListRecords>
+        <record>
+            <header>
+                <identifier>oai:wwu.de:0</identifier>
+            </header>
+            <metadata>
+                <oai_dc:dc>
+                    <dc:title xml:lang="de">This is a test</dc:title>
+                    <dc:creator>Mustermann, M.</dc:creator>
+                    <dc:creator>Mustermann, E.</dc:creator>
+                    <dc:identifier>https://nbn-resolving.org/urn:nbn:de:hbz:x-xxxxxxxxxxx</dc:identifier>
+                    <dc:identifier>urn:nbn:de:hbz:x-xxxxxxxxxxx</dc:identifier>
+                    <dc:identifier>10.11111/xxxxxxxxxxx</dc:identifier>
+                    <dc:identifier>https://repositorium.uni-muenster.de/transfer/miami/x.pdf</dc:identifier>
+                    <dc:identifier>https://hbz.opus.hbz-nrw.de/files/xx/x.pdf</dc:identifier>
+                    <dc:identifier>https://whge.opus.hbz-nrw.de/files/xx/x.pdf</dc:identifier>
+                    <dc:identifier>https://opus.hfm-detmold.de/files/xx/x.pdf</dc:identifier>
+                </oai_dc:dc>
+            </metadata>
+        </record>
+        <record>
+            <header>
+                <identifier>oai:wwu.de:1</identifier>
+            </header>
+            <metadata>
+                <oai_dc:dc>
+                    <dc:title>This is another test</dc:title>
+                    <dc:creator>Mustermann, M.</dc:creator>
+                    <dc:identifier />
+                </oai_dc:dc>
+            </metadata>
+        </record>
+        <record>
+            <header status="deleted">
+                <identifier>oai:wwu.de:2</identifier>
+            </header>
+        </record>
+    </ListRecords>
+</OAI-PMH>
+"""
+
+
+@pytest.mark.parametrize("name", DOCUMENTS)
+def test_freeze_thaw(name):
+    """Assert that thaw is the inverse of freeze."""
+    document = parse_xmltodict(DOCUMENTS[name])
+    assert thaw(freeze(document)) == document
+
+
+def test_compact_node():
+    """Test the read-only mapping-interface of CompactNode."""
+    node = freeze({"a": "1", "b": {"c": None}, "d": ["2", {"e": "3"}]})
+
+    assert isinstance(node, CompactNode)
+    assert node["a"] == "1"
+    assert node["b"] == {"c": None}
+    assert node["d"] == ("2", {"e": "3"})
+    assert "b" in node and "x" not in node
+    assert node.get("x") is None
+    assert list(node) == ["a", "b", "d"]
+    assert len(node) == 3
+    with pytest.raises(KeyError):
+        node["x"]  # pylint: disable=pointless-statement
+    with pytest.raises(TypeError):
+        node["a"] = "2"
+    with pytest.raises(AttributeError):
+        node.x = "2"
+    assert pickle.loads(pickle.dumps(node)) == node
+
+
+def test_shared_index():
+    """Assert that nodes with the same names share their index."""
+    records = list(
+        OAIPMHMetadataConverter(compact=True).iter_dicts(LIST_RECORDS)
+    )
+    # pylint: disable=protected-access
+    assert records[0]._index is records[1]._index
+    assert records[0]["header"]._index is records[1]["header"]._index
+
+
+@pytest.mark.parametrize("engine", ["xmltodict", "lxml"])
+def test_converter(engine):
+    """Test the converter with compact=True."""
+    records = list(OAIPMHMetadataConverter().iter_dicts(LIST_RECORDS))
+    compact_records = list(
+        OAIPMHMetadataConverter(engine=engine, compact=True)
+        .iter_dicts(LIST_RECORDS)
+    )
+
+    assert [thaw(record) for record in compact_records] == records
+    document = LIST_RECORDS.replace("ListRecords", "GetRecord")
+    assert thaw(
+        OAIPMHMetadataConverter(engine=engine, compact=True).get_dict(
+            document
+        )
+    ) == OAIPMHMetadataConverter().get_dict(document)
+
+
+@pytest.mark.parametrize("mapper", registry.names())
+def test_mappers(mapper):
+    """
+    Assert that the mappers return the same values for compact records
+    (except for tuples instead of lists).
+    """
+    mapper = registry.get(mapper)()
+    records = list(OAIPMHMetadataConverter().iter_dicts(LIST_RECORDS))
+
+    for record in records:
+        expected = mapper.get_all_metadata(record)
+        assert thaw(mapper.get_all_metadata(freeze(record))) == expected
+        for key, value in expected.items():
+            assert thaw(mapper.get_metadata(key, freeze(record))) == value
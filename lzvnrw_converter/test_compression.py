@@ -0,0 +1,154 @@
+"""
+Test suite for the transparent decompression of compressed input.
+"""
+import gzip
+from io import BytesIO
+
+import pytest
+from lzvnrw_converter.compression import \
+    detect_compression, decompress_chunks, open_compressed
+from lzvnrw_converter.oaipmh_converter import OAIPMHMetadataConverter
+from lzvnrw_converter.oaipmh_dump import OAIPMHDumpReader
+
+
+LIST_RECORDS = """<?xml version="1.0" encoding="UTF-8"?>
+<OAI-PMH xmlns="http://www.openarchives.org/OAI/2.0/">
+    <ListRecords>{}
+        <resumptionToken cursor="0">token</resumptionToken>
+    </ListRecords>
+</OAI-PMH>
+""".format("".join(
+    f"""
+        <record>
+            <header><identifier>oai:wwu.de:{i}</identifier></header>
+            <metadata><title>Überprüfung {i}</title></metadata>
+        </record>"""
+    for i in range(50)
+)).encode("utf-8")
+GET_RECORD = b"""<OAI-PMH>
+    <GetRecord>
+        <record>
+            <header><identifier>oai:wwu.de:0</identifier></header>
+            <metadata><title>\xc3\x9cberpr\xc3\xbcfung</title></metadata>
+        </record>
+    </GetRecord>
+</OAI-PMH>
+"""
+
+
+def compress(compression: str, data: bytes) -> bytes:
+    """
+    Returns `data` compressed with `compression` (skips the test if the
+    optional package zstandard is missing for "zstd").
+    """
+    if compression == "zstd":
+        zstandard = pytest.importorskip("zstandard")
+        return zstandard.ZstdCompressor().compress(data)
+    return gzip.compress(data)
+
+
+def chunked(data: bytes, size: int) -> list[bytes]:
+    """Returns `data` split into chunks of `size` bytes."""
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("compression", ["gzip", "zstd"])
+def test_detect_compression(compression):
+    """Test detection of compressions by magic number."""
+    assert detect_compression(compress(compression, b"")) == compression
+    assert detect_compression(GET_RECORD) is None
+    assert detect_compression(b"") is None
+
+
+@pytest.mark.parametrize("compression", ["gzip", "zstd"])
+@pytest.mark.parametrize("size", [1, 3, 100, 100000])
+def test_decompress_chunks(compression, size):
+    """
+    Test incremental decompression of chunks (including concatenated
+    gzip-members/zstd-frames).
+    """
+    data = compress(compression, LIST_RECORDS[:500]) \
+        + compress(compression, LIST_RECORDS[500:])
+    assert b"".join(decompress_chunks(chunked(data, size))) \
+        == LIST_RECORDS
+    assert b"".join(
+        decompress_chunks(chunked(data, size), compression)
+    ) == LIST_RECORDS
+
+
+def test_decompress_chunks_passthrough():
+    """Test that uncompressed and string-input is passed through."""
+    assert b"".join(decompress_chunks(chunked(LIST_RECORDS, 3))) \
+        == LIST_RECORDS
+    assert list(decompress_chunks(["<a>", "</a>"])) == ["<a>", "</a>"]
+    assert list(decompress_chunks([b"<", "a/>"])) == [b"<", "a/>"]
+    assert list(decompress_chunks([])) == []
+    data = gzip.compress(GET_RECORD)
+    assert list(decompress_chunks([data], None)) == [data]
+
+
+@pytest.mark.parametrize("compression", ["gzip", "zstd"])
+def test_decompress_chunks_truncated(compression):
+    """Test truncated compressed input."""
+    with pytest.raises(EOFError):
+        list(decompress_chunks([compress(compression, LIST_RECORDS)[:-20]]))
+
+
+@pytest.mark.parametrize("compression", ["gzip", "zstd"])
+def test_decompress_chunks_corrupt(compression):
+    """Test corrupt compressed input."""
+    data = bytearray(compress(compression, LIST_RECORDS))
+    # keep the magic number
+    data[4:12] = b"\xff" * 8
+    with pytest.raises(ValueError):
+        list(decompress_chunks([bytes(data)]))
+
+
+@pytest.mark.parametrize("compression", ["gzip", "zstd"])
+def test_open_compressed(compression):
+    """Test the decompressing file-object."""
+    data = compress(compression, GET_RECORD) * 2
+    assert open_compressed(BytesIO(data), compression).read() \
+        == GET_RECORD * 2
+    with pytest.raises(ValueError):
+        open_compressed(BytesIO(data), "unknown")
+
+
+@pytest.mark.parametrize("compression", ["gzip", "zstd"])
+@pytest.mark.parametrize("engine", ["xmltodict", "lxml"])
+def test_get_dict(compression, engine):
+    """Test get_dict with compressed input."""
+    converter = OAIPMHMetadataConverter(engine=engine)
+    expected = converter.get_dict(GET_RECORD)
+
+    assert converter.get_dict(compress(compression, GET_RECORD)) \
+        == expected
+    assert converter.get_dict(
+        compress(compression, GET_RECORD), paths=[("header",)]
+    ) == {"header": expected["header"]}
+
+
+@pytest.mark.parametrize("compression", ["gzip", "zstd"])
+def test_iter_dicts(compression, tmp_path):
+    """Test iter_dicts with compressed bytes, chunks, and files."""
+    converter = OAIPMHMetadataConverter()
+    expected = list(converter.iter_dicts(LIST_RECORDS))
+    data = compress(compression, LIST_RECORDS)
+    path = tmp_path / "response.xml.gz"
+    path.write_bytes(data)
+
+    assert len(expected) == 50
+    assert list(converter.iter_dicts(data)) == expected
+    assert list(converter.iter_dicts(chunked(data, 7))) == expected
+    with open(path, "rb") as file:
+        records = converter.iter_dicts(file, chunk_size=16)
+        assert list(records) == expected
+    assert records.resumption_token.value == "token"
+
+
+def test_dump_reader_compressed(tmp_path):
+    """Test that compressed dumps are rejected by the dump reader."""
+    path = tmp_path / "dump.xml.gz"
+    path.write_bytes(gzip.compress(LIST_RECORDS))
+    with pytest.raises(ValueError):
+        OAIPMHDumpReader(path)
@@ -38,4 +38,10 @@ def test_basic_conversion(minimal_xml):
 
     assert isinstance(result, dict)
     assert "header" in result
-    
\ No newline at end of file
+    
+
+
+def test_engine_equivalence(minimal_xml):
+    """Assert that all engines return the same dictionary."""
+    assert OAIPMHMetadataConverter(engine="lxml").get_dict(minimal_xml) \
+        == OAIPMHMetadataConverter(engine="xmltodict").get_dict(minimal_xml)
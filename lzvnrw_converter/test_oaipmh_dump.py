@@ -0,0 +1,180 @@
+"""
+Test suite for the memory-mapped reader of OAI-PMH dumps.
+"""
+from xml.parsers.expat import ExpatError
+
+import pytest
+from lzvnrw_converter.oaipmh_converter import OAIPMHMetadataConverter
+from lzvnrw_converter.oaipmh_dump import \
+    IncompleteRecordError, OAIPMHDumpReader, scan_records
+from lzvnrw_converter.compact import CompactNode, thaw
+from lzvnrw_mapper.miami import MiamiMetadataMapper
+
+
+PAGE = """<?xml version="1.0" encoding="UTF-8"?>
+<OAI-PMH xmlns="http://www.openarchives.org/OAI/2.0/">
+    <responseDate>2023-09-12T06:45:12Z</responseDate>
+    <request verb="ListRecords">https://repositorium.uni-muenster.de/oai</request>
+    <ListRecords>{records}
+        <resumptionToken>{token}</resumptionToken>
+    </ListRecords>
+</OAI-PMH>
+"""
+RECORD = """
+        <record>
+            <header>
+                <identifier>oai:wwu.de:{index}</identifier>
+            </header>
+            <metadata>
+                <oai_dc:dc xmlns:oai_dc="http://www.openarchives.org/OAI/2.0/oai_dc/" xmlns:dc="http://purl.org/dc/elements/1.1/">
+                    <dc:title>Überprüfung {index}</dc:title>
+                    <dc:creator>Mustermann, M.</dc:creator>
+                    <dc:identifier>https://repositorium.uni-muenster.de/transfer/miami/{index}.pdf</dc:identifier>
+                </oai_dc:dc>
+            </metadata>
+        </record>"""
+# record with nested record-elements in its metadata (like MARC21)
+NESTED_RECORD = """
+        <record>
+            <header status="deleted"><identifier>oai:wwu.de:{index}</identifier></header>
+            <metadata>
+                <record xmlns="http://www.loc.gov/MARC21/slim">
+                    <record/><leader>x</leader>
+                </record>
+            </metadata>
+        </record>"""
+
+
+def get_pages(pages: int = 3, size: int = 4) -> list[str]:
+    """Returns a list of ListRecords-pages."""
+    return [
+        PAGE.format(
+            records="".join(
+                (NESTED_RECORD if index % 5 == 4 else RECORD).format(
+                    index=index
+                )
+                for index in range(page * size, (page + 1) * size)
+            ),
+            token=page + 1 if page < pages - 1 else "",
+        )
+        for page in range(pages)
+    ]
+
+
+@pytest.fixture(name="dump")
+def get_dump(tmp_path):
+    """Returns the path of a dump with 3 concatenated pages."""
+    path = tmp_path / "dump.xml"
+    path.write_text("".join(get_pages()), encoding="utf-8")
+    return path
+
+
+@pytest.fixture(name="expected")
+def get_expected():
+    """Returns the records of the dump (converted by iter_dicts)."""
+    converter = OAIPMHMetadataConverter()
+    return [
+        record
+        for page in get_pages()
+        for record in converter.iter_dicts(page)
+    ]
+
+
+@pytest.mark.parametrize("engine", ["xmltodict", "lxml"])
+def test_records(dump, expected, engine):
+    """Assert that the reader yields the same records as iter_dicts."""
+    with OAIPMHDumpReader(dump, engine=engine) as reader:
+        records = list(reader)
+
+    assert len(records) == 12
+    assert records == expected
+    assert records[4]["metadata"]["record"]["leader"] == "x"
+
+
+def test_slices(dump):
+    """Test the byte-offsets and zero-copy slices of the records."""
+    data = dump.read_bytes()
+    with OAIPMHDumpReader(dump) as reader:
+        for offset, view in reader.slices():
+            assert isinstance(view, memoryview)
+            assert data[offset:].startswith(bytes(view))
+            assert bytes(view).startswith(b"<record>")
+            assert bytes(view).endswith(b"</record>")
+            view.release()
+
+
+@pytest.mark.parametrize("parts", [1, 2, 5, 12, 100])
+def test_ranges(dump, expected, parts):
+    """Test splitting the dump into byte-ranges."""
+    with OAIPMHDumpReader(dump) as reader:
+        ranges = reader.ranges(parts)
+        assert ranges[0][0] == 0
+        assert ranges[-1][1] == dump.stat().st_size
+        assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+        assert len(ranges) <= parts
+        assert [
+            record
+            for start, end in ranges
+            for record in reader.records(start, end)
+        ] == expected
+
+
+def test_projected_and_compact(dump, expected):
+    """Test the reader with projected conversion and compact records."""
+    mapper = MiamiMetadataMapper()
+    with OAIPMHDumpReader(
+        dump, paths=mapper.SOURCE_PATHS, compact=True
+    ) as reader:
+        records = list(reader)
+
+    assert isinstance(records[0], CompactNode)
+    assert [
+        thaw(mapper.get_all_metadata(record)) for record in records
+    ] == [mapper.get_all_metadata(record) for record in expected]
+
+
+def test_empty_and_malformed(tmp_path):
+    """Test empty files and incomplete or malformed records."""
+    (tmp_path / "empty.xml").write_bytes(b"")
+    with OAIPMHDumpReader(tmp_path / "empty.xml") as reader:
+        assert list(reader) == []
+        assert reader.ranges(4) == [(0, 0)]
+
+    (tmp_path / "incomplete.xml").write_text(
+        get_pages()[0][:-100], encoding="utf-8"
+    )
+    with OAIPMHDumpReader(tmp_path / "incomplete.xml") as reader:
+        records = []
+        with pytest.raises(IncompleteRecordError) as exc_info:
+            for record in reader:
+                records.append(record)
+        assert len(records) == 3
+        assert exc_info.value.path == tmp_path / "incomplete.xml"
+        assert (tmp_path / "incomplete.xml").read_bytes()[
+            exc_info.value.offset:
+        ].startswith(b"<record>")
+
+    (tmp_path / "malformed.xml").write_text(
+        "<record><header><identifier></header></record>", encoding="utf-8"
+    )
+    with OAIPMHDumpReader(tmp_path / "malformed.xml") as reader:
+        with pytest.raises(ExpatError):
+            list(reader)
+
+
+@pytest.mark.parametrize("size", [1, 7, 100, 100000])
+def test_scan_records(dump, size):
+    """Test scanning a dump that is given as stream of chunks."""
+    data = dump.read_bytes()
+    with OAIPMHDumpReader(dump) as reader:
+        expected = [
+            (offset, bytes(view)) for offset, view in reader.slices()
+        ]
+
+    assert list(
+        scan_records(data[i:i + size] for i in range(0, len(data), size))
+    ) == expected
+    assert not list(scan_records([]))
+    with pytest.raises(IncompleteRecordError) as exc_info:
+        list(scan_records([data[:-100]]))
+    assert exc_info.value.offset == expected[-1][0]
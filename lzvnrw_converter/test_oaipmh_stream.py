@@ -0,0 +1,183 @@
+"""
+Test suite for the incremental conversion of OAI-PMH responses.
+"""
+import io
+
+import pytest
+import xmltodict
+from lzvnrw_converter.oaipmh_converter import OAIPMHMetadataConverter
+from lzvnrw_converter.oaipmh_stream import ResumptionToken
+
+
+@pytest.fixture(name="list_records_xml")
+def get_list_records_xml():
+    """Returns a ListRecords-response with a resumption token."""
+    return \
+"""<?xml version="1.0" encoding="UTF-8"?>
+<OAI-PMH>
+    <responseDate>2023-09-12T06:45:12Z</responseDate>
+    <request verb="ListRecords">https://repositorium.uni-muenster.de/oai/miami</request>
+    <ListRecords>
+        <record>
+            <header>
+                <identifier>oai:wwu.de:0</identifier>
+            </header>
+            <metadata>
+                <oai_dc:dc>
+                    <dc:title xml:lang="de">Test &amp; Test</dc:title>
+                    <dc:creator>Mustermann, M.</dc:creator>
+                    <dc:creator>Mustermann, E.</dc:creator>
+                    <dc:identifier />
+                    <dc:identifier>10.11111/xxxxxxxxxxx</dc:identifier>
+                </oai_dc:dc>
+            </metadata>
+        </record>
+        <record>
+            <header status="deleted">
+                <identifier>oai:wwu.de:1</identifier>
+            </header>
+        </record>
+        <record>
+            <header>
+                <identifier>oai:wwu.de:2</identifier>
+            </header>
+            <metadata>
+                <oai_dc:dc>
+                    <dc:title>Überprüfung</dc:title>
+                </oai_dc:dc>
+            </metadata>
+        </record>
+        <resumptionToken cursor="0" completeListSize="5">token-1</resumptionToken>
+    </ListRecords>
+</OAI-PMH>
+"""
+
+
+@pytest.mark.parametrize("engine", ["xmltodict", "lxml"])
+@pytest.mark.parametrize("chunk_size", [1, 7, 100, 65536])
+def test_iter_dicts_list_records(list_records_xml, chunk_size, engine):
+    """
+    Assert that the records of a ListRecords-response are returned in
+    the same format as from a full conversion of the response.
+    """
+    expected = xmltodict.parse(list_records_xml)["OAI-PMH"]["ListRecords"]
+
+    records = OAIPMHMetadataConverter(engine=engine).iter_dicts(
+        io.BytesIO(list_records_xml.encode("utf-8")), chunk_size=chunk_size
+    )
+
+    assert list(records) == expected["record"]
+    assert records.resumption_token == ResumptionToken(
+        value="token-1", cursor=0, complete_list_size=5
+    )
+    assert records.errors == []
+
+
+def test_iter_dicts_string_chunks(list_records_xml):
+    """Assert that an iterable of string-chunks is accepted."""
+    records = OAIPMHMetadataConverter().iter_dicts(
+        list_records_xml[i:i+13] for i in range(0, len(list_records_xml), 13)
+    )
+
+    assert [
+        record["header"]["identifier"] for record in records
+    ] == ["oai:wwu.de:0", "oai:wwu.de:1", "oai:wwu.de:2"]
+    assert records.resumption_token.value == "token-1"
+
+
+def test_iter_dicts_encoding(list_records_xml):
+    """Assert that the document's encoding is respected."""
+    xml = list_records_xml.replace('encoding="UTF-8"', 'encoding="ISO-8859-1"')
+
+    records = list(
+        OAIPMHMetadataConverter().iter_dicts(xml.encode("iso-8859-1"))
+    )
+
+    assert records[2]["metadata"]["oai_dc:dc"]["dc:title"] == "Überprüfung"
+
+
+def test_iter_dicts_get_record():
+    """
+    Assert that a GetRecord-response yields the same record as
+    get_dict.
+    """
+    xml = """<OAI-PMH>
+        <GetRecord>
+            <record>
+                <header>
+                    <identifier>oai:id0</identifier>
+                </header>
+            </record>
+        </GetRecord>
+    </OAI-PMH>"""
+    converter = OAIPMHMetadataConverter()
+
+    records = converter.iter_dicts(xml)
+
+    assert list(records) == [converter.get_dict(xml)]
+    assert records.resumption_token is None
+
+
+@pytest.mark.parametrize(
+    "paths", [None, [("header", "identifier"), ("metadata",)]]
+)
+def test_iter_dicts_list_identifiers(paths):
+    """Assert that ListIdentifiers-responses yield headers."""
+    records = OAIPMHMetadataConverter().iter_dicts(
+        """<OAI-PMH>
+            <ListIdentifiers>
+                <header><identifier>oai:id0</identifier></header>
+                <header status="deleted">
+                    <identifier>oai:id1</identifier>
+                </header>
+                <resumptionToken completeListSize="2" cursor="0"/>
+            </ListIdentifiers>
+        </OAI-PMH>""",
+        paths=paths
+    )
+
+    assert list(records) == [
+        {"header": {"identifier": "oai:id0"}},
+        {"header": {"@status": "deleted", "identifier": "oai:id1"}},
+    ]
+    # empty token marks the end of the list
+    assert records.resumption_token == ResumptionToken(
+        value=None, cursor=0, complete_list_size=2
+    )
+
+
+def test_iter_dicts_error():
+    """Assert that OAI-PMH errors are collected."""
+    records = OAIPMHMetadataConverter().iter_dicts(
+        """<OAI-PMH>
+            <error code="noRecordsMatch">No matching records.</error>
+        </OAI-PMH>"""
+    )
+
+    assert list(records) == []
+    assert records.errors == [("noRecordsMatch", "No matching records.")]
+
+
+@pytest.mark.parametrize("engine", ["xmltodict", "lxml"])
+def test_iter_dicts_paths(list_records_xml, engine):
+    """Test the projected conversion of records."""
+    records = list(
+        OAIPMHMetadataConverter(engine=engine).iter_dicts(
+            list_records_xml,
+            paths=[
+                ("header", "identifier"),
+                ("metadata", "oai_dc:dc", "dc:creator"),
+            ]
+        )
+    )
+
+    assert records[0] == {
+        "header": {"identifier": "oai:wwu.de:0"},
+        "metadata": {
+            "oai_dc:dc": {"dc:creator": ["Mustermann, M.", "Mustermann, E."]}
+        },
+    }
+    assert records[1] == {
+        "header": {"@status": "deleted", "identifier": "oai:wwu.de:1"}
+    }
+    assert records[2]["metadata"] == {"oai_dc:dc": {}}
@@ -0,0 +1,151 @@
+"""
+Test suite for the XML-engines of the OAI-PMH converter.
+"""
+from xml.parsers.expat import ExpatError
+
+import pytest
+from dcm_common.util import value_from_dict_path
+from lzvnrw_converter.xml_engine import \
+    ENGINES, compile_projection, get_engine, parse_lxml, parse_xmltodict
+
+
+DOCUMENTS = {
+    "undeclared-prefixes": """<OAI-PMH>
+    <responseDate>2023-09-07T08:26:19Z</responseDate>
+    <request>https://repositorium.uni-muenster.de/oai/miami</request>
+    <GetRecord>
+        <record>
+            <header>
+                <identifier>oai:wwu.de:xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx</identifier>
+            </header>
+            <metadata>
+                <oai_dc:dc>
+                    <dc:title xml:lang="de">This is a test</dc:title>
+                    <dc:creator>Mustermann, M.</dc:creator>
+                    <dc:creator>Mustermann, E.</dc:creator>
+                    <dc:identifier />
+                    <dc:identifier>
+                        https://nbn-resolving.org/urn:nbn:de:hbz:x-xxxxxxxxxxx
+                    </dc:identifier>
+                    <dc:identifier>urn:nbn:de:hbz:x-xxxxxxxxxxx</dc:identifier>
+                </oai_dc:dc>
+            </metadata>
+        </record>
+    </GetRecord>
+</OAI-PMH>
+""",
+    "namespaces": """<?xml version="1.0" encoding="UTF-8"?>
+<OAI-PMH xmlns="http://www.openarchives.org/OAI/2.0/" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:schemaLocation="http://www.openarchives.org/OAI/2.0/ http://www.openarchives.org/OAI/2.0/OAI-PMH.xsd">
+    <responseDate>2023-09-12T06:45:12Z</responseDate>
+    <request verb="GetRecord" metadataPrefix="oai_dc">https://hbz.opus.hbz-nrw.de/oai</request>
+    <GetRecord>
+        <record>
+            <header status="deleted"><identifier>oai:hbz.opus:x</identifier></header>
+            <metadata>
+                <oai_dc:dc xmlns:oai_dc="http://www.openarchives.org/OAI/2.0/oai_dc/" xmlns:dc="http://purl.org/dc/elements/1.1/">
+                    <dc:title xml:lang="de">Überprüfung &amp; Test</dc:title>
+                    <dc:rights xmlns="">info:eu-repo/semantics/openAccess</dc:rights>
+                    <dc:type xmlns:x="http://purl.org/dc/elements/1.1/">doc</dc:type>
+                    <x:type xmlns:x="http://purl.org/dc/elements/1.1/">doc</x:type>
+                </oai_dc:dc>
+            </metadata>
+        </record>
+    </GetRecord>
+</OAI-PMH>
+""",
+    "mixed-content": "<a> x <b/> y <!-- comment --> z <?pi ?></a>",
+    "repeated": "<a><b>1</b><c/><b>2</b><b/><c attr=''/></a>",
+    "cdata": "<a><![CDATA[ <b> ]]>&#228;&lt;</a>",
+    "empty": "<a><b> </b><c attr='1'> </c></a>",
+    "latin-1": '<?xml version="1.0" encoding="ISO-8859-1"?><a>\xe4</a>'.encode(
+        "iso-8859-1"
+    ),
+}
+
+
+@pytest.mark.parametrize("name", DOCUMENTS)
+def test_engine_equivalence(name):
+    """
+    Assert that the lxml-engine returns the same dictionaries as
+    xmltodict (including the order of elements).
+    """
+    pytest.importorskip("lxml")
+
+    expected = parse_xmltodict(DOCUMENTS[name])
+    result = parse_lxml(DOCUMENTS[name])
+
+    assert result == expected
+    assert str(result) == str(expected)
+
+
+@pytest.mark.parametrize(
+    "document", ["<a><b></a>", "<a>&undefined;</a>", "<a/><b/>", ""]
+)
+@pytest.mark.parametrize("engine", ENGINES)
+def test_engine_malformed(document, engine):
+    """Assert that all engines raise ExpatError for malformed XML."""
+    with pytest.raises(ExpatError):
+        get_engine(engine)(document)
+
+
+def test_get_engine_unknown():
+    """Test get_engine for an unknown engine."""
+    with pytest.raises(ValueError):
+        get_engine("unknown")
+
+
+def test_get_engine_lxml_fallback(monkeypatch):
+    """Assert that the lxml-engine falls back to xmltodict."""
+    monkeypatch.setattr("lzvnrw_converter.xml_engine.LXML_AVAILABLE", False)
+    monkeypatch.setattr("lzvnrw_converter.xml_engine.etree", None)
+
+    assert get_engine("lxml") is parse_xmltodict
+    assert parse_lxml("<a>b</a>") == {"a": "b"}
+
+
+@pytest.mark.parametrize(
+    "paths",
+    [
+        [("OAI-PMH", "GetRecord", "record", "header", "identifier")],
+        [
+            ("OAI-PMH", "GetRecord", "record", "header"),
+            ("OAI-PMH", "GetRecord", "record", "metadata", "oai_dc:dc",
+             "dc:title"),
+            ("OAI-PMH", "GetRecord", "record", "metadata", "oai_dc:dc",
+             "dc:identifier"),
+            ("OAI-PMH", "GetRecord", "record", "metadata", "oai_dc:dc",
+             "dc:missing"),
+        ],
+        [("OAI-PMH", "request"), ("OAI-PMH", "GetRecord", "missing")],
+        [("a", "b"), ("a", "c", 0)],
+        [("OAI-PMH",), ("a",)],
+    ]
+)
+@pytest.mark.parametrize("name", DOCUMENTS)
+@pytest.mark.parametrize("engine", ENGINES)
+def test_projection(name, engine, paths):
+    """
+    Assert that the projected conversion yields the same values at the
+    projected paths as the full conversion.
+    """
+    expected = parse_xmltodict(DOCUMENTS[name])
+    result = get_engine(engine)(
+        DOCUMENTS[name], projection=compile_projection(paths)
+    )
+
+    for path in paths:
+        assert value_from_dict_path(result, path) \
+            == value_from_dict_path(expected, path)
+    if len(paths) == 1 and len(paths[0]) == 1:
+        assert result == expected
+    else:
+        assert len(str(result)) <= len(str(expected))
+
+
+def test_compile_projection():
+    """Test compile_projection."""
+    assert compile_projection(
+        [("a", "b", "c"), ("a", "b"), ("a", "b", "d"), ("a", "e", 0, "f")],
+        prefix=("r",)
+    ) == {"r": {"a": {"b": None, "e": None}}}
+    assert compile_projection([("a",), (0,)]) is None
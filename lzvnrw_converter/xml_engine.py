@@ -0,0 +1,513 @@
+"""
+Engines for the conversion of XML into dictionaries. All engines follow
+the conventions of `xmltodict.parse` (with default settings):
+* element-names are used as given in the document (including the
+  prefix, e.g. "dc:title"),
+* attributes (including namespace-declarations) are prefixed by "@",
+* character data is stripped and, if the element also has attributes
+  or children, stored under "#text",
+* repeated elements are collected into a list,
+* empty elements are represented by None.
+
+All engines support a projected conversion (see compile_projection)
+in which only the subtrees at given paths are converted.
+"""
+
+from typing import Any, Callable, Optional, Iterable, Sequence, IO
+from xml.parsers import expat
+from xml.parsers.expat import ExpatError
+import threading
+
+import xmltodict
+from dcm_common.util import NestedDict
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+
+XML_NAMESPACE = "http://www.w3.org/XML/1998/namespace"
+LXML_AVAILABLE = etree is not None
+
+
+# a projection is a trie of element-names: every node is a dictionary
+# of names and child-nodes; the child-node None denotes that the entire
+# subtree is converted
+Projection = dict[str, Optional["Projection"]]
+
+
+def compile_projection(
+    paths: Iterable[Sequence[Any]], prefix: Sequence[str] = ()
+) -> Optional[Projection]:
+    """
+    Returns the projection (trie of element-names) for `paths` or None
+    if the entire document is required.
+
+    A projected conversion returns a dictionary that contains only the
+    subtrees at the given paths and their ancestors, i.e. for every
+    path the value found at that path is identical to the one of the
+    full conversion. Ancestors keep their attributes and text.
+
+    Keyword arguments:
+    paths -- paths of element-names starting at the root-element, e.g.
+             ("OAI-PMH", "GetRecord", "record", "header"); a path ends
+             before its first non-string segment (e.g. a list-index)
+    prefix -- common prefix of all paths (default ())
+    """
+    projection: Projection = {}
+    for path in paths:
+        names = list(prefix)
+        for segment in path:
+            if not isinstance(segment, str):
+                break
+            names.append(segment)
+        if not names:
+            return None
+        node = projection
+        for name in names[:-1]:
+            node = node.setdefault(name, {})
+            if node is None:
+                # already converted entirely
+                break
+        else:
+            node[names[-1]] = None
+    return projection
+
+
+def parse_xmltodict(
+    source: str | bytes | IO,
+    encoding: Optional[str] = None,
+    projection: Optional[Projection] = None
+) -> NestedDict:
+    """
+    Returns dictionary of the XML-document `source` using
+    `xmltodict.parse`.
+
+    Keyword arguments:
+    source -- XML-document as string, bytes, or file-like object
+    encoding -- override the document's encoding (default None)
+    projection -- only convert the given subtrees (see
+                  compile_projection); projected documents are
+                  converted with expat directly (default None)
+    """
+    if projection is not None:
+        return _ProjectedExpatHandler(projection).parse(source, encoding)
+    return xmltodict.parse(source, encoding=encoding)
+
+
+def _push(item: Optional[dict], name: str, value: Any) -> dict:
+    """
+    Adds `value` as `name` to `item` (collecting repeated names into
+    a list) and returns `item` (like xmltodict).
+    """
+    if item is None:
+        return {name: value}
+    if name in item:
+        existing = item[name]
+        if existing.__class__ is list:
+            existing.append(value)
+        else:
+            item[name] = [existing, value]
+    else:
+        item[name] = value
+    return item
+
+
+class _ProjectedExpatHandler:
+    """
+    Expat-based projected conversion (see compile_projection). Elements
+    outside of the projection are skipped: while inside a skipped
+    subtree, only its depth is tracked.
+
+    Keyword arguments:
+    projection -- projection as returned by compile_projection
+    """
+
+    def __init__(self, projection: Projection) -> None:
+        # stack of frames [item, character data, projection-node,
+        # has children]; the projection-node None denotes a subtree
+        # that is converted entirely
+        self._stack: list[list] = [[None, [], projection, False]]
+        self._skip = 0
+        self._parser = None
+
+    def parse(
+        self, source: str | bytes | IO, encoding: Optional[str] = None
+    ) -> NestedDict:
+        """Returns the projected dictionary of `source`."""
+        if isinstance(source, str):
+            # like xmltodict.parse
+            encoding = encoding or "utf-8"
+            source = source.encode(encoding)
+        parser = self._parser = expat.ParserCreate(encoding)
+        parser.ordered_attributes = True
+        parser.buffer_text = True
+        # disable entity-expansion (like in xmltodict.parse)
+        parser.DefaultHandler = lambda x: None
+        parser.ExternalEntityRefHandler = lambda *x: 1
+        self._project()
+        if hasattr(source, "read"):
+            parser.ParseFile(source)
+        else:
+            parser.Parse(source, True)
+        return self._stack[0][0] or {}
+
+    def _project(self) -> None:
+        """Set handlers for the projected elements."""
+        self._parser.StartElementHandler = self._start
+        self._parser.EndElementHandler = self._end
+        self._parser.CharacterDataHandler = self._characters
+
+    def _start(self, name: str, attributes: list[str]) -> None:
+        parent = self._stack[-1]
+        node = parent[2]
+        if node is not None:
+            parent[3] = True
+            if name not in node:
+                # skip subtree
+                self._skip = 1
+                self._parser.StartElementHandler = self._start_skip
+                self._parser.EndElementHandler = self._end_skip
+                self._parser.CharacterDataHandler = None
+                return
+            node = node[name]
+        item = None
+        if attributes:
+            item = {
+                "@" + key: value
+                for key, value in zip(attributes[::2], attributes[1::2])
+            }
+        self._stack.append([item, [], node, False])
+
+    def _end(self, name: str) -> None:
+        item, data, node, has_children = self._stack.pop()
+        text = "".join(data).strip() if data else None
+        if item is None and node is not None and has_children:
+            # ancestor of projected elements (with other children)
+            item = {}
+        if item is None:
+            value = text or None
+        else:
+            if text:
+                item["#text"] = text
+            value = item
+        parent = self._stack[-1]
+        parent[0] = _push(parent[0], name, value)
+
+    def _characters(self, data: str) -> None:
+        self._stack[-1][1].append(data)
+
+    def _start_skip(self, *_) -> None:
+        self._skip += 1
+
+    def _end_skip(self, _) -> None:
+        self._skip -= 1
+        if self._skip == 0:
+            self._project()
+
+
+# lxml-parsers of the current thread by encoding (parsers cannot be
+# used concurrently)
+_parsers = threading.local()
+
+
+def _get_parser(encoding: Optional[str]) -> "etree.XMLParser":
+    """Returns the thread-local lxml-parser for `encoding`."""
+    parsers = getattr(_parsers, "parsers", None)
+    if parsers is None:
+        parsers = _parsers.parsers = {}
+    if encoding not in parsers:
+        parsers[encoding] = etree.XMLParser(
+            encoding=encoding,
+            # keep undeclared prefixes as part of the element-name
+            # (like the namespace-unaware xmltodict.parse); other
+            # errors are raised after parsing
+            recover=True,
+            resolve_entities=False,
+            no_network=True,
+            remove_comments=True,
+            remove_pis=True,
+            huge_tree=True,
+        )
+    return parsers[encoding]
+
+
+def parse_lxml(
+    source: str | bytes | IO,
+    encoding: Optional[str] = None,
+    projection: Optional[Projection] = None
+) -> NestedDict:
+    """
+    Returns dictionary of the XML-document `source` using lxml (same
+    format as parse_xmltodict; namespace-declarations precede the other
+    attributes of an element). Falls back to parse_xmltodict if lxml is
+    not installed.
+
+    Raises ExpatError for malformed documents (like parse_xmltodict).
+
+    Keyword arguments:
+    source -- XML-document as string, bytes, or file-like object
+    encoding -- override the document's encoding (default None)
+    projection -- only convert the given subtrees (see
+                  compile_projection) (default None)
+    """
+    if etree is None:
+        return parse_xmltodict(source, encoding, projection)
+    if hasattr(source, "read"):
+        source = source.read()
+    if isinstance(source, str):
+        # like xmltodict.parse, strings are encoded and parsed with
+        # the given encoding (ignoring the XML-declaration)
+        encoding = encoding or "utf-8"
+        source = source.encode(encoding)
+    elif not isinstance(source, bytes):
+        source = bytes(source)
+
+    parser = _get_parser(encoding)
+    try:
+        root = etree.fromstring(source, parser)
+    except etree.XMLSyntaxError as exc_info:
+        raise ExpatError(str(exc_info)) from exc_info
+    for error in parser.error_log:
+        if error.level >= etree.ErrorLevels.ERROR \
+                and error.domain != etree.ErrorDomains.NAMESPACE:
+            exc = ExpatError(
+                f"{error.message}: line {error.line}, column {error.column}"
+            )
+            exc.lineno = error.line
+            exc.offset = error.column
+            raise exc
+    if root is None:
+        raise ExpatError("no element found")
+
+    # namespace-declarations are only collected if there are any
+    declarations = _namespace_declarations(root, source.count(b"xmlns"))
+    # element-names can be cached by tag if every namespace is bound
+    # to a single prefix
+    bindings = {
+        binding for bound in declarations.values() for binding in bound
+    }
+    names = {} \
+        if len({uri for _, uri in bindings}) == len(bindings) else None
+
+    name = _name(root)
+    if projection is None:
+        return {name: _convert_element(root, declarations, names)}
+    if name not in projection:
+        return {}
+    if projection[name] is None:
+        return {name: _convert_element(root, declarations, names)}
+    return {
+        name: _convert_projected(
+            root, projection[name], declarations, names
+        )
+    }
+
+
+def _namespace_declarations(
+    root: "etree._Element", limit: int
+) -> dict["etree._Element", list[tuple[str, str]]]:
+    """
+    Returns the namespace-declarations (prefix, uri) of all elements
+    in the tree of `root` that declare namespaces. (The map keeps the
+    element-proxies alive, so lookups by the elements of a later
+    iteration of the tree succeed.)
+
+    Keyword arguments:
+    root -- root element
+    limit -- upper bound for the number of declarations in the
+             document (e.g. the number of occurrences of "xmlns"); the
+             tree is only traversed until this number is reached
+    """
+    declarations = {}
+    if limit == 0:
+        return declarations
+    pending = []
+    found = 0
+    for event, value in etree.iterwalk(root, events=("start-ns", "start")):
+        if event == "start-ns":
+            pending.append(value)
+        elif pending:
+            declarations[value] = pending
+            found += len(pending)
+            if found >= limit:
+                break
+            pending = []
+    return declarations
+
+
+def _name(element: "etree._Element") -> str:
+    """Returns the (prefixed) name of `element`."""
+    tag = element.tag
+    if tag[0] != "{":
+        return tag
+    prefix = element.prefix
+    local = tag[tag.index("}") + 1:]
+    return f"{prefix}:{local}" if prefix else local
+
+
+def _attribute_name(element: "etree._Element", key: str) -> str:
+    """Returns the (prefixed) name of the attribute `key`."""
+    uri, local = key[1:].split("}", 1)
+    if uri == XML_NAMESPACE:
+        return f"xml:{local}"
+    for prefix, prefix_uri in element.nsmap.items():
+        if prefix is not None and prefix_uri == uri:
+            return f"{prefix}:{local}"
+    return local
+
+
+def _convert_element(
+    element: "etree._Element",
+    declarations: dict["etree._Element", list[tuple[str, str]]],
+    names: Optional[dict[str, str]]
+) -> Optional[NestedDict | str]:
+    """
+    Returns the value of `element` in the format of xmltodict.parse.
+
+    Keyword arguments:
+    element -- lxml-element
+    declarations -- namespace-declarations by element (see
+                    _namespace_declarations)
+    names -- cache of element-names by tag; None disables the cache
+             (if the same namespace is bound to different prefixes)
+    """
+    item = {}
+
+    if declarations:
+        for prefix, uri in declarations.get(element, ()):
+            item["@xmlns:" + prefix if prefix else "@xmlns"] = uri
+
+    attributes = element.items()
+    if attributes:
+        for key, value in attributes:
+            if key[0] == "{":
+                key = _attribute_name(element, key)
+            item["@" + key] = value
+
+    # children and character data (text of the element and the tails
+    # of its children)
+    text = element.text
+    texts = None
+    for child in element:
+        if texts is None:
+            texts = [text] if text else []
+        tag = child.tag
+        if tag.__class__ is str:  # skip entity-references
+            if names is None:
+                name = _name(child)
+            else:
+                name = names.get(tag)
+                if name is None:
+                    name = names[tag] = _name(child)
+            value = _convert_element(child, declarations, names)
+            if name in item:
+                existing = item[name]
+                if existing.__class__ is list:
+                    existing.append(value)
+                else:
+                    item[name] = [existing, value]
+            else:
+                item[name] = value
+        tail = child.tail
+        if tail:
+            texts.append(tail)
+    if texts is not None:
+        text = "".join(texts)
+
+    if text:
+        text = text.strip()
+    if not item:
+        return text or None
+    if text:
+        item["#text"] = text
+    return item
+
+
+def _convert_projected(
+    element: "etree._Element",
+    projection: Projection,
+    declarations: dict["etree._Element", list[tuple[str, str]]],
+    names: Optional[dict[str, str]]
+) -> NestedDict:
+    """
+    Returns the value of the ancestor `element` of projected subtrees
+    (see _convert_element and compile_projection).
+    """
+    item = {}
+
+    if declarations:
+        for prefix, uri in declarations.get(element, ()):
+            item["@xmlns:" + prefix if prefix else "@xmlns"] = uri
+
+    attributes = element.items()
+    if attributes:
+        for key, value in attributes:
+            if key[0] == "{":
+                key = _attribute_name(element, key)
+            item["@" + key] = value
+
+    text = element.text
+    texts = None
+    for child in element:
+        if texts is None:
+            texts = [text] if text else []
+        tag = child.tag
+        if tag.__class__ is str:
+            if names is None:
+                name = _name(child)
+            else:
+                name = names.get(tag)
+                if name is None:
+                    name = names[tag] = _name(child)
+            if name in projection:
+                node = projection[name]
+                _push(
+                    item,
+                    name,
+                    _convert_element(child, declarations, names)
+                    if node is None
+                    else _convert_projected(child, node, declarations, names)
+                )
+        tail = child.tail
+        if tail:
+            texts.append(tail)
+
+    if texts is None:
+        # no children
+        if text:
+            text = text.strip()
+        if not item:
+            return text or None
+        if text:
+            item["#text"] = text
+        return item
+    text = "".join(texts).strip()
+    if text:
+        item["#text"] = text
+    return item
+
+
+# available engines by name
+ENGINES: dict[str, Callable[..., NestedDict]] = {
+    "xmltodict": parse_xmltodict,
+    "lxml": parse_lxml,
+}
+
+
+def get_engine(name: str) -> Callable[..., NestedDict]:
+    """
+    Returns the parse-function of the engine `name` (see ENGINES). The
+    engine "lxml" uses "xmltodict" if lxml is not installed.
+    """
+    try:
+        engine = ENGINES[name]
+    except KeyError as exc_info:
+        raise ValueError(
+            f"Unknown engine '{name}', expected one of "
+            + f"{', '.join(ENGINES)}."
+        ) from exc_info
+    if engine is parse_lxml and not LXML_AVAILABLE:
+        return parse_xmltodict
+    return engine
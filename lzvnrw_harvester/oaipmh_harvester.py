@@ -0,0 +1,636 @@
+"""
+Asynchronous harvester for OAI-PMH interfaces that feeds the responses
+into the incremental converter (and optionally a mapper).
+
+Requires the package aiohttp (install with
+'pip install dcm-metadata-mapper[harvester]').
+"""
+
+from typing import \
+    Any, Optional, AsyncIterable, AsyncIterator, Awaitable, Callable, \
+    Iterable, Iterator
+from collections import deque
+from contextlib import aclosing, asynccontextmanager
+import asyncio
+
+from dcm_common.util import NestedDict
+
+from dcm_metadata_mapper.mapper_interface import MapperInterface
+from dcm_metadata_pipeline.state import \
+    RecordStateIndex, RecordUpdate, record_header
+from lzvnrw_converter.oaipmh_converter import OAIPMHMetadataConverter
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+# HTTP-status codes for which requests are retried
+RETRY_STATUS = (429, 500, 502, 503, 504)
+# number of bytes of a response body that are converted at once
+CHUNK_SIZE = 65536
+# marks the end of the items of a list-request
+_END = object()
+
+
+class OAIPMHError(Exception):
+    """
+    OAI-PMH error returned by the repository (e.g. "badArgument").
+
+    Keyword arguments:
+    code -- error code
+    message -- error message
+    """
+
+    def __init__(self, code: Optional[str], message: str) -> None:
+        super().__init__(f"{code}: {message}")
+        self.code = code
+        self.message = message
+
+
+class OAIPMHHarvester:
+    """
+    Asynchronous OAI-PMH client.
+
+    Requests share a single HTTP-session (connections to the repository
+    are reused) and at most `concurrency` requests are issued at the
+    same time; a streamed list-response releases its slot once its
+    headers are received (its body is read at the pace of the consumer,
+    which may itself issue requests, e.g. GetRecord for listed
+    identifiers) but keeps its connection. Failed requests (connection
+    errors, timeouts, and the HTTP-status codes in RETRY_STATUS) are
+    retried with exponential backoff; a Retry-After-header (in seconds)
+    takes precedence. Errors while a response body is received are not
+    retried.
+
+    Response bodies are streamed (in chunks of CHUNK_SIZE bytes) into
+    the incremental converter (see OAIPMHMetadataConverter.iter_dicts),
+    which runs in a worker thread; records are yielded as they are
+    parsed, i.e. a response is never held in memory as a whole.
+    List-responses are followed via their resumption token; up to
+    `buffer_size` records are converted ahead of the consumer, such
+    that the next page is requested while the records of the current
+    page are consumed.
+
+    Use as asynchronous context manager, e.g.
+    async with OAIPMHHarvester("https://.../oai") as harvester:
+        async for record in harvester.list_records():
+            ...
+
+    Keyword arguments:
+    base_url -- base URL of the OAI-PMH interface
+    concurrency -- maximum number of concurrent requests (default 4)
+    retries -- maximum number of retries per request (default 3)
+    backoff -- delay before the first retry in seconds; doubled for
+               every further retry (default 1.0)
+    timeout -- timeout in seconds for establishing a connection and for
+               every read of a response body (default 60)
+    converter -- converter-instance (default None; uses
+                 OAIPMHMetadataConverter())
+    buffer_size -- maximum number of records of list-requests that are
+                   buffered ahead of the consumer (default 256)
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        concurrency: int = 4,
+        retries: int = 3,
+        backoff: float = 1.0,
+        timeout: float = 60,
+        converter: Optional[OAIPMHMetadataConverter] = None,
+        buffer_size: int = 256
+    ) -> None:
+        if aiohttp is None:
+            raise ImportError(
+                "OAIPMHHarvester requires the package 'aiohttp' (install "
+                + "with 'pip install dcm-metadata-mapper[harvester]')."
+            )
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.converter = converter or OAIPMHMetadataConverter()
+        self.buffer_size = buffer_size
+        self._session: Optional["aiohttp.ClientSession"] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> "OAIPMHHarvester":
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._session = aiohttp.ClientSession(
+            # the concurrency is limited by the semaphore; connections of
+            # streamed list-responses are not counted (see _response)
+            connector=aiohttp.TCPConnector(limit_per_host=0),
+            # responses are streamed, i.e. a slow consumer must not cause
+            # a timeout
+            timeout=aiohttp.ClientTimeout(
+                total=None,
+                sock_connect=self.timeout,
+                sock_read=self.timeout
+            ),
+        )
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        await self._session.close()
+        self._session = None
+
+    async def request(self, **params: str) -> bytes:
+        """
+        Returns the body of the response to an OAI-PMH request.
+
+        Keyword arguments:
+        params -- request arguments, e.g. verb="GetRecord"
+        """
+        async with self._response(**params) as response:
+            return await response.read()
+
+    async def get_record(
+        self,
+        identifier: str,
+        metadata_prefix: str = "oai_dc",
+        paths: Optional[Iterable[Any]] = None
+    ) -> NestedDict:
+        """
+        Returns the record `identifier` (see
+        OAIPMHMetadataConverter.get_dict).
+
+        Keyword arguments:
+        identifier -- OAI-identifier of the record
+        metadata_prefix -- metadata format (default "oai_dc")
+        paths -- only convert these paths of the record (see
+                 OAIPMHMetadataConverter.get_dict) (default None)
+        """
+        records = [
+            record async for record in self._records(
+                {
+                    "verb": "GetRecord",
+                    "identifier": identifier,
+                    "metadataPrefix": metadata_prefix,
+                },
+                paths,
+                {}
+            )
+        ]
+        if not records:
+            raise OAIPMHError(
+                None, f"No record in response for '{identifier}'."
+            )
+        return records[0]
+
+    async def get_records(
+        self,
+        identifiers: Iterable[str] | AsyncIterable[str],
+        metadata_prefix: str = "oai_dc",
+        paths: Optional[Iterable[Any]] = None
+    ) -> AsyncIterator[NestedDict]:
+        """
+        Returns asynchronous iterator of the records `identifiers`
+        (in that order) which are requested concurrently.
+
+        Keyword arguments:
+        identifiers -- (asynchronous) iterable of OAI-identifiers
+        metadata_prefix -- metadata format (default "oai_dc")
+        paths -- only convert these paths of the records (see
+                 OAIPMHMetadataConverter.get_dict) (default None)
+        """
+        async for record in self._ordered(
+            self.get_record(identifier, metadata_prefix, paths)
+            async for identifier in _aiter(identifiers)
+        ):
+            yield record
+
+    async def list_identifiers(
+        self,
+        metadata_prefix: str = "oai_dc",
+        set_spec: Optional[str] = None,
+        from_date: Optional[str] = None,
+        until_date: Optional[str] = None
+    ) -> AsyncIterator[NestedDict]:
+        """
+        Returns asynchronous iterator of the headers ({"header": ...})
+        of a ListIdentifiers-request (following resumption tokens).
+
+        Keyword arguments:
+        metadata_prefix -- metadata format (default "oai_dc")
+        set_spec -- set of records (default None)
+        from_date -- lower bound for datestamps (default None)
+        until_date -- upper bound for datestamps (default None)
+        """
+        async for header in self._list(
+            "ListIdentifiers",
+            _list_arguments(metadata_prefix, set_spec, from_date, until_date),
+            None
+        ):
+            yield header
+
+    async def list_records(
+        self,
+        metadata_prefix: str = "oai_dc",
+        set_spec: Optional[str] = None,
+        from_date: Optional[str] = None,
+        until_date: Optional[str] = None,
+        paths: Optional[Iterable[Any]] = None
+    ) -> AsyncIterator[NestedDict]:
+        """
+        Returns asynchronous iterator of the records of a
+        ListRecords-request (following resumption tokens).
+
+        Keyword arguments:
+        metadata_prefix -- metadata format (default "oai_dc")
+        set_spec -- set of records (default None)
+        from_date -- lower bound for datestamps (default None)
+        until_date -- upper bound for datestamps (default None)
+        paths -- only convert these paths of the records (see
+                 OAIPMHMetadataConverter.get_dict) (default None)
+        """
+        async for record in self._list(
+            "ListRecords",
+            _list_arguments(metadata_prefix, set_spec, from_date, until_date),
+            paths
+        ):
+            yield record
+
+    async def harvest(
+        self,
+        mapper: Optional[MapperInterface] = None,
+        verb: str = "ListRecords",
+        metadata_prefix: str = "oai_dc",
+        set_spec: Optional[str] = None,
+        from_date: Optional[str] = None,
+        until_date: Optional[str] = None
+    ) -> AsyncIterator[dict[str, Any]]:
+        """
+        Returns asynchronous iterator of all (selected) records of the
+        repository, mapped with `mapper` (see
+        MapperInterface.get_all_metadata). If the mapper provides
+        SOURCE_PATHS, only these paths are converted.
+
+        Keyword arguments:
+        mapper -- mapper-instance; if None, the records are returned
+                  (default None)
+        verb -- either "ListRecords" (records are requested page by
+                page) or "GetRecord" (identifiers are listed and the
+                records are requested individually; deleted records
+                are returned with their header only)
+                (default "ListRecords")
+        metadata_prefix -- metadata format (default "oai_dc")
+        set_spec -- set of records (default None)
+        from_date -- lower bound for datestamps (default None)
+        until_date -- upper bound for datestamps (default None)
+        """
+        paths = getattr(mapper, "SOURCE_PATHS", None)
+        if verb == "ListRecords":
+            records = self.list_records(
+                metadata_prefix, set_spec, from_date, until_date, paths
+            )
+        elif verb == "GetRecord":
+            records = self._get_listed_records(
+                metadata_prefix, set_spec, from_date, until_date, paths
+            )
+        else:
+            raise ValueError(
+                f"Unsupported verb '{verb}', expected 'ListRecords' or "
+                + "'GetRecord'."
+            )
+        async for record in records:
+            yield record if mapper is None else mapper.get_all_metadata(record)
+
+    async def harvest_changes(
+        self,
+        mapper: MapperInterface,
+        index: RecordStateIndex,
+        verb: str = "GetRecord",
+        metadata_prefix: str = "oai_dc",
+        set_spec: Optional[str] = None,
+        from_date: Optional[str] = None,
+        until_date: Optional[str] = None,
+        mapper_tag: Optional[str] = None,
+        batch_size: int = 1000
+    ) -> AsyncIterator[RecordUpdate]:
+        """
+        Returns asynchronous iterator of RecordUpdates for the new,
+        changed, and deleted records of the repository (incremental
+        harvest; see RecordStateIndex.update_record). Records that were
+        mapped by another mapper version (MAPPER_TAG and specversion)
+        are requested and mapped again ("ListRecords" starts at the
+        beginning if `from_date` is not given). Changes of the index are
+        committed every `batch_size` records and after the iteration.
+
+        Keyword arguments:
+        mapper -- mapper-instance
+        index -- RecordStateIndex of previous harvests
+        verb -- either "GetRecord" (identifiers are listed and only the
+                records with a new datestamp or deleted-status are
+                requested) or "ListRecords" (records are listed starting
+                at `from_date`) (default "GetRecord")
+        metadata_prefix -- metadata format (default "oai_dc")
+        set_spec -- set of records (default None)
+        from_date -- lower bound for datestamps (default None; uses
+                     RecordStateIndex.last_datestamp for "ListRecords")
+        until_date -- upper bound for datestamps (default None)
+        mapper_tag -- key of the mapper in the index (default None;
+                      uses mapper.MAPPER_TAG)
+        batch_size -- number of records per transaction (default 1000)
+        """
+        mapper_tag = mapper_tag or mapper.MAPPER_TAG
+        paths = getattr(mapper, "SOURCE_PATHS", None)
+        if paths is not None:
+            # the index requires the complete header
+            paths = tuple(paths) + (("header",),)
+        if verb == "ListRecords":
+            records = self.list_records(
+                metadata_prefix,
+                set_spec,
+                from_date or index.last_datestamp(mapper_tag, mapper),
+                until_date,
+                paths
+            )
+        elif verb == "GetRecord":
+            records = self._get_listed_records(
+                metadata_prefix, set_spec, from_date, until_date, paths,
+                lambda identifier, datestamp, deleted: index.is_current(
+                    mapper_tag, identifier, datestamp, deleted, mapper
+                )
+            )
+        else:
+            raise ValueError(
+                f"Unsupported verb '{verb}', expected 'ListRecords' or "
+                + "'GetRecord'."
+            )
+        count = 0
+        async for record in records:
+            update = index.update_record(record, mapper, mapper_tag, paths)
+            count += 1
+            if count % batch_size == 0:
+                index.commit()
+            if update is not None:
+                yield update
+        index.commit()
+
+    async def _get_listed_records(
+        self,
+        metadata_prefix: str,
+        set_spec: Optional[str],
+        from_date: Optional[str],
+        until_date: Optional[str],
+        paths: Optional[Iterable[Any]],
+        skip: Optional[Callable[[str, Optional[str], bool], bool]] = None
+    ) -> AsyncIterator[NestedDict]:
+        """
+        Returns asynchronous iterator of the records listed by
+        list_identifiers (requested concurrently like in get_records).
+        Deleted records are not requested but returned as listed.
+        Records for which `skip(identifier, datestamp, deleted)` returns
+        True are omitted.
+        """
+        async def requests():
+            async for item in self.list_identifiers(
+                metadata_prefix, set_spec, from_date, until_date
+            ):
+                if skip is not None and skip(*record_header(item)):
+                    continue
+                header = item["header"] or {}
+                if header.get("@status") == "deleted":
+                    yield _resolved(item)
+                else:
+                    yield self.get_record(
+                        header.get("identifier"), metadata_prefix, paths
+                    )
+
+        async for record in self._ordered(requests()):
+            yield record
+
+    async def _ordered(
+        self, awaitables: AsyncIterator[Awaitable[Any]]
+    ) -> AsyncIterator[Any]:
+        """
+        Returns asynchronous iterator of the results of `awaitables`
+        (in that order) which are run concurrently; the number of
+        scheduled awaitables is bounded by twice the concurrency.
+        """
+        pending = deque()
+        try:
+            async for awaitable in awaitables:
+                pending.append(asyncio.ensure_future(awaitable))
+                if len(pending) >= 2 * self.concurrency:
+                    yield await pending.popleft()
+            while pending:
+                yield await pending.popleft()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _list(
+        self,
+        verb: str,
+        arguments: dict[str, str],
+        paths: Optional[Iterable[Any]]
+    ) -> AsyncIterator[NestedDict]:
+        """
+        Returns asynchronous iterator of the items of a list-request
+        (following resumption tokens). The items are converted by a
+        separate task and buffered (up to `buffer_size` items) ahead of
+        the consumer, i.e. the next page is requested while the current
+        page is consumed.
+        """
+        items = asyncio.Queue(self.buffer_size)
+        task = asyncio.ensure_future(
+            self._fill(verb, arguments, paths, items)
+        )
+        try:
+            while (item := await items.get()) is not _END:
+                yield item
+            await task
+        finally:
+            task.cancel()
+
+    async def _fill(
+        self,
+        verb: str,
+        arguments: dict[str, str],
+        paths: Optional[Iterable[Any]],
+        items: asyncio.Queue
+    ) -> None:
+        """
+        Puts the items of a list-request (see _list) into `items`
+        followed by the end-marker (also if an exception is raised).
+        """
+        params: Optional[dict[str, str]] = {"verb": verb, **arguments}
+        try:
+            while params is not None:
+                state: dict[str, Any] = {}
+                async with aclosing(
+                    self._records(params, paths, state, stream=True)
+                ) as records:
+                    async for item in records:
+                        await items.put(item)
+                token = state["resumption_token"]
+                params = None
+                if token is not None and token.value:
+                    params = {"verb": verb, "resumptionToken": token.value}
+        except Exception:
+            # the exception is re-raised by _list
+            await items.put(_END)
+            raise
+        await items.put(_END)
+
+    async def _records(
+        self,
+        params: dict[str, str],
+        paths: Optional[Iterable[Any]],
+        state: dict[str, Any],
+        stream: bool = False
+    ) -> AsyncIterator[NestedDict]:
+        """
+        Returns asynchronous iterator of the items of the response to an
+        OAI-PMH request, which are converted in a worker thread while
+        the response is received. Raises OAIPMHError for the errors of
+        the response; afterwards, `state["resumption_token"]` contains
+        the resumption token of the response (if any). For `stream`, see
+        _response.
+        """
+        loop = asyncio.get_running_loop()
+        async with self._response(stream, **params) as response:
+            records = self.converter.iter_dicts(
+                _chunks(response.content, loop), paths=paths
+            )
+            while (
+                record := await asyncio.to_thread(next, records, _END)
+            ) is not _END:
+                yield record
+        _raise_errors(records.errors)
+        state["resumption_token"] = records.resumption_token
+
+    @asynccontextmanager
+    async def _response(
+        self, stream: bool = False, **params: str
+    ) -> AsyncIterator["aiohttp.ClientResponse"]:
+        """
+        Returns asynchronous context manager for the response to an
+        OAI-PMH request (retried as described in OAIPMHHarvester); the
+        body has to be read within the context.
+
+        Keyword arguments:
+        stream -- if True, the concurrency slot is released once the
+                  headers are received, i.e. reading the body does not
+                  block other requests (default False)
+        params -- request arguments, e.g. verb="GetRecord"
+        """
+        if self._session is None:
+            raise RuntimeError(
+                "OAIPMHHarvester has to be used as context manager."
+            )
+        attempt = 0
+        while True:
+            delay = self.backoff * 2 ** attempt
+            await self._semaphore.acquire()
+            acquired = True
+            try:
+                try:
+                    response = await self._session.get(
+                        self.base_url, params=params
+                    )
+                except (
+                    aiohttp.ClientConnectionError, asyncio.TimeoutError
+                ) as exc_info:
+                    error = exc_info
+                else:
+                    async with response:
+                        if response.status not in RETRY_STATUS:
+                            response.raise_for_status()
+                            if stream:
+                                self._semaphore.release()
+                                acquired = False
+                            yield response
+                            return
+                        error = aiohttp.ClientResponseError(
+                            response.request_info,
+                            response.history,
+                            status=response.status,
+                            message=response.reason or "",
+                        )
+                        delay = _retry_after(
+                            response.headers.get("Retry-After"), delay
+                        )
+            finally:
+                if acquired:
+                    self._semaphore.release()
+            if attempt >= self.retries:
+                raise error
+            attempt += 1
+            await asyncio.sleep(delay)
+
+
+def _list_arguments(
+    metadata_prefix: str,
+    set_spec: Optional[str],
+    from_date: Optional[str],
+    until_date: Optional[str]
+) -> dict[str, str]:
+    """Returns the arguments of an initial list-request."""
+    arguments = {"metadataPrefix": metadata_prefix}
+    if set_spec is not None:
+        arguments["set"] = set_spec
+    if from_date is not None:
+        arguments["from"] = from_date
+    if until_date is not None:
+        arguments["until"] = until_date
+    return arguments
+
+
+def _raise_errors(errors: list[tuple[Optional[str], str]]) -> None:
+    """
+    Raises OAIPMHError for the first error of a response (except
+    noRecordsMatch, which denotes an empty list).
+    """
+    for code, message in errors:
+        if code != "noRecordsMatch":
+            raise OAIPMHError(code, message)
+
+
+def _retry_after(value: Optional[str], default: float) -> float:
+    """Returns the delay given by a Retry-After-header (in seconds)."""
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return default
+
+
+async def _aiter(
+    iterable: Iterable[Any] | AsyncIterable[Any]
+) -> AsyncIterator[Any]:
+    """Returns asynchronous iterator for a (asynchronous) iterable."""
+    if hasattr(iterable, "__aiter__"):
+        async for item in iterable:
+            yield item
+    else:
+        for item in iterable:
+            yield item
+
+
+async def _resolved(value: Any) -> Any:
+    """Returns `value` (as awaitable)."""
+    return value
+
+
+def _chunks(
+    content: "aiohttp.StreamReader", loop: asyncio.AbstractEventLoop
+) -> Iterator[bytes]:
+    """
+    Returns iterator of the chunks of a response body for a thread
+    other than the one of the event loop `loop` (blocks until the next
+    chunk is received).
+    """
+    chunks = content.iter_chunked(CHUNK_SIZE)
+    while chunk := asyncio.run_coroutine_threadsafe(
+        _next_chunk(chunks), loop
+    ).result():
+        yield chunk
+
+
+async def _next_chunk(chunks: AsyncIterator[bytes]) -> bytes:
+    """Returns the next chunk of `chunks` or b"" at the end."""
+    return await anext(chunks, b"")
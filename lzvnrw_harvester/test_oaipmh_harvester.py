@@ -0,0 +1,444 @@
+"""
+Test suite for the asynchronous OAI-PMH harvester (using a local stub
+OAI-PMH server).
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from urllib.parse import parse_qs, urlparse
+import asyncio
+import time
+
+import pytest
+from lzvnrw_converter.oaipmh_converter import OAIPMHMetadataConverter
+from lzvnrw_mapper.miami import MiamiMetadataMapper
+from dcm_metadata_pipeline.state import RecordStateIndex
+from lzvnrw_harvester.oaipmh_harvester import OAIPMHHarvester, OAIPMHError
+
+aiohttp = pytest.importorskip("aiohttp")
+
+
+HEADER = """<header{status}>
+                <identifier>oai:wwu.de:{index}</identifier>
+                <datestamp>{datestamp}</datestamp>
+            </header>"""
+RECORD = """<record>
+            {header}
+            <metadata>
+                <oai_dc:dc>
+                    <dc:title>Title {index} (version {version})</dc:title>
+                    <dc:creator>Mustermann, M.</dc:creator>
+                    <dc:identifier>
+                        https://repositorium.uni-muenster.de/transfer/miami/{index}.pdf
+                    </dc:identifier>
+                </oai_dc:dc>
+            </metadata>
+        </record>"""
+RESPONSE = """<?xml version="1.0" encoding="UTF-8"?>
+<OAI-PMH>
+    <responseDate>2023-09-12T06:45:12Z</responseDate>
+    <request>http://localhost/oai</request>
+    {body}
+</OAI-PMH>
+"""
+
+
+class StubOAIPMHServer(ThreadingHTTPServer):
+    """
+    Stub OAI-PMH server with `size` records (initially, every fourth
+    record is deleted) and `page_size` records per page of a
+    list-response.
+
+    Properties:
+    versions -- list of record versions (determines datestamp and title)
+    deleted -- set of indices of deleted records
+    failures -- number of upcoming requests that are answered with 503
+    delay -- response delay in seconds
+    stall -- delay in seconds after sending the first half of a
+             response body
+    requests -- number of handled requests
+    connections -- set of client addresses (i.e. connections)
+    max_active -- maximum number of simultaneously handled requests
+    """
+
+    daemon_threads = True
+
+    def __init__(self, size: int = 10, page_size: int = 3) -> None:
+        super().__init__(("127.0.0.1", 0), StubOAIPMHHandler)
+        self.size = size
+        self.page_size = page_size
+        self.versions = [0] * size
+        self.deleted = {index for index in range(size) if index % 4 == 3}
+        self.failures = 0
+        self.delay = 0.0
+        self.stall = 0.0
+        self.requests = 0
+        self.connections = set()
+        self.active = 0
+        self.max_active = 0
+        self.lock = Lock()
+
+    @property
+    def url(self) -> str:
+        """Base URL of the OAI-PMH interface."""
+        return f"http://127.0.0.1:{self.server_address[1]}/oai"
+
+    def header(self, index: int) -> str:
+        """Returns the header of record `index`."""
+        return HEADER.format(
+            index=index,
+            datestamp=self.datestamp(index),
+            status=' status="deleted"' if index in self.deleted else ""
+        )
+
+    def datestamp(self, index: int) -> str:
+        """Returns the datestamp of the record `index`."""
+        return f"2024-01-{self.versions[index] + 1:02d}"
+
+    def record(self, index: int) -> str:
+        """Returns the record `index`."""
+        if index in self.deleted:
+            return f"<record>{self.header(index)}</record>"
+        return RECORD.format(
+            index=index,
+            version=self.versions[index],
+            header=self.header(index)
+        )
+
+    def respond(self, arguments: dict[str, str]) -> str:
+        """Returns the OAI-PMH response for the request `arguments`."""
+        verb = arguments.get("verb")
+        if verb == "GetRecord":
+            index = int(arguments.get("identifier", "").rsplit(":", 1)[-1])
+            if not 0 <= index < self.size:
+                return _error("idDoesNotExist", "unknown identifier")
+            return f"<GetRecord>{self.record(index)}</GetRecord>"
+        if verb not in ("ListRecords", "ListIdentifiers"):
+            return _error("badVerb", "illegal verb")
+        if arguments.get("set") == "empty":
+            return _error("noRecordsMatch", "empty set")
+        if "metadataPrefix" not in arguments \
+                and "resumptionToken" not in arguments:
+            return _error("badArgument", "missing metadataPrefix")
+        cursor, _, from_date = arguments.get(
+            "resumptionToken", "0:" + arguments.get("from", "")
+        ).partition(":")
+        cursor = int(cursor)
+        selected = [
+            index for index in range(self.size)
+            if self.datestamp(index) >= from_date
+        ]
+        items = [
+            self.record(index) if verb == "ListRecords"
+            else self.header(index)
+            for index in selected[cursor:cursor + self.page_size]
+        ]
+        token = cursor + self.page_size
+        token = (
+            f'<resumptionToken cursor="{cursor}" '
+            + f'completeListSize="{len(selected)}">'
+            + (f"{token}:{from_date}" if token < len(selected) else "")
+            + "</resumptionToken>"
+        )
+        return f"<{verb}>{''.join(items)}{token}</{verb}>"
+
+
+class StubOAIPMHHandler(BaseHTTPRequestHandler):
+    """Request handler of the StubOAIPMHServer."""
+
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Handle request."""
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.connections.add(self.client_address)
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            fail = server.failures > 0
+            server.failures -= fail
+        try:
+            time.sleep(server.delay)
+            if fail:
+                self.send_response(503)
+                self.send_header("Retry-After", "0")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = RESPONSE.format(
+                body=server.respond(
+                    {
+                        key: values[0]
+                        for key, values in parse_qs(
+                            urlparse(self.path).query
+                        ).items()
+                    }
+                )
+            ).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/xml")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body[:len(body) // 2])
+            self.wfile.flush()
+            time.sleep(server.stall)
+            self.wfile.write(body[len(body) // 2:])
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def log_message(self, *_):
+        pass
+
+
+def _error(code: str, message: str) -> str:
+    return f'<error code="{code}">{message}</error>'
+
+
+@pytest.fixture(name="server")
+def get_server():
+    """Returns a running StubOAIPMHServer."""
+    server = StubOAIPMHServer()
+    thread = Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.05},
+        daemon=True
+    )
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def harvest(url, function, **kwargs):
+    """
+    Runs `function(harvester)` (returning an asynchronous iterator) with
+    a new harvester and returns the collected items as list.
+    """
+    async def run():
+        async with OAIPMHHarvester(url, backoff=0, **kwargs) as harvester:
+            return [item async for item in function(harvester)]
+    return asyncio.run(run())
+
+
+def test_list_records(server):
+    """Test ListRecords with resumption tokens."""
+    records = harvest(server.url, lambda h: h.list_records())
+
+    assert [
+        record["header"]["identifier"] for record in records
+    ] == [f"oai:wwu.de:{i}" for i in range(10)]
+    assert records[0] == OAIPMHMetadataConverter().get_dict(
+        RESPONSE.format(body=f"<GetRecord>{server.record(0)}</GetRecord>")
+    )
+    assert records[3] == {
+        "header": {
+            "@status": "deleted",
+            "identifier": "oai:wwu.de:3",
+            "datestamp": "2024-01-01",
+        }
+    }
+    # 4 pages
+    assert server.requests == 4
+
+
+def test_list_identifiers(server):
+    """Test ListIdentifiers with resumption tokens."""
+    headers = harvest(server.url, lambda h: h.list_identifiers())
+
+    assert [
+        header["header"]["identifier"] for header in headers
+    ] == [f"oai:wwu.de:{i}" for i in range(10)]
+
+
+def test_get_records(server):
+    """Test concurrent GetRecord-requests."""
+    server.delay = 0.02
+    identifiers = [f"oai:wwu.de:{i}" for i in (5, 1, 8, 0, 2, 9, 4)]
+
+    records = harvest(
+        server.url, lambda h: h.get_records(identifiers), concurrency=2
+    )
+
+    assert [
+        record["header"]["identifier"] for record in records
+    ] == identifiers
+    assert server.max_active == 2
+    # connections are reused
+    assert len(server.connections) <= 2
+
+
+@pytest.mark.parametrize("verb", ["ListRecords", "GetRecord"])
+def test_harvest(server, verb):
+    """
+    Assert that harvest yields the same metadata as a mapping of the
+    individual records.
+    """
+    mapper = MiamiMetadataMapper()
+    converter = OAIPMHMetadataConverter()
+
+    result = harvest(server.url, lambda h: h.harvest(mapper, verb=verb))
+
+    assert result == [
+        mapper.get_all_metadata(
+            converter.get_dict(
+                RESPONSE.format(
+                    body=f"<GetRecord>{server.record(i)}</GetRecord>"
+                )
+            )
+        )
+        for i in range(10)
+    ]
+    if verb == "GetRecord":
+        # 4 ListIdentifiers-pages and the records that are not deleted
+        assert server.requests == 4 + 8
+
+
+def test_retry(server):
+    """Test retry of failed requests."""
+    server.failures = 2
+    assert len(harvest(server.url, lambda h: h.list_records())) == 10
+    assert server.requests == 4 + 2
+
+    server.failures = 3
+    with pytest.raises(aiohttp.ClientResponseError):
+        harvest(server.url, lambda h: h.list_records(), retries=2)
+
+
+def test_streaming(server):
+    """
+    Assert that records are yielded while the response is received.
+    """
+    server.page_size = 10
+    server.stall = 0.5
+
+    async def run():
+        times = []
+        async with OAIPMHHarvester(server.url) as harvester:
+            start = time.monotonic()
+            async for _ in harvester.list_records():
+                times.append(time.monotonic() - start)
+        return times
+
+    times = asyncio.run(run())
+    assert len(times) == 10
+    assert times[0] < server.stall < times[-1]
+
+
+def test_buffer_size(server):
+    """
+    Test that list-responses are read ahead by at most `buffer_size`
+    records and that closing the iterator early stops the harvest.
+    """
+    async def run():
+        async with OAIPMHHarvester(server.url, buffer_size=1) as harvester:
+            records = harvester.list_records()
+            first = await anext(records)
+            await asyncio.sleep(0.2)
+            requests = server.requests
+            await records.aclose()
+        return first, requests
+
+    first, requests = asyncio.run(run())
+    assert first["header"]["identifier"] == "oai:wwu.de:0"
+    # the first page (3 records) is not consumed
+    assert requests == 1
+
+
+@pytest.mark.parametrize("verb", ["GetRecord", "ListRecords"])
+def test_small_buffer(verb):
+    """
+    Test that a streamed list-response does not block the requests of
+    its consumer (GetRecord) with a single concurrency slot and a page
+    larger than the buffer.
+    """
+    server = StubOAIPMHServer(size=20, page_size=10)
+    Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.05},
+        daemon=True
+    ).start()
+    try:
+        async def run():
+            async with OAIPMHHarvester(
+                server.url, concurrency=1, buffer_size=2
+            ) as harvester:
+                return [
+                    record async for record in harvester.harvest(verb=verb)
+                ]
+        records = asyncio.run(asyncio.wait_for(run(), 10))
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert [
+        record["header"]["identifier"] for record in records
+    ] == [f"oai:wwu.de:{i}" for i in range(20)]
+
+
+def test_oaipmh_errors(server):
+    """Test handling of OAI-PMH errors."""
+    assert harvest(server.url, lambda h: h.list_records(set_spec="empty")) \
+        == []
+    with pytest.raises(OAIPMHError) as exc_info:
+        harvest(
+            server.url, lambda h: h.get_records(["oai:wwu.de:100"])
+        )
+    assert exc_info.value.code == "idDoesNotExist"
+
+
+@pytest.mark.parametrize("verb", ["GetRecord", "ListRecords"])
+def test_harvest_changes(server, verb):
+    """Test incremental harvesting with a RecordStateIndex."""
+    mapper = MiamiMetadataMapper()
+    index = RecordStateIndex()
+
+    def changes():
+        return [
+            (update.identifier, update.status)
+            for update in harvest(
+                server.url, lambda h: h.harvest_changes(mapper, index, verb)
+            )
+        ]
+
+    assert changes() == [
+        (f"oai:wwu.de:{i}", "deleted" if i % 4 == 3 else "new")
+        for i in range(10)
+    ]
+    assert index.get(mapper.MAPPER_TAG, "oai:wwu.de:0").metadata \
+        == mapper.get_all_metadata(
+            OAIPMHMetadataConverter().get_dict(
+                RESPONSE.format(
+                    body=f"<GetRecord>{server.record(0)}</GetRecord>"
+                )
+            )
+        )
+
+    # nothing changed (ListRecords lists all records with the last
+    # datestamp again)
+    requests = server.requests
+    assert changes() == []
+    assert server.requests == requests + 4
+
+    # change, delete, and restore records
+    server.versions[1] = 1
+    server.versions[2] = 1
+    server.deleted.add(2)
+    server.versions[3] = 1
+    server.deleted.remove(3)
+    requests = server.requests
+    assert changes() == [
+        ("oai:wwu.de:1", "changed"),
+        ("oai:wwu.de:2", "deleted"),
+        ("oai:wwu.de:3", "changed"),
+    ]
+    if verb == "GetRecord":
+        # ListIdentifiers-pages and two records (1 and 3)
+        assert server.requests == requests + 4 + 2
+    else:
+        # ListRecords-pages from 2024-01-01
+        assert server.requests == requests + 4
+    assert index.get(mapper.MAPPER_TAG, "oai:wwu.de:2").deleted
+
+    # only records from the last datestamp (2024-01-02) are listed
+    requests = server.requests
+    assert changes() == []
+    if verb == "ListRecords":
+        assert server.requests == requests + 1
@@ -0,0 +1,32 @@
+"""
+Mapper-classes for the lzv.nrw-repositories.
+
+The classes are available by MAPPER_TAG or alias from `registry`; the
+corresponding modules are imported on first lookup, e.g.
+registry.get("miami").
+"""
+
+from dcm_metadata_mapper.mapper_registry import MapperRegistry
+
+
+registry = MapperRegistry()
+registry.register(
+    "lzvnrw_mapper.miami:MiamiMetadataMapper",
+    tag="Miami Metadata Mapper",
+    aliases=["miami"]
+)
+registry.register(
+    "lzvnrw_mapper.hbz_opus:HbzOpusMetadataMapper",
+    tag="Hbz OPUS Metadata Mapper",
+    aliases=["hbz-opus"]
+)
+registry.register(
+    "lzvnrw_mapper.whge_opus:WhgeOpusMetadataMapper",
+    tag="Whge OPUS Metadata Mapper",
+    aliases=["whge-opus"]
+)
+registry.register(
+    "lzvnrw_mapper.hfm_opus:HfmOpusMetadataMapper",
+    tag="Hfm OPUS Metadata Mapper",
+    aliases=["hfm-opus"]
+)
@@ -2,35 +2,23 @@
 This module defines the mapper class for the hfm-OPUS repository.
 """
 
+from pathlib import Path
+
 from dcm_metadata_mapper.mapper_factory import\
-    generate_metadata_mapper_class, LINEAR_MAP_STANDARD
+    generate_metadata_mapper_class
+from dcm_metadata_mapper.declarative_map import load_mapping
 
 
-# Define the linear map
-# Extend the standard linear map with the hbz-OPUS-specific key-pair values.
-# For common keys, the right-hand operand wins.
-hfm_opus_linear_map = LINEAR_MAP_STANDARD | {
-    "dc-title": {
-        "path": ["metadata", "oai_dc:dc", "dc:title", "#text"]
-    },
-    "source-organization": {
-        "value": "https://d-nb.info/gnd/5073685-1"
-    },
-    "transfer-urls": {
-        "path": ["metadata", "oai_dc:dc", "dc:identifier"],
-        "post-process": (lambda pp: None if pp is None else\
-            [
-                element
-                for element in pp
-                if element is not None and\
-                    "https://opus.hfm-detmold.de/files/" in element
-            ])
-    }
-}
+# Load the declarative mapping (see maps/hfm_opus.json)
+hfm_opus_mapping = load_mapping(
+    Path(__file__).parent / "maps" / "hfm_opus.json"
+)
 
-# Generate the mapper class using the factory function
+# Generate the mapper class using the factory function (the mapping
+# extends the standard linear map, see "use_standard_linear_map")
 HfmOpusMetadataMapper = generate_metadata_mapper_class(
-    mapper_tag="Hfm OPUS Metadata Mapper",
-    spec_version = (0, 3, 2, ""),
-    linear_map=hfm_opus_linear_map
+    mapper_tag=hfm_opus_mapping["mapper_tag"],
+    spec_version=hfm_opus_mapping["spec_version"],
+    linear_map=hfm_opus_mapping["linear_map"],
+    use_standard_linear_map=hfm_opus_mapping["use_standard_linear_map"]
 )
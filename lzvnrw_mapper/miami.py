@@ -2,32 +2,23 @@
 This module defines the mapper class for the miami repository.
 """
 
+from pathlib import Path
+
 from dcm_metadata_mapper.mapper_factory import\
-    generate_metadata_mapper_class, LINEAR_MAP_STANDARD
+    generate_metadata_mapper_class
+from dcm_metadata_mapper.declarative_map import load_mapping
 
 
-# Define the linear map
-# Extend the standard linear map with the miami-specific key-pair values.
-# For common keys, the right-hand operand wins.
-miami_linear_map = LINEAR_MAP_STANDARD | {
-    "source-organization": {
-        "value": "https://d-nb.info/gnd/5091030-9"
-    },
-    "transfer-urls": {
-        "path": ["metadata", "oai_dc:dc", "dc:identifier"],
-        "post-process": (lambda pp: None if pp is None else\
-            [
-                element for element in pp
-                if element is not None and\
-                    "https://repositorium.uni-muenster.de/transfer/" in element
-            ]
-        )
-    }
-}
+# Load the declarative mapping (see maps/miami.json)
+miami_mapping = load_mapping(
+    Path(__file__).parent / "maps" / "miami.json"
+)
 
-# Generate the mapper class using the factory function
+# Generate the mapper class using the factory function (the mapping
+# extends the standard linear map, see "use_standard_linear_map")
 MiamiMetadataMapper = generate_metadata_mapper_class(
-    mapper_tag="Miami Metadata Mapper",
-    spec_version = (0, 3, 2, ""),
-    linear_map=miami_linear_map
+    mapper_tag=miami_mapping["mapper_tag"],
+    spec_version=miami_mapping["spec_version"],
+    linear_map=miami_mapping["linear_map"],
+    use_standard_linear_map=miami_mapping["use_standard_linear_map"]
 )
@@ -4,6 +4,7 @@ of the source metadata mapper.
 """
 import pytest
 from lzvnrw_converter.oaipmh_converter import OAIPMHMetadataConverter
+from dcm_metadata_mapper.mapper_factory import LINEAR_MAP_STANDARD
 from lzvnrw_mapper.miami import MiamiMetadataMapper
 
 
@@ -152,6 +153,15 @@ def test_get_specversion(miami_mapper):
     assert isinstance(mapper_specversion[3], str)
 
 
+def test_standard_linear_map(miami_mapper):
+    """
+    Assert that the flag "use_standard_linear_map" of the declarative
+    mapping (maps/miami.json) is passed to the factory.
+    """
+    assert miami_mapper.use_standard_linear_map
+    assert set(LINEAR_MAP_STANDARD) <= set(miami_mapper.linear_map)
+
+
 def test_deleted_record(deleted_record_dict, miami_mapper):
     """
     Ensure the deleted record is mapped as expected without errors.
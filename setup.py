@@ -12,9 +12,34 @@ setup(
     packages=[
         "dcm_metadata_mapper",
         "dcm_metadata_converter",
+        "dcm_metadata_pipeline",
         "lzvnrw_mapper",
-        "lzvnrw_converter"
+        "lzvnrw_converter",
+        "lzvnrw_harvester"
     ],
+    package_data={
+        "lzvnrw_mapper": ["maps/*.json"],
+    },
+    extras_require={
+        "yaml": ["PyYAML"],
+        "lxml": ["lxml"],
+        "harvester": ["aiohttp>=3.8,<4"],
+        "arrow": ["pyarrow"],
+        "zstd": ["zstandard"],
+        "orjson": ["orjson"],
+        "msgpack": ["msgpack"],
+    },
+    entry_points={
+        "console_scripts": [
+            "dcm-map = dcm_metadata_pipeline.cli:main",
+        ],
+        "dcm_metadata_mapper.mappers": [
+            "miami = lzvnrw_mapper.miami:MiamiMetadataMapper",
+            "hbz-opus = lzvnrw_mapper.hbz_opus:HbzOpusMetadataMapper",
+            "whge-opus = lzvnrw_mapper.whge_opus:WhgeOpusMetadataMapper",
+            "hfm-opus = lzvnrw_mapper.hfm_opus:HfmOpusMetadataMapper",
+        ],
+    },
     setuptools_git_versioning={
         "enabled": True,
         "version_file": "VERSION",